@@ -1,42 +1,735 @@
+import math
 import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from config_loader import load_config
+from persona_registry import get_registry
+import metrics
 load_dotenv()
 
-# Module-level config cache -- set by init_ai() or lazily on first call
-_config = None
+# Optional similar-question cache -- enabled by RESPONSE_CACHE=1 in init_ai()
+_cache = None
 
+# Long-lived providers (clients + pooled connections), in hedging order -- built by init_ai() or on first call
+_providers = None
 
-def init_ai(persona: str = "default"):
-    """Pre-load config for a specific persona. Call once at startup."""
-    global _config
-    _config = load_config(persona)
+# Pre-generated fortunes served by the "pool" provider -- registered with set_fortune_pool()
+_fortune_pool = None
 
+# Hedging: the next provider in AI_PROVIDERS is asked once the current one is slower than
+# its own p90 (AI_HEDGE_DELAY until enough samples exist) or as soon as it fails
+_hedge = os.getenv("AI_HEDGE", "1").lower() in ("1", "true", "yes")
+_HEDGE_DELAY = float(os.getenv("AI_HEDGE_DELAY", "4.0"))
+_HEDGE_MIN_SAMPLES = 5
+_RETRIES = int(os.getenv("AI_RETRIES", "2"))  # Whole-chain retries, with backoff, inside the deadline
+_RETRY_BACKOFF = 0.5
+# Pooled connections per provider, and requests in flight at once (fortune_service.py raises it)
+_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "4"))
+_hedge_executor = ThreadPoolExecutor(max_workers=_MAX_CONNECTIONS, thread_name_prefix="ai-hedge")
 
-def get_ai_response(question: str) -> str:
-    """Generate a fortune using the AI provider."""
-    cfg = _config or load_config()
+# AI_TIMING=1 prints per-call setup cost vs network time
+_timing = os.getenv("AI_TIMING", "0").lower() in ("1", "true", "yes")
 
-    provider = os.getenv("AI_PROVIDER", "openai").lower()
-    system_prompt = cfg["system_prompt"]
-    max_chars = cfg["style_rules"]["max_chars"]
+# Models occasionally leak this boilerplate; it is stripped from every response
+_LEAKED_TEXT = "You are trained on data up to October 2023."
+
+# ---- Length control ----
+# Output tokens are requested in proportion to what can be printed (English runs
+# ~4 chars/token; the headroom covers punctuation-heavy prose). A persona can pin
+# its own budget with style_rules.max_tokens.
+CHARS_PER_TOKEN = 4.0
+_TOKEN_HEADROOM = 1.5
+_MIN_SENTENCE_FILL = 0.4  # Cut at a sentence end only if it keeps at least this much of max_chars
+_SENTENCE_END = re.compile(r"[.!?\u2026][\"'\u201d\u2019)\]]*(?=\s|$)")
+_length = {"responses": 0, "truncated": 0, "generated_chars": 0, "printed_chars": 0}
+
+
+class OpenAIProvider:
+    """OpenAI chat completions with settings resolved and the HTTP client built once.
 
-    if provider == "openai":
+    The underlying httpx client keeps idle connections open for up to
+    AI_KEEPALIVE_EXPIRY seconds, so consecutive fortunes reuse one TLS session.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str = None, base_url: str = None, api_key: str = None):
+        import httpx
         from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        prompt = f"{question}\n\n(Keep it under {max_chars} characters.)"
-        resp = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
+
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        expiry = float(os.getenv("AI_KEEPALIVE_EXPIRY", "120"))
+        self._http = httpx.Client(
+            limits=httpx.Limits(max_connections=_MAX_CONNECTIONS, max_keepalive_connections=_MAX_CONNECTIONS,
+                                keepalive_expiry=expiry),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+        # No SDK retries: hedging and _complete_retried() already retry within the deadline
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=base_url,
+                             http_client=self._http, max_retries=0)
+        self.last_used = time.monotonic()  # Boot warm-up counts as use: no keepalive right after it
+
+    def _client_for(self, timeout: float = None):
+        # A per-request timeout makes httpx abandon the call itself, so no thread is left behind
+        return self.client.with_options(timeout=timeout) if timeout else self.client
+
+    def complete(self, messages: list, max_tokens: int, timeout: float = None) -> str:
+        self.last_used = time.monotonic()
+        resp = self._client_for(timeout).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=max_tokens
+        )
+        self.last_used = time.monotonic()
+        return resp.choices[0].message.content
+
+    def complete_many(self, messages: list, max_tokens: int, n: int, timeout: float = None, **extra) -> list:
+        """n answers to one prompt in a single request (servers that ignore n return one)."""
+        self.last_used = time.monotonic()
+        resp = self._client_for(timeout).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=max_tokens,
+            n=n,
+            **extra
+        )
+        self.last_used = time.monotonic()
+        return [c.message.content for c in resp.choices]
+
+    def stream(self, messages: list, max_tokens: int, timeout: float = None):
+        """Yield content deltas; closing the generator closes the HTTP stream."""
+        self.last_used = time.monotonic()
+        stream = self._client_for(timeout).chat.completions.create(
+            model=self.model,
+            messages=messages,
             temperature=0.8,
-            max_tokens=1500
+            max_tokens=max_tokens,
+            stream=True
         )
-        raw = resp.choices[0].message.content.strip()
-        text = raw.replace("You are trained on data up to October 2023.", "").strip()
-        return text[:max_chars]
+        try:
+            for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        finally:
+            stream.close()
+            self.last_used = time.monotonic()
+
+    def warm_up(self):
+        """Cheap authenticated request that opens (or refreshes) the pooled connection."""
+        self.client.models.retrieve(self.model)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self._http.close()
+
+
+class LocalProvider(OpenAIProvider):
+    """A local OpenAI-compatible model server (Ollama, llama.cpp, LM Studio, ...)."""
+
+    name = "local"
+
+    def __init__(self):
+        super().__init__(
+            model=os.getenv("LOCAL_AI_MODEL", "llama3.2:3b"),
+            base_url=os.getenv("LOCAL_AI_BASE_URL", "http://localhost:11434/v1"),
+            api_key=os.getenv("LOCAL_AI_API_KEY", "local"),
+        )
+
+
+class ServiceProvider(OpenAIProvider):
+    """The shared fortune service (fortune_service.py) at FORTUNE_SERVICE_URL.
+
+    It speaks the OpenAI API and picks the real model itself. Batches (pool
+    refills) are marked low priority, so the service runs them only when no
+    customer is waiting, and may take a while: they get SERVICE_BATCH_TIMEOUT.
+    """
+
+    name = "service"
+
+    def __init__(self):
+        super().__init__(
+            model="fortune",
+            base_url=os.getenv("FORTUNE_SERVICE_URL", "http://127.0.0.1:8808/v1"),
+            api_key=os.getenv("FORTUNE_SERVICE_KEY", "local"),
+        )
+        self.batch_timeout = float(os.getenv("SERVICE_BATCH_TIMEOUT", "120"))
+
+    def complete_many(self, messages: list, max_tokens: int, n: int, timeout: float = None, **extra) -> list:
+        return super().complete_many(messages, max_tokens, n, timeout or self.batch_timeout,
+                                     extra_body={"priority": "background"}, **extra)
+
+
+class PoolProvider:
+    """Answers instantly from the pre-generated fortune pool (set_fortune_pool()).
+
+    The question is ignored, so it belongs at the end of AI_PROVIDERS as the
+    answer of last resort.
+    """
+
+    name = "pool"
+
+    def complete(self, messages: list, max_tokens: int, timeout: float = None) -> str:
+        fortune = _fortune_pool.take() if _fortune_pool else None
+        if not fortune:
+            raise RuntimeError("fortune pool is empty")
+        return fortune
+
+    def stream(self, messages: list, max_tokens: int, timeout: float = None):
+        yield self.complete(messages, max_tokens, timeout)
+
+    def close(self):
+        pass
+
+
+# Provider registry: AI_PROVIDERS (or AI_PROVIDER) names entries from here
+_PROVIDERS = {
+    "openai": OpenAIProvider,
+    "local": LocalProvider,
+    "service": ServiceProvider,
+    "pool": PoolProvider,
+}
+
+
+def _make_provider(name: str):
+    name = name.strip().lower()
+    if name not in _PROVIDERS:
+        raise NotImplementedError(f"AI provider '{name}' not implemented -- add it to _PROVIDERS in ai_client.py")
+    return _PROVIDERS[name]()
+
+
+def _make_providers() -> list:
+    names = os.getenv("AI_PROVIDERS") or os.getenv("AI_PROVIDER", "openai")
+    return [_make_provider(n) for n in names.split(",") if n.strip()]
+
+
+def _get_providers() -> list:
+    global _providers
+    if _providers is None:
+        _providers = _make_providers()
+    return _providers
+
+
+def set_fortune_pool(pool):
+    """Let the "pool" provider serve fortunes from this FortunePool."""
+    global _fortune_pool
+    _fortune_pool = pool
+
+
+def set_request_executor(executor, max_connections: int):
+    """Run (hedged) requests on executor, e.g. a FairExecutor per booth, with max_connections
+    pooled per provider. Call before init_providers()."""
+    global _hedge_executor, _MAX_CONNECTIONS
+    _hedge_executor, _MAX_CONNECTIONS = executor, max_connections
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.calls = 0
+        self.failed = 0
+        self.wins = 0
+        self.hedged = 0  # Times this provider was launched as a hedge
+        self.latencies = deque(maxlen=100)
+
+    def count(self, field: str):
+        with _stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def add_latency(self, seconds: float):
+        with _stats_lock:
+            self.latencies.append(seconds)
+
+    def p90(self):
+        with _stats_lock:
+            lat = sorted(self.latencies)
+        return lat[int(0.9 * (len(lat) - 1))] if lat else None
+
+
+_stats = {}  # provider name -> _ProviderStats
+_stats_lock = threading.Lock()  # Hedge threads, streams and batches update the counters at once
+
+
+def _stats_for(name: str) -> _ProviderStats:
+    with _stats_lock:
+        return _stats.setdefault(name, _ProviderStats())
+
+
+def provider_stats() -> dict:
+    """Per-provider calls, failures, wins, hedges and latency p90 since startup."""
+    with _stats_lock:
+        stats = list(_stats.items())
+    out = {}
+    for name, st in stats:
+        p90 = st.p90()
+        with _stats_lock:
+            out[name] = {"calls": st.calls, "failed": st.failed, "wins": st.wins,
+                         "hedged": st.hedged, "latency_p90": p90 or 0.0}
+    return out
+
+
+def init_ai(persona: str = "default"):
+    """Make persona the active one (personas are cached by the registry) and build the
+    providers. Call once at startup.
+
+    The two halves are also available separately (select_persona() and
+    init_providers()) so boot can run them in parallel.
+    """
+    select_persona(persona)
+    init_providers()
+
+
+def select_persona(persona: str):
+    registry = get_registry()
+    if not registry.switch(persona):
+        print(f"  Warning: persona '{persona}' not available, using '{registry.active}'")
+
+
+def init_providers():
+    """Build the providers (importing the client libraries) and the optional response cache.
+
+    AI_WARMUP=1 (default) opens the provider connection in the background, and
+    AI_KEEPALIVE_SECONDS > 0 re-pings it after that many idle seconds so the
+    first customer after a quiet spell doesn't pay for a fresh handshake.
+    """
+    global _cache, _providers
+    if os.getenv("RESPONSE_CACHE", "0").lower() in ("1", "true", "yes") and _cache is None:
+        from response_cache import ResponseCache
+        _cache = ResponseCache()
+
+    if _providers is None:
+        t0 = time.perf_counter()
+        try:
+            _providers = _make_providers()
+        except Exception as e:
+            print(f"  ⚠ AI provider not ready: {e}")
+            return
+        if _timing:
+            print(f"  ⏱ AI client setup {(time.perf_counter() - t0) * 1000:.1f} ms (paid once, not per fortune)")
+        if len(_providers) > 1:
+            print(f"AI providers: {' → '.join(p.name for p in _providers)}"
+                  f"{' (hedged)' if _hedge else ' (on failure)'}")
+
+        if os.getenv("AI_WARMUP", "1").lower() in ("1", "true", "yes"):
+            threading.Thread(target=_warm_up, name="ai-warmup", daemon=True).start()
+        interval = float(os.getenv("AI_KEEPALIVE_SECONDS", "45"))
+        if interval > 0:
+            threading.Thread(target=_keepalive_loop, args=(interval,), name="ai-keepalive", daemon=True).start()
+
+
+def _warm_up():
+    for provider in _providers:
+        if not hasattr(provider, "warm_up"):
+            continue
+        t0 = time.perf_counter()
+        try:
+            provider.warm_up()
+        except Exception as e:
+            print(f"  ⚠ AI warm-up failed ({provider.name}): {e}")
+            continue
+        if _timing:
+            print(f"  ⏱ AI warm-up {provider.name} {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+def _keepalive_loop(interval: float):
+    network = [p for p in _providers if hasattr(p, "warm_up")]  # The pool never goes cold
+    if not network:
+        return
+    while True:
+        idle = time.monotonic() - min(p.last_used for p in network)
+        if idle >= interval:
+            _warm_up()
+            time.sleep(interval)
+        else:
+            time.sleep(interval - idle)
+
+
+def _build_messages(cfg: dict, question: str) -> list:
+    # System prompt is the stable (prefix-cached) part; everything per-question goes last
+    prompt = question
+    index = cfg.get("_knowledge")
+    snippets = index.search(question) if index else []
+    if snippets:
+        prompt = ("Inspiration for this one (echo, never quote):\n" + "\n\n".join(snippets)
+                  + f"\n\nQuestion: {question}")
+    return [
+        {"role": "system", "content": cfg["system_prompt"]},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _report_timing(setup_s: float, network_s: float, label: str = "network"):
+    if _timing:
+        print(f"  ⏱ AI setup {setup_s * 1000:.1f} ms, {label} {network_s * 1000:.0f} ms")
+
+
+def _time_left(deadline: float = None):
+    """Seconds until a time.monotonic() deadline (None = no deadline)."""
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("AI deadline passed before the request was sent")
+    return left
+
+
+def _hedge_delay(provider) -> float:
+    """How long to give provider before also asking the next one."""
+    if not _hedge:
+        return float("inf")  # Next provider only when this one fails
+    st = _stats_for(provider.name)
+    if len(st.latencies) < _HEDGE_MIN_SAMPLES:
+        return _HEDGE_DELAY
+    return max(0.5, st.p90())
+
+
+def _timed_complete(provider, messages: list, max_tokens: int, timeout: float) -> str:
+    st = _stats_for(provider.name)
+    st.count("calls")
+    t0 = time.monotonic()
+    try:
+        raw = provider.complete(messages, max_tokens=max_tokens, timeout=timeout)
+    except Exception:
+        st.count("failed")
+        raise
+    st.add_latency(time.monotonic() - t0)
+    return raw
+
+
+def _complete_hedged(providers: list, messages: list, max_tokens: int, max_chars: int, deadline: float = None):
+    """Ask providers in order, launching the next one when the newest is slower than
+    its p90 or fails. A lone provider is hedged with a second request to itself.
+    The first non-empty cleaned answer wins; slower requests are left to finish
+    (or time out) in the background. Returns (text, provider).
+    """
+    if _hedge and len(providers) == 1:
+        providers = providers * 2
+    pending = {}
+    errors = []
+    next_i = 0
+    launch_at = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if next_i < len(providers) and (not pending or now >= launch_at):
+            provider = providers[next_i]
+            next_i += 1
+            if pending:
+                _stats_for(provider.name).count("hedged")
+                print(f"  ↪ AI slow, also asking {provider.name}")
+            future = _hedge_executor.submit(_timed_complete, provider, messages, max_tokens, _time_left(deadline))
+            pending[future] = provider
+            launch_at = now + _hedge_delay(provider)
+
+        timeout = launch_at - now if next_i < len(providers) else None
+        if deadline is not None:
+            left = deadline - now
+            if left <= 0:
+                raise TimeoutError(f"AI deadline passed waiting on {', '.join(p.name for p in pending.values())}")
+            timeout = min(timeout if timeout is not None else float("inf"), left)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                raw = future.result()
+                text = _clean_response(raw, max_chars)
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+                launch_at = time.monotonic()  # Don't wait out the hedge delay after a failure
+                continue
+            if text:
+                _stats_for(provider.name).count("wins")
+                _record_length(raw, text)
+                return text, provider
+            errors.append(f"{provider.name}: empty response")
+            launch_at = time.monotonic()
+        if not pending and next_i >= len(providers):
+            raise RuntimeError("; ".join(errors))
+
+
+def _complete_retried(providers: list, messages: list, max_tokens: int, max_chars: int, deadline: float = None):
+    """_complete_hedged(), with a round where every provider failed retried with backoff
+    while the deadline allows. Returns (text, provider, attempts)."""
+    if not providers:
+        raise RuntimeError("No AI provider available")
+    for attempt in range(_RETRIES + 1):
+        try:
+            text, provider = _complete_hedged(providers, messages, max_tokens, max_chars, deadline)
+            return text, provider, attempt + 1
+        except (TimeoutError, RuntimeError) as e:
+            backoff = _RETRY_BACKOFF * 2 ** attempt
+            left = deadline - time.monotonic() if deadline is not None else float("inf")
+            if isinstance(e, TimeoutError) or attempt == _RETRIES or left < backoff + 1.0:
+                raise
+            print(f"  ⚠ AI request failed ({e}) - retrying in {backoff:.1f}s")
+            time.sleep(backoff)
+
+
+def _persona_config(persona: str = None) -> dict:
+    registry = get_registry()
+    return registry.get(persona) if persona else registry.config()
+
+
+def get_ai_response(question: str, use_cache: bool = True, deadline: float = None,
+                    use_pool: bool = True, persona: str = None, metric: str = "ai") -> str:
+    """Generate a fortune using the AI providers.
+
+    With the response cache enabled, a question similar to an earlier one may be
+    answered from the cache; use_cache=False always calls a provider, and
+    use_pool=False skips the "pool" provider (for refilling the pool itself).
+    Slow requests are hedged across AI_PROVIDERS, and a round where every
+    provider failed is retried with backoff while the time.monotonic()
+    deadline allows. persona defaults to the active one. The call is recorded
+    as metrics stage `metric`.
+    """
+    with metrics.stage(metric) as span:
+        t0 = time.perf_counter()
+        cfg = _persona_config(persona)
+        cache = _cache if use_cache else None
+        if cache:
+            cached = cache.lookup(cfg["_persona_name"], question)
+            if cached:
+                span.sizes.update(provider="cache", response_chars=len(cached))
+                return cached
+
+        providers = [p for p in _get_providers() if use_pool or p.name != "pool"]
+        messages = _build_messages(cfg, question)
+        t1 = time.perf_counter()
+        text, provider, attempt = _complete_retried(providers, messages, _token_budget(cfg),
+                                                    cfg["style_rules"]["max_chars"], deadline)
+        _report_timing(t1 - t0, time.perf_counter() - t1, label=f"network ({provider.name})")
+        span.sizes.update(provider=provider.name, attempts=attempt, response_chars=len(text),
+                          prompt_chars=sum(len(m["content"]) for m in messages))
+        if provider.name == "pool":
+            span.outcome = "fallback"
+
+        if cache and provider.name != "pool":
+            cache.store(cfg["_persona_name"], question, text)
+        return text
+
+
+def get_ai_batch(question: str, count: int, persona: str = None, metric: str = "ai_refill") -> list:
+    """Up to count fortunes for question from one request, for refilling the fortune pool.
+
+    Never answered from the cache or the pool. Providers that ignore n return a
+    single fortune; the caller asks again for the rest. Recorded as metrics
+    stage `metric`.
+    """
+    with metrics.stage(metric) as span:
+        cfg = _persona_config(persona)
+        messages = _build_messages(cfg, question)
+        texts, provider = complete_batch(messages, _token_budget(cfg), count, cfg["style_rules"]["max_chars"])
+        span.sizes.update(provider=provider.name, fortunes=len(texts), response_chars=sum(map(len, texts)))
+        return texts
+
+
+# ---- Raw completions (fortune_service.py) ----
+# The service receives ready-built messages from its kiosks; these run them through
+# the same provider chain without a persona, leaving truncation to the kiosk.
+def complete_messages(messages: list, max_tokens: int, deadline: float = None) -> tuple:
+    """(text, provider name) for messages, hedged and retried like get_ai_response()."""
+    providers = [p for p in _get_providers() if p.name != "pool"]
+    text, provider, _ = _complete_retried(providers, messages, max_tokens, None, deadline)
+    return text, provider.name
+
+
+def stream_messages(messages: list, max_tokens: int, deadline: float = None):
+    """Raw content deltas for messages from the first provider that starts streaming."""
+    return _open_stream(messages, max_tokens, deadline)
+
+
+def complete_batch(messages: list, max_tokens: int, n: int, max_chars: int = None,
+                   deadline: float = None) -> tuple:
+    """([text, ...], provider) -- up to n answers from the first provider that gives any.
+
+    Providers with complete_many() answer in one request; others answer once. Each
+    request is cut off at the time.monotonic() deadline.
+    """
+    errors = []
+    for provider in _get_providers():
+        if provider.name == "pool":
+            continue
+        timeout = _time_left(deadline)  # Past the deadline: stop, don't charge the next provider
+        st = _stats_for(provider.name)
+        st.count("calls")
+        try:
+            if hasattr(provider, "complete_many"):
+                raws = provider.complete_many(messages, max_tokens=max_tokens, n=n, timeout=timeout)
+            else:
+                raws = [provider.complete(messages, max_tokens=max_tokens, timeout=timeout)]
+        except Exception as e:
+            st.count("failed")
+            errors.append(f"{provider.name}: {e}")
+            continue
+        texts = []
+        for raw in raws[:n]:
+            text = _clean_response(raw or "", max_chars)
+            if text:
+                _record_length(raw, text)
+                texts.append(text)
+        if texts:
+            st.count("wins")
+            return texts, provider
+        errors.append(f"{provider.name}: empty response")
+    raise RuntimeError("; ".join(errors) or "No AI provider available")
+
+
+def _token_budget(cfg: dict) -> int:
+    """max_tokens for a persona: enough for max_chars of text, not the 1500 it used to be."""
+    rules = cfg["style_rules"]
+    if rules.get("max_tokens"):
+        return int(rules["max_tokens"])
+    return math.ceil(rules["max_chars"] / CHARS_PER_TOKEN * _TOKEN_HEADROOM) + 10
+
+
+def _strip_leak(raw: str) -> str:
+    return raw.strip().replace(_LEAKED_TEXT, "").strip()
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Fit text into max_chars, ending at a sentence boundary when one is close enough,
+    otherwise at a word boundary with an ellipsis. max_chars None keeps it whole."""
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    ends = [m.end() for m in _SENTENCE_END.finditer(text, 0, max_chars)]
+    if ends and ends[-1] >= max_chars * _MIN_SENTENCE_FILL:
+        return text[:ends[-1]]
+    cut = text.rfind(" ", 0, max_chars)  # Room for the ellipsis: the space itself is dropped
+    if cut <= 0:
+        cut = max_chars - 1
+    return text[:cut].rstrip(" ,;:-\u2013\u2014") + "\u2026"
+
+
+def _clean_response(raw: str, max_chars: int) -> str:
+    return _truncate(_strip_leak(raw), max_chars)
+
+
+def _record_length(raw: str, text: str):
+    _length["responses"] += 1
+    _length["truncated"] += len(_strip_leak(raw)) > len(text)
+    _length["generated_chars"] += len(raw)
+    _length["printed_chars"] += len(text)
+    if _timing:
+        print(f"  ⏱ ~{_estimate_tokens(raw)} tokens generated, ~{_estimate_tokens(text)} printed")
+
+
+def _estimate_tokens(text_or_chars) -> int:
+    chars = text_or_chars if isinstance(text_or_chars, int) else len(text_or_chars)
+    return round(chars / CHARS_PER_TOKEN)
+
+
+def length_stats() -> dict:
+    """Responses, how many needed truncating, and (estimated) tokens generated vs printed."""
+    return {
+        "responses": _length["responses"],
+        "truncated": _length["truncated"],
+        "tokens_generated": _estimate_tokens(_length["generated_chars"]),
+        "tokens_printed": _estimate_tokens(_length["printed_chars"]),
+    }
+
+
+def stream_ai_response(question: str, deadline: float = None, persona: str = None):
+    """Generate a fortune with the streaming API, yielding text as it arrives.
+
+    The concatenated pieces equal what get_ai_response() would return for the
+    same completion. Text is released a sentence at a time (truncation only ever
+    cuts at a sentence end, or is the final piece), with the last few characters
+    held back so the leaked-boilerplate strip never has to un-yield text. As soon
+    as the text runs past max_chars the truncation point is known, so the stream
+    is closed and the model stops generating. A response-cache hit is yielded in
+    one piece. Once the time.monotonic() deadline passes the stream is closed and
+    TimeoutError is raised.
+    """
+    t0 = time.perf_counter()
+    started = time.monotonic()
+    cfg = _persona_config(persona)
+    if _cache:
+        cached = _cache.lookup(cfg["_persona_name"], question)
+        if cached:
+            metrics.record("ai_stream", time.monotonic() - started, provider="cache", response_chars=len(cached))
+            yield cached
+            return
+
+    max_chars = cfg["style_rules"]["max_chars"]
+    messages = _build_messages(cfg, question)
+    t1 = time.perf_counter()
+    try:
+        stream = _open_stream(messages, _token_budget(cfg), deadline)
+    except Exception:
+        metrics.record("ai_stream", time.monotonic() - started, "error")
+        raise
+
+    hold = len(_LEAKED_TEXT)
+    raw = ""
+    sent = 0
+    try:
+        for delta in stream:
+            if not raw and delta:
+                # Later deltas are paced by the consumer (the printer), so time to first token
+                _report_timing(t1 - t0, time.perf_counter() - t1, label="first token")
+                metrics.record("ai_first_token", time.monotonic() - started)
+            raw += delta
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("AI deadline passed mid-stream")
+            text = _strip_leak(raw)
+            stable = text[:max(0, len(text) - hold)]
+            ends = [m.end() for m in _SENTENCE_END.finditer(stable, sent, max_chars)]
+            if ends and ends[-1] > sent and ends[-1] < len(stable):  # Confirmed by the next char
+                yield stable[sent:ends[-1]]
+                sent = ends[-1]
+            if len(text) > max_chars + hold:
+                break  # Everything the truncation depends on has arrived
+    except Exception as e:
+        metrics.record("ai_stream", time.monotonic() - started, "timeout" if isinstance(e, TimeoutError) else "error",
+                       response_chars=len(raw))
+        raise
+    finally:
+        stream.close()
+
+    final = _clean_response(raw, max_chars)
+    if len(final) > sent:
+        yield final[sent:]
+    _record_length(raw, final)
+    metrics.record("ai_stream", time.monotonic() - started, response_chars=len(final),
+                   prompt_chars=sum(len(m["content"]) for m in messages))
+    if _cache:
+        _cache.store(cfg["_persona_name"], question, final)
+
+
+def _open_stream(messages: list, max_tokens: int, deadline: float = None):
+    """Stream from the first provider that produces a first non-empty delta.
+
+    Nothing has been printed until then, so a provider that fails to start is
+    simply replaced by the next one in AI_PROVIDERS (streams are not hedged).
+    """
+    errors = []
+    for provider in _get_providers():
+        st = _stats_for(provider.name)
+        st.count("calls")
+        stream = provider.stream(messages, max_tokens=max_tokens, timeout=_time_left(deadline))
+        try:
+            first = ""
+            while not first:  # Role-only and empty deltas don't count as a start
+                first = next(stream)
+        except StopIteration:
+            errors.append(f"{provider.name}: empty stream")
+            st.count("failed")
+            continue
+        except Exception as e:
+            stream.close()
+            errors.append(f"{provider.name}: {e}")
+            st.count("failed")
+            continue
+        st.count("wins")
+        return _prepend(first, stream)
+    raise RuntimeError("; ".join(errors) or "No AI provider available")
+
 
-    raise NotImplementedError("Add your AI provider in ai_client.py")
+def _prepend(first: str, stream):
+    try:
+        yield first
+        yield from stream
+    finally:
+        stream.close()
@@ -3,7 +3,8 @@ import argparse
 from ai_client import get_ai_response, init_ai
 from formatters import render_ticket
 from print_client import print_ticket
-from config_loader import load_config, list_personas
+from config_loader import list_personas
+from persona_registry import current_config
 
 def main():
     parser = argparse.ArgumentParser(description="Narly fortune (standalone test).")
@@ -27,8 +28,8 @@ def main():
             print(f"  {name}")
         return
 
-    cfg = load_config(args.persona)
     init_ai(args.persona)
+    cfg = current_config()
     print(f"Persona: {cfg['_persona_name']}")
 
     question = args.question or cfg.get("default_question", "What is my fortune?")
@@ -0,0 +1,189 @@
+# bench/bench_e2e.py - Coin-to-paper benchmark of the whole flow against simulated devices
+#
+# Runs the real serial_trigger flow (listen_serial_mode -> on_coin_event, or
+# the pipeline with --pipelined) with the stand-ins from sim_devices.py: coins
+# arrive from a simulated board at a chosen rate, each customer "says" a WAV
+# question into a fake mic once the cue has played, a local mock of the
+# OpenAI API answers with a chosen latency distribution, and tickets come out
+# of a printer that models thermal line speed. Real time, offline, seeded.
+#
+# Reports throughput, coin -> first fortune line and coin -> cut percentiles
+# and coin queue wait, and compares them with the baseline stored for the
+# scenario (bench/baselines/e2e.json). A regression beyond the tolerance, or
+# a customer left without a ticket, exits 1; a scenario without a baseline
+# (or recorded with other settings) exits 2 unless --no-compare is given.
+#
+# Timings depend on the machine, so no baselines ship with the repo: record
+# each scenario once with --save-baseline on the machine that runs the check
+# (the first step on a fresh checkout), then compare against it.
+#
+#   python bench/bench_e2e.py --save-baseline              # first: record this scenario's baseline
+#   python bench/bench_e2e.py                              # 12 customers at 360/h, vs baseline
+#   python bench/bench_e2e.py --stream --scenario stream
+#   python bench/bench_e2e.py --pipelined --scenario pipelined
+#   python bench/bench_e2e.py --rate 0 --scenario capacity # every coin at once: max throughput
+#   python bench/bench_e2e.py --ai-latency uniform:3,8 --ai-error-rate 0.2 --no-compare
+
+import argparse
+import json
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_endpointing import CORPUS_DIR, synth
+from sim_devices import arrival_times, MockAIServer, SimBooth
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "e2e.json"
+
+# (result key, better) -- latencies may grow by the tolerance plus SLACK seconds
+CHECKS = (
+    ("throughput_per_hour", "higher"),
+    ("coin_to_first_line.p50", "lower"),
+    ("coin_to_first_line.p90", "lower"),
+    ("coin_to_cut.p50", "lower"),
+    ("coin_to_cut.p90", "lower"),
+    ("queue_wait.p90", "lower"),
+)
+SLACK = 0.25
+
+
+def find_clips(corpus: Path, seed: int) -> list:
+    """Question clips from the endpointing corpus, or synthetic ones if it is empty."""
+    clips = sorted(corpus.glob("*.wav"))
+    if clips:
+        return clips
+    tmp = Path(tempfile.mkdtemp(prefix="narly-e2e-"))
+    synth(tmp, 8, seed)
+    return sorted(tmp.glob("*.wav"))
+
+
+def scenario_config(args, clips) -> dict:
+    """Settings a baseline is only comparable under."""
+    return {
+        "customers": args.customers, "rate": args.rate, "arrivals": args.arrivals, "seed": args.seed,
+        "ai_latency": args.ai_latency, "ai_tokens_per_second": args.ai_tps, "ai_chars": args.ai_chars,
+        "ai_error_rate": args.ai_error_rate, "line_rate": args.line_rate, "cut_seconds": args.cut_seconds,
+        "cue_seconds": args.cue_seconds, "stream": args.stream, "stream_stt": args.stream_stt,
+        "pipelined": args.pipelined, "pipeline_depth": args.pipeline_depth, "persona": args.persona,
+        "clips": [c.name for c in clips],
+    }
+
+
+def run(args, clips) -> dict:
+    """One benchmark run; returns the results dict."""
+    server = MockAIServer(args.ai_latency, args.ai_tps, args.ai_chars, args.ai_error_rate, args.seed).start()
+    booth = SimBooth(clips, arrival_times(args.customers, args.rate, args.arrivals, args.seed), server,
+                     line_rate=args.line_rate, cut_seconds=args.cut_seconds, cue_seconds=args.cue_seconds,
+                     seed=args.seed, persona=args.persona, stream=args.stream, stream_stt=args.stream_stt,
+                     pipelined=args.pipelined, pipeline_depth=args.pipeline_depth)
+    results = booth.run(args.max_seconds)
+    results.pop("stages")
+    return results
+
+
+def report(results: dict, args):
+    mode = "pipelined" if args.pipelined else "streamed" if args.stream else "one at a time"
+    rate = f"{args.rate:g}/h {args.arrivals}" if args.rate > 0 else "all at once"
+    q = lambda d: f"p50 {d['p50']:.2f}s  p90 {d['p90']:.2f}s  p99 {d['p99']:.2f}s"
+    print(f"\n📊 End-to-end: {results['customers']}/{args.customers} customers, arrivals {rate}, {mode}")
+    print(f"  {'throughput':<20}{results['throughput_per_hour']:.1f} customers/hour")
+    print(f"  {'coin → first line':<20}{q(results['coin_to_first_line'])}")
+    print(f"  {'coin → cut':<20}{q(results['coin_to_cut'])}")
+    w = results["queue_wait"]
+    print(f"  {'queue wait':<20}avg {w['avg']:.2f}s  p90 {w['p90']:.2f}s  max {w['max']:.2f}s")
+    print(f"  {'cycles':<20}" + " ".join(f"{k}={v}" for k, v in sorted(results["cycles"].items())))
+    print(f"  {'mock AI':<20}requests={results['ai']['requests']} errors={results['ai']['errors']}")
+
+
+def _get(results: dict, key: str) -> float:
+    for part in key.split("."):
+        results = results[part]
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the comparison; False if anything regressed."""
+    print(f"\n  {'vs baseline':<24}{'baseline':>10}{'now':>10}{'change':>9}")
+    ok = True
+    for key, better in CHECKS:
+        old, new = _get(baseline, key), _get(results, key)
+        if better == "higher":
+            bad = new < old * (1 - tolerance)
+        else:
+            bad = new > old * (1 + tolerance) + SLACK
+        change = (new - old) / old if old else 0.0
+        print(f"  {key:<24}{old:>10.2f}{new:>10.2f}{change:>+9.0%}  {'✗ regressed' if bad else '✓'}")
+        ok = ok and not bad
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end coin → paper benchmark with simulated devices")
+    parser.add_argument("--scenario", default="default", help="Baseline name for these settings (default: default)")
+    parser.add_argument("--customers", type=int, default=12)
+    parser.add_argument("--rate", type=float, default=360, help="Coin arrivals per hour; 0 = all at once")
+    parser.add_argument("--arrivals", choices=["poisson", "fixed"], default="poisson")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="Question WAVs (synthetic if empty)")
+    parser.add_argument("--ai-latency", default="lognormal:1.2,0.35",
+                        help="Time to first token: 1.2, uniform:0.5,2, normal:1.2,0.3 or lognormal:median,sigma")
+    parser.add_argument("--ai-tps", type=float, default=40.0, help="Mock AI tokens per second after the first")
+    parser.add_argument("--ai-chars", type=int, default=260, help="Mock fortune length")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0, help="Share of AI requests that fail (HTTP 500)")
+    parser.add_argument("--line-rate", type=float, default=30.0, help="Printer text lines per second")
+    parser.add_argument("--cut-seconds", type=float, default=0.4)
+    parser.add_argument("--cue-seconds", type=float, default=0.8, help="Length of the 'mic ready' cue")
+    parser.add_argument("--stream", action="store_true", help="Stream the AI response onto the printer")
+    parser.add_argument("--stream-stt", action="store_true", help="Chunked transcription while speaking")
+    parser.add_argument("--pipelined", action="store_true", help="Overlap customers across stages")
+    parser.add_argument("--pipeline-depth", type=int, default=1)
+    parser.add_argument("--persona", default="default")
+    parser.add_argument("--max-seconds", type=float, default=0, help="Give up after this long (default: from the load)")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression (default: 0.15)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the scenario's baseline")
+    parser.add_argument("--no-compare", action="store_true", help="Just report, don't check the baseline")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    clips = find_clips(args.corpus, args.seed)
+    config = scenario_config(args, clips)
+    results = run(args, clips)
+    report(results, args)
+    if args.json:
+        args.json.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+
+    if results["customers"] < args.customers:
+        print(f"\n✗ Only {results['customers']} of {args.customers} customers got a ticket")
+        sys.exit(1)
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[args.scenario] = {"recorded": date.today().isoformat(), "config": config, "results": results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\n💾 Baseline '{args.scenario}' saved to {args.baseline}")
+        return
+    if args.no_compare:
+        return
+    stored = baselines.get(args.scenario)
+    if stored is None:
+        print(f"\n✗ No baseline '{args.scenario}' in {args.baseline} -- record one with --save-baseline "
+              f"or pass --no-compare")
+        sys.exit(2)
+    if stored["config"] != config:
+        changed = sorted(k for k in config if stored["config"].get(k) != config[k])
+        print(f"\n✗ Baseline '{args.scenario}' was recorded with other settings ({', '.join(changed)}); "
+              f"use another --scenario or re-record it with --save-baseline")
+        sys.exit(2)
+    if not compare(results, stored["results"], args.tolerance):
+        print(f"\n✗ Regression against baseline '{args.scenario}' (recorded {stored['recorded']})")
+        sys.exit(1)
+    print(f"\n✓ Within {args.tolerance:.0%} of baseline '{args.scenario}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# bench/bench_endpointing.py - Tune and benchmark end-of-speech detection on recorded audio
+#
+# Every clip in the corpus is a mono 16-bit WAV that starts with a little room
+# noise, followed by a spoken question, followed by silence, plus a sidecar
+# <clip>.json: {"speech_end": <seconds>} marking where the speaker stopped.
+# Each clip is replayed frame by frame through the old fixed flow
+# (0.8 s calibration, energy 1100, 1.5 s pause) and through the adaptive
+# Endpointer, and the dead air after the question is compared.
+#
+#   python bench/bench_endpointing.py                      # benchmark the corpus
+#   python bench/bench_endpointing.py --min-pause 0.5      # try other settings
+#   python bench/bench_endpointing.py record my_clip       # add a clip from the mic
+#   python bench/bench_endpointing.py synth                # synthetic clips (no mic needed)
+
+import argparse
+import json
+import math
+import random
+import struct
+import sys
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from endpointing import Endpointer, NoiseFloor, frame_rms, ENDPOINT_MIN_PAUSE, ENDPOINT_MAX_PAUSE
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus" / "endpointing"
+CHUNK = 1024              # Frames per read, same as sr.Microphone
+FIXED_CALIBRATION = 0.8   # adjust_for_ambient_noise(duration=0.8)
+FIXED_ENERGY = 1100
+FIXED_PAUSE = 1.5
+EARLY_TOLERANCE = 0.15    # Cutting off this close to the label doesn't count as early
+FLOOR_LEAD = 0.5          # Leading audio treated as already-tracked background
+
+
+def load_frames(path: Path):
+    with wave.open(str(path), "rb") as w:
+        if w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"{path.name}: need mono 16-bit audio")
+        rate = w.getframerate()
+        data = w.readframes(w.getnframes())
+    step = CHUNK * 2
+    return rate, [data[i:i + step] for i in range(0, len(data) - step + 1, step)]
+
+
+def fixed_endpoint(rms_values, frame_seconds):
+    """Seconds into the clip where recognizer.listen() would return (None if never)."""
+    speaking, quiet = False, 0
+    for i, rms in enumerate(rms_values):
+        if rms > FIXED_ENERGY:
+            speaking, quiet = True, 0
+        elif speaking:
+            quiet += 1
+            if quiet * frame_seconds >= FIXED_PAUSE:
+                return (i + 1) * frame_seconds
+    return None
+
+
+def adaptive_endpoint(rms_values, frame_seconds, **opts):
+    floor = NoiseFloor()
+    lead = max(1, int(FLOOR_LEAD / frame_seconds))
+    for rms in rms_values[:lead]:
+        floor.update(rms)
+    ep = Endpointer(frame_seconds, floor.value, **opts)
+    for i, rms in enumerate(rms_values):
+        if ep.push(rms) == Endpointer.DONE:
+            return (i + 1) * frame_seconds
+    return None
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def bench(corpus: Path, min_pause: float, max_pause: float):
+    clips = sorted(corpus.glob("*.wav"))
+    if not clips:
+        print(f"No clips in {corpus} -- add some with 'record' or generate them with 'synth'.")
+        return 1
+
+    fixed_delays, adaptive_delays, early, missed = [], [], [], []
+    print(f"{'clip':<28} {'end':>6} {'fixed':>7} {'adaptive':>9}")
+    for path in clips:
+        label = path.with_suffix(".json")
+        if not label.exists():
+            print(f"{path.name:<28} (no {label.name}, skipped)")
+            continue
+        speech_end = json.loads(label.read_text())["speech_end"]
+        rate, frames = load_frames(path)
+        frame_seconds = CHUNK / rate
+        rms_values = [frame_rms(f) for f in frames]
+
+        fixed = fixed_endpoint(rms_values, frame_seconds)
+        adaptive = adaptive_endpoint(rms_values, frame_seconds, min_pause=min_pause, max_pause=max_pause)
+        if fixed is not None:
+            fixed_delays.append(fixed - speech_end + FIXED_CALIBRATION)
+        if adaptive is None:
+            missed.append(path.name)
+        else:
+            adaptive_delays.append(adaptive - speech_end)
+            if adaptive < speech_end - EARLY_TOLERANCE:
+                early.append(path.name)
+
+        def fmt(t):
+            return f"{t - speech_end:+.2f}s" if t is not None else "   --"
+        print(f"{path.name:<28} {speech_end:>5.2f}s {fmt(fixed):>7} {fmt(adaptive):>9}")
+
+    print()
+    print(f"Fixed    (incl. {FIXED_CALIBRATION}s calibration): "
+          f"avg {sum(fixed_delays) / max(1, len(fixed_delays)):.2f}s  p90 {_percentile(fixed_delays, 0.9):.2f}s")
+    print(f"Adaptive (min {min_pause}s / max {max_pause}s pause): "
+          f"avg {sum(adaptive_delays) / max(1, len(adaptive_delays)):.2f}s  p90 {_percentile(adaptive_delays, 0.9):.2f}s")
+    if fixed_delays and adaptive_delays:
+        saved = sum(fixed_delays) / len(fixed_delays) - sum(adaptive_delays) / len(adaptive_delays)
+        print(f"Dead air saved per customer: {saved:.2f}s")
+    if early:
+        print(f"⚠ Cut off early ({len(early)}): {', '.join(early)}")
+    if missed:
+        print(f"⚠ Never endpointed ({len(missed)}): {', '.join(missed)}")
+    return 1 if early else 0
+
+
+def record(name: str, seconds: float, corpus: Path):
+    """Record a clip from the default mic and write a first-guess label to hand-check."""
+    import speech_recognition as sr
+    corpus.mkdir(parents=True, exist_ok=True)
+    with sr.Microphone(chunk_size=CHUNK) as source:
+        rate = source.SAMPLE_RATE
+        print(f"Recording {seconds:.0f}s -- stay quiet for a moment, ask a question, then stay quiet.")
+        frames = [source.stream.read(CHUNK) for _ in range(int(seconds * rate / CHUNK))]
+
+    rms_values = [frame_rms(f) for f in frames]
+    floor = NoiseFloor()
+    for rms in rms_values[:max(1, int(FLOOR_LEAD * rate / CHUNK))]:
+        floor.update(rms)
+    voiced = [i for i, rms in enumerate(rms_values) if rms > floor.value * 3]
+    speech_end = (voiced[-1] + 1) * CHUNK / rate if voiced else 0.0
+
+    wav_path = corpus / f"{name}.wav"
+    with wave.open(str(wav_path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"".join(frames))
+    wav_path.with_suffix(".json").write_text(json.dumps({"speech_end": round(speech_end, 2)}) + "\n")
+    print(f"Saved {wav_path} (speech_end guessed at {speech_end:.2f}s -- check it by ear)")
+
+
+def synth(corpus: Path, count: int, seed: int):
+    """Write noise + word-burst clips with mid-question hesitations, for a quick run."""
+    rng = random.Random(seed)
+    rate = 16000
+    corpus.mkdir(parents=True, exist_ok=True)
+    for n in range(count):
+        noise = rng.uniform(80, 400)
+        samples, t = [], 0.0
+
+        def add(duration, amp, freq=0.0):
+            nonlocal t
+            for _ in range(int(duration * rate)):
+                tone = amp * math.sin(2 * math.pi * freq * t) if freq else 0.0
+                samples.append(int(max(-32767, min(32767, tone + rng.gauss(0, noise)))))
+                t += 1 / rate
+
+        add(rng.uniform(0.8, 1.5), 0)                      # Room noise before speaking
+        for w in range(rng.randint(3, 9)):                 # Words
+            add(rng.uniform(0.15, 0.45), rng.uniform(2500, 9000), rng.uniform(120, 260))
+            gap = rng.uniform(0.5, 0.9) if w == 1 and rng.random() < 0.4 else rng.uniform(0.05, 0.25)
+            add(gap, 0)                                    # Between words (sometimes a hesitation)
+        speech_end = t - gap
+        add(3.0, 0)                                        # Silence after the question
+
+        path = corpus / f"synth_{n:02d}.wav"
+        with wave.open(str(path), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+        path.with_suffix(".json").write_text(json.dumps({"speech_end": round(speech_end, 3)}) + "\n")
+    print(f"Wrote {count} synthetic clips to {corpus}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpointing delay benchmark (fixed pause vs adaptive VAD)")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help=f"Clip directory (default: {CORPUS_DIR})")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run", help="Benchmark the corpus (default)")
+    for p in (parser, run):
+        p.add_argument("--min-pause", type=float, default=ENDPOINT_MIN_PAUSE)
+        p.add_argument("--max-pause", type=float, default=ENDPOINT_MAX_PAUSE)
+    rec = sub.add_parser("record", help="Record a new clip from the microphone")
+    rec.add_argument("name")
+    rec.add_argument("--seconds", type=float, default=8)
+    syn = sub.add_parser("synth", help="Generate synthetic clips")
+    syn.add_argument("--count", type=int, default=20)
+    syn.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.name, args.seconds, args.corpus)
+    elif args.command == "synth":
+        synth(args.corpus, args.count, args.seed)
+    else:
+        sys.exit(bench(args.corpus, args.min_pause, args.max_pause))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# bench/bench_render.py - Ticket rendering cost: legacy render_ticket vs compiled TicketTemplate
+#
+# Renders short, long and streamed fortunes with the old per-call path (dict of
+# eight str.replace passes, header and footer re-sanitized and re-centered,
+# text encoded again by print_client) and with the compiled per-persona
+# template, checks both produce the same ticket, and puts the cost next to the
+# time the printer needs for the paper so it's clear rendering is off the
+# critical path.
+#
+#   python bench/bench_render.py
+#   python bench/bench_render.py --persona music --runs 2000
+
+import argparse
+import random
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config_loader import load_config
+from formatters import TicketTemplate, LineWrapper, TICKET_WIDTH, sanitize_for_thermal_printer
+from print_client import build_escpos_job
+
+PRINT_LINES_PER_SECOND = 25  # Rough 58 mm thermal printer speed, for scale
+
+WORDS = ("the stars lean toward you — a “quiet” door opens… trust what "
+         "you’ve already heard, café naïve • fortune favours the brave").split()
+
+
+def legacy_sanitize(text: str) -> str:
+    replacements = {
+        '‘': "'", '’': "'", '“': '"', '”': '"',
+        '–': '-', '—': '-', '…': '...', '•': '*',
+    }
+    for unicode_char, ascii_char in replacements.items():
+        text = text.replace(unicode_char, ascii_char)
+    return text
+
+
+def legacy_render(message: str, config: dict) -> bytes:
+    """render_ticket() + build_escpos_job() as they were: everything redone per ticket."""
+    header = legacy_sanitize(config.get("header", ""))
+    lines = ["", "", ""]
+    if header:
+        lines += [header.center(TICKET_WIDTH), "-" * TICKET_WIDTH]
+    lines.append(textwrap.fill(legacy_sanitize(message), width=TICKET_WIDTH))
+    footer = legacy_sanitize(config.get("footer", ""))
+    if footer:
+        lines += ["-" * TICKET_WIDTH, footer.center(TICKET_WIDTH)]
+    lines += ["", "", "", "", ""]
+    return build_escpos_job("\n".join(lines))
+
+
+def legacy_stream(message: str, deltas: list):
+    """LineWrapper as it was: the whole text re-sanitized on every delta."""
+    text = ""
+    for piece in deltas:
+        text += piece
+        clean = legacy_sanitize(text)
+        cut = max(clean.rfind(ch) for ch in "\t\n\x0b\x0c\r ")
+        if cut >= 0:
+            textwrap.wrap(clean[:cut], width=TICKET_WIDTH)
+    textwrap.wrap(legacy_sanitize(text), width=TICKET_WIDTH)
+
+
+def compiled_stream(deltas: list):
+    wrapper = LineWrapper()
+    for piece in deltas:
+        wrapper.feed(piece)
+    wrapper.finish()
+
+
+def fortune(rng: random.Random, chars: int) -> str:
+    out = []
+    while sum(len(w) + 1 for w in out) < chars:
+        out.append(rng.choice(WORDS))
+    return " ".join(out)
+
+
+def split_deltas(rng: random.Random, text: str) -> list:
+    deltas, i = [], 0
+    while i < len(text):
+        n = rng.randint(1, 6)
+        deltas.append(text[i:i + n])
+        i += n
+    return deltas
+
+
+def timed(fn, runs: int) -> float:
+    """Microseconds per call, best of three batches."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        best = min(best, (time.perf_counter() - start) / runs)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ticket rendering")
+    parser.add_argument("--persona", default="default")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    config = load_config(args.persona)
+    rng = random.Random(args.seed)
+    template = TicketTemplate(config)
+
+    # Same ticket both ways (the legacy sanitizer only knew typographic punctuation)
+    for _ in range(200):
+        text = fortune(rng, rng.randint(0, 400))
+        legacy = legacy_render(text, config)
+        if template.render_escpos(text) != legacy or build_escpos_job(template.render(text)) != legacy:
+            print(f"✗ Compiled template differs from legacy renderer for: {text!r}")
+            sys.exit(1)
+    print("✓ Compiled template output matches the legacy renderer\n")
+
+    print(f"Persona '{args.persona}', {args.runs} runs per case (µs per ticket)\n")
+    print(f"  {'case':<22}{'legacy':>10}{'compiled':>10}{'speedup':>9}{'of print':>10}")
+    for name, chars in (("short (120 chars)", 120), ("typical (300 chars)", 300), ("long (2000 chars)", 2000)):
+        text = fortune(rng, chars)
+        deltas = split_deltas(rng, text)
+        lines = len(template.render(text).splitlines())
+        print_us = lines / PRINT_LINES_PER_SECOND * 1e6
+        for case, old, new in (
+            (name, lambda: legacy_render(text, config), lambda: template.render_escpos(text)),
+            ("  streamed", lambda: legacy_stream(text, deltas), lambda: compiled_stream(deltas)),
+        ):
+            runs = max(10, args.runs // (10 if case.startswith(" ") else 1))
+            t_old, t_new = timed(old, runs), timed(new, runs)
+            print(f"  {case:<22}{t_old:>10.1f}{t_new:>10.1f}{t_old / t_new:>8.1f}x{t_new / print_us:>9.3%}")
+
+    mixed = "café őrül ﬁn \U0001F52E \x1b@ ½ °"
+    print(f"\n  Sanitized sample: {mixed!r} -> {sanitize_for_thermal_printer(mixed)!r}")
+
+
+if __name__ == "__main__":
+    main()
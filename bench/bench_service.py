@@ -0,0 +1,225 @@
+# bench/bench_service.py - Offline fleet load test of the fortune service
+#
+# Starts fortune_service.py with its mock provider (sim_devices.MockAIServer)
+# in a subprocess and drives it from --kiosks simulated kiosks in this
+# process, each going through ai_client with AI_PROVIDERS=service exactly like
+# a real kiosk: customers arrive at --rate per kiosk per hour and ask from a
+# small festival mix (--repeat of them the persona's default question, as shy
+# customers do), answered whole or streamed (--stream), while every kiosk
+# also tops up its fortune pool in the background.
+#
+# Reports customer latency, failures, how many upstream calls the whole
+# fleet needed (coalescing and refill batching at work) and what the rate
+# limit turned away. A customer left without a fortune exits 1.
+#
+#   python bench/bench_service.py                            # 8 kiosks x 10 customers at 240/h
+#   python bench/bench_service.py --kiosks 20 --rate 0        # every customer at once
+#   python bench/bench_service.py --concurrency 2 --rate-limit 60 --stream
+#   python bench/bench_service.py --no-coalesce --json out.json
+
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sim_devices import arrival_times
+
+QUESTIONS = (
+    "Will I find love this year?",
+    "will i find love this year",
+    "What does my future hold?",
+    "Should I change jobs?",
+    "Will I be rich?",
+    "Is my band going to make it?",
+    "Where will I travel next?",
+    "Will my team win the league?",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def start_service(args, port: int):
+    """fortune_service.py --mock in a subprocess; returns it once /health answers."""
+    env = dict(os.environ, SERVICE_CONCURRENCY=str(args.concurrency), SERVICE_RATE_PER_MINUTE=str(args.rate_limit),
+               SERVICE_COALESCE="1" if args.coalesce else "0", SERVICE_SIMILARITY=str(args.similarity),
+               SERVICE_QUEUE_SECONDS=str(args.queue_seconds), SERVICE_CACHE="0", SERVICE_API_KEY="")
+    cmd = [sys.executable, str(ROOT / "fortune_service.py"), "--port", str(port), "--mock", args.ai_latency,
+           "--mock-tps", str(args.ai_tps), "--mock-error-rate", str(args.ai_error_rate), "--seed", str(args.seed)]
+    proc = subprocess.Popen(cmd, env=env, cwd=ROOT, stdout=None if args.verbose else subprocess.DEVNULL)
+    end = time.monotonic() + 20
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f"fortune_service.py exited with {proc.returncode}")
+        try:
+            _get(f"http://127.0.0.1:{port}/health")
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("fortune_service.py did not come up within 20s")
+
+
+def _percentiles(values) -> dict:
+    values = sorted(values)
+    pick = lambda q: values[int(q * (len(values) - 1))] if values else 0.0
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": values[-1] if values else 0.0}
+
+
+def run_fleet(args) -> dict:
+    """Customers and pool refills of every kiosk against the service; returns the results."""
+    import ai_client
+    from persona_registry import get_registry
+
+    ai_client.init_providers()
+    default_question = get_registry().get(args.persona).get("default_question", "What is my fortune?")
+    first, whole, failures, refilled = [], [], [], []
+    lock = threading.Lock()
+    customers_done = threading.Event()
+
+    def customer(question: str):
+        start = time.monotonic()
+        deadline = start + args.deadline
+        try:
+            if args.stream:
+                got_first = None
+                for _ in ai_client.stream_ai_response(question, deadline=deadline, persona=args.persona):
+                    got_first = got_first or time.monotonic()
+            else:
+                ai_client.get_ai_response(question, use_cache=False, use_pool=False, deadline=deadline,
+                                          persona=args.persona)
+                got_first = time.monotonic()
+        except Exception as e:
+            with lock:
+                failures.append(str(e))
+            return
+        with lock:
+            first.append(got_first - start)
+            whole.append(time.monotonic() - start)
+
+    def kiosk(k: int):
+        rng = random.Random(args.seed * 1000 + k)
+        started = time.monotonic()
+        for offset in arrival_times(args.customers, args.rate, args.arrivals, args.seed * 1000 + k):
+            time.sleep(max(0.0, started + offset - time.monotonic()))
+            customer(default_question if rng.random() < args.repeat else rng.choice(QUESTIONS))
+
+    def refills(k: int):
+        customers_done.wait(random.Random(k).uniform(0, args.refill_every))  # Kiosks out of step
+        while not customers_done.is_set():
+            try:
+                texts = ai_client.get_ai_batch(default_question, args.refill_size, persona=args.persona)
+                with lock:
+                    refilled.append(len(texts))
+            except Exception as e:
+                print(f"  ⚠ Kiosk {k} refill failed: {e}")
+            customers_done.wait(args.refill_every)
+
+    kiosks = [threading.Thread(target=kiosk, args=(k,), daemon=True) for k in range(args.kiosks)]
+    background = [threading.Thread(target=refills, args=(k,), daemon=True)
+                  for k in range(args.kiosks if args.refill_size > 0 else 0)]
+    t0 = time.monotonic()
+    for t in kiosks + background:
+        t.start()
+    for t in kiosks:
+        t.join()
+    elapsed = time.monotonic() - t0
+    customers_done.set()
+    for t in background:
+        t.join(timeout=args.deadline)
+    return {"customers": len(whole), "failed": len(failures), "errors": sorted(set(failures))[:5],
+            "seconds": elapsed, "first": _percentiles(first), "whole": _percentiles(whole),
+            "refills": len(refilled), "refill_fortunes": sum(refilled)}
+
+
+def report(results: dict, stats: dict, args):
+    total = args.kiosks * args.customers
+    mode = "streamed" if args.stream else "whole"
+    rate = f"{args.rate:g}/h per kiosk" if args.rate > 0 else "all at once"
+    q = lambda d: f"p50 {d['p50']:.2f}s  p90 {d['p90']:.2f}s  p99 {d['p99']:.2f}s  max {d['max']:.2f}s"
+    print(f"\n📊 Fleet: {args.kiosks} kiosks, {results['customers']}/{total} customers served ({mode}, {rate}) "
+          f"in {results['seconds']:.1f}s")
+    print(f"  {'first text' if args.stream else 'answer':<18}{q(results['first'])}")
+    if args.stream:
+        print(f"  {'whole answer':<18}{q(results['whole'])}")
+    print(f"  {'failed':<18}{results['failed']}" + (f"  ({'; '.join(results['errors'])})" if results["errors"] else ""))
+    requests = stats["requests"] or 1
+    print(f"  {'coalesced':<18}{stats['coalesced']}/{stats['requests']} customer requests ({stats['coalesced'] / requests:.0%})")
+    print(f"  {'refills':<18}{results['refills']} requests, {results['refill_fortunes']} fortunes "
+          f"in {stats['refill_batches']} upstream batches")
+    print(f"  {'rate-limited':<18}{stats['rate_limited']}")
+    mock = stats.get("mock", {})
+    print(f"  {'upstream':<18}{stats['upstream']} calls ({stats['upstream_failed']} failed), "
+          f"mock provider saw {mock.get('requests', '?')} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of fortune_service.py with simulated kiosks")
+    parser.add_argument("--kiosks", type=int, default=8)
+    parser.add_argument("--customers", type=int, default=10, help="Customers per kiosk")
+    parser.add_argument("--rate", type=float, default=240, help="Customers per kiosk per hour; 0 = all at once")
+    parser.add_argument("--arrivals", choices=["poisson", "fixed"], default="poisson")
+    parser.add_argument("--repeat", type=float, default=0.3, help="Share of customers asking the default question")
+    parser.add_argument("--stream", action="store_true", help="Stream answers, as kiosks with --stream do")
+    parser.add_argument("--persona", default="default")
+    parser.add_argument("--deadline", type=float, default=30.0, help="Seconds a customer waits for a fortune")
+    parser.add_argument("--refill-size", type=int, default=3, help="Fortunes per pool refill request (0 = none)")
+    parser.add_argument("--refill-every", type=float, default=5.0, help="Seconds between a kiosk's refills")
+    parser.add_argument("--concurrency", type=int, default=8, help="SERVICE_CONCURRENCY")
+    parser.add_argument("--rate-limit", type=float, default=0, help="SERVICE_RATE_PER_MINUTE (0 = none)")
+    parser.add_argument("--queue-seconds", type=float, default=20.0, help="SERVICE_QUEUE_SECONDS")
+    parser.add_argument("--coalesce", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--similarity", type=float, default=0.9, help="SERVICE_SIMILARITY")
+    parser.add_argument("--ai-latency", default="lognormal:1.2,0.35", help="Mock time to first token")
+    parser.add_argument("--ai-tps", type=float, default=40.0, help="Mock tokens per second after the first")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Show the service's own output")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    port = _free_port()
+    service = start_service(args, port)
+    # This process plays every kiosk: one client, wide enough for the whole fleet
+    os.environ.update(AI_PROVIDERS="service", FORTUNE_SERVICE_URL=f"http://127.0.0.1:{port}/v1",
+                      FORTUNE_SERVICE_KEY="local", AI_MAX_CONNECTIONS=str(4 * args.kiosks),
+                      AI_WARMUP="0", AI_KEEPALIVE_SECONDS="0", RESPONSE_CACHE="0")
+    try:
+        results = run_fleet(args)
+        stats = _get(f"http://127.0.0.1:{port}/stats")
+    finally:
+        service.send_signal(signal.SIGINT)
+        try:
+            service.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            service.kill()
+    report(results, stats, args)
+    if args.json:
+        args.json.write_text(json.dumps({"config": vars(args) | {"json": None}, "results": results,
+                                         "service": stats}, indent=2, default=str) + "\n")
+    if results["failed"]:
+        print(f"\n✗ {results['failed']} customer(s) left without a fortune")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# boot.py - Parallel startup phases with a per-phase timing report
+#
+# Persona registry, AI client, mic, speech model, printer and Arduino each come
+# up on their own thread, so a (re)start costs the slowest phase -- normally
+# the Arduino's reset, ended by its READY line -- instead of the sum of them.
+# A failed phase is reported and its result left as None; the caller decides
+# whether it can run without it.
+
+import threading
+import time
+
+STARTED = time.monotonic()  # Import time of this module ~ process start (imported first)
+
+
+class BootSequence:
+    """Named startup phases run concurrently, optionally after other phases."""
+
+    def __init__(self, started: float = None):
+        self.started = started if started is not None else STARTED
+        self._phases = []   # (name, fn, after)
+        self.results = {}   # name -> return value (None if it failed)
+        self.timings = {}   # name -> (start offset, end offset, error or None)
+        self._done = {}     # name -> threading.Event
+        self.finished = None
+
+    def add(self, name: str, fn, after=()):
+        """Register fn() as phase name; it starts once the phase(s) named in after are done."""
+        self._phases.append((name, fn, after))
+        self._done[name] = threading.Event()
+        return self
+
+    def run(self) -> dict:
+        """Run every phase and wait for all of them. Returns {name: result}."""
+        self.timings["imports"] = (0.0, time.monotonic() - self.started, None)
+        threads = [threading.Thread(target=self._run_phase, args=phase, name=f"boot-{phase[0]}", daemon=True)
+                   for phase in self._phases]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.finished = time.monotonic() - self.started
+        return self.results
+
+    def _run_phase(self, name: str, fn, after):
+        try:
+            for other in ([after] if isinstance(after, str) else after):
+                self._done[other].wait()
+            start = time.monotonic() - self.started
+            error = None
+            try:
+                self.results[name] = fn()
+            except Exception as e:
+                self.results[name] = None
+                error = e
+            self.timings[name] = (start, time.monotonic() - self.started, error)
+        finally:
+            self._done[name].set()
+
+    def report(self) -> str:
+        lines = [f"⏱️  Ready in {self.finished:.2f}s"]
+        for name, (start, end, error) in sorted(self.timings.items(), key=lambda kv: kv[1][0]):
+            note = f"  ✗ {error}" if error else ""
+            lines.append(f"     {name:<10}{start:6.2f}s → {end:5.2f}s  ({end - start:.2f}s){note}")
+        return "\n".join(lines)
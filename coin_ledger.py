@@ -0,0 +1,135 @@
+# coin_ledger.py - Thread-safe queue of paid customer credits
+#
+# Every COIN line is recorded with its arrival time, converted to credits
+# (COIN_PULSES_PER_CREDIT pulses buy one fortune) and queued until a cycle
+# picks it up. Coins that can't be served -- the spurious one at boot, ones
+# lost to a reconnect, or ones beyond COIN_QUEUE_MAX -- are counted as dropped
+# instead of vanishing silently.
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class CoinEvent:
+    """One credit waiting for a customer cycle."""
+
+    __slots__ = ("pulses", "arrived", "source", "wait")
+
+    def __init__(self, pulses: int, source: str = "serial"):
+        self.pulses = pulses
+        self.arrived = time.monotonic()
+        self.source = source
+        self.wait = None  # Seconds spent queued, set when served
+
+
+class CoinLedger:
+    """Credit accounting, bounded queue with backpressure, and coin counters.
+
+    on_backpressure(full: bool) is called when the queue fills up and again
+    when it has room, e.g. to switch the LEDs to a "busy" animation.
+    """
+
+    def __init__(self, max_depth: int = None, pulses_per_credit: int = None, on_backpressure=None):
+        self.max_depth = max_depth if max_depth is not None else int(os.getenv("COIN_QUEUE_MAX", "5"))
+        self.pulses_per_credit = max(1, pulses_per_credit if pulses_per_credit is not None
+                                     else int(os.getenv("COIN_PULSES_PER_CREDIT", "1")))
+        self.on_backpressure = on_backpressure
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._carry = 0  # Pulses not yet worth a whole credit
+        self._full = False
+        self._closed = False
+        self.queued = 0
+        self.served = 0
+        self.dropped = {}  # reason -> credits
+        self._waits = deque(maxlen=200)
+
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def add_pulses(self, pulses: int, source: str = "serial") -> int:
+        """Record a coin; returns the number of credits queued (dropped ones excluded)."""
+        granted = 0
+        with self._cond:
+            self._carry += pulses
+            credits, self._carry = divmod(self._carry, self.pulses_per_credit)
+            for _ in range(credits):
+                if self.max_depth and len(self._queue) >= self.max_depth:
+                    self._drop_locked(1, "queue full")
+                    continue
+                self._queue.append(CoinEvent(pulses, source))
+                self.queued += 1
+                granted += 1
+            self._cond.notify_all()
+        self._update_backpressure()
+        return granted
+
+    def drop(self, pulses: int, reason: str):
+        """Count a coin that will never be served (boot noise, reconnect, ...)."""
+        credits = max(1, pulses // self.pulses_per_credit)
+        with self._cond:
+            self._drop_locked(credits, reason)
+
+    def _drop_locked(self, credits: int, reason: str):
+        self.dropped[reason] = self.dropped.get(reason, 0) + credits
+        print(f"  ⚠ Coin dropped ({reason}) - {self.summary()}")
+
+    def next_coin(self, timeout: float = None):
+        """Take the oldest credit (blocking up to timeout). None on timeout or close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue or self._closed, timeout):
+                return None
+            if not self._queue:
+                return None
+            event = self._queue.popleft()
+            event.wait = time.monotonic() - event.arrived
+            self._waits.append(event.wait)
+            self.served += 1
+        self._update_backpressure()
+        return event
+
+    def close(self):
+        """Wake every waiter; next_coin() returns None once the queue is empty."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _update_backpressure(self):
+        with self._cond:
+            full = bool(self.max_depth) and len(self._queue) >= self.max_depth
+            changed = full != self._full
+            self._full = full
+        if changed and self.on_backpressure:
+            try:
+                self.on_backpressure(full)
+            except Exception as e:
+                print(f"  ⚠ Backpressure callback error: {e}")
+
+    # ---- Metrics ----
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "queued": self.queued,
+                "served": self.served,
+                "dropped": dict(self.dropped),
+                "depth": len(self._queue),
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p90": waits[int(0.9 * (len(waits) - 1))] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+
+    def summary(self) -> str:
+        """One-line counter summary for the console."""
+        with self._cond:  # Re-entrant: also used while the lock is held
+            dropped = sum(self.dropped.values())
+            reasons = ", ".join(f"{k}={v}" for k, v in self.dropped.items())
+            avg = sum(self._waits) / len(self._waits) if self._waits else 0.0
+            text = f"queued={self.queued} served={self.served} dropped={dropped}"
+            if reasons:
+                text += f" ({reasons})"
+            return text + f" depth={len(self._queue)} wait avg {avg:.1f}s"
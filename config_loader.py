@@ -1,9 +1,21 @@
 from pathlib import Path
 import json
+import math
+import re
+from collections import Counter
 
 # Resolve paths relative to this file, not the working directory
 _BASE_DIR = Path(__file__).resolve().parent
 
+# Words too common to say anything about which snippet a question is about
+_STOPWORDS = set("""
+a about after again all am an and any are as at be been before but by can could did do does
+doing for from get got had has have he her here him his how i if in into is it its just know
+like me might more most my no not now of on one or our out over she should so some than that
+the their them then there they this to too up us very was we were what when where which who
+why will with would you your yours
+""".split())
+
 
 def list_personas():
     """Return sorted list of available persona names."""
@@ -16,10 +28,122 @@ def list_personas():
     )
 
 
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken if installed, otherwise the ~4 chars/token estimate."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    except Exception:
+        return math.ceil(len(text) / 4)
+
+
+def compact_prompt(text: str) -> str:
+    """Drop what costs tokens but tells the model nothing: trailing spaces, blank-line
+    runs, bold markers and horizontal rules. Headings keep one blank line above them."""
+    lines = []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        line = line.rstrip().replace("**", "")
+        if not line or re.fullmatch(r"-{3,}|\*{3,}|_{3,}", line):
+            continue
+        if line.startswith("#") and lines:
+            lines.append("")
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def _words(text: str) -> list:
+    return [w for w in re.findall(r"[a-z0-9']+", text.lower().replace("\u2019", "'"))
+            if len(w) > 2 and w not in _STOPWORDS]
+
+
+class KnowledgeIndex:
+    """Small keyword (TF-IDF) index over a persona's knowledge markdown.
+
+    Files are split into snippets at "## " headings, blank lines and dash-only
+    separator lines (stanzas); search() returns the snippets that share the
+    rarest words with a question.
+    """
+
+    def __init__(self, paths):
+        self.snippets = []  # (title, text)
+        for path in paths:
+            title = ""
+            text = Path(path).read_text(encoding="utf-8")
+            for block in re.split(r"\n\s*\n|\n[ \t]*[-\u2013\u2014]+[ \t]*(?=\n)", text):
+                block = block.strip()
+                if block.startswith("## "):
+                    title, _, block = block.partition("\n")
+                    title = title[3:].strip()
+                    block = block.strip()
+                if block and not block.startswith("# "):
+                    self.snippets.append((title, block))
+        self._terms = [Counter(_words(f"{t} {b}")) for t, b in self.snippets]
+        df = Counter(w for terms in self._terms for w in terms)
+        self._idf = {w: math.log(len(self.snippets) / n) + 1.0 for w, n in df.items()}
+
+    def search(self, question: str, limit: int = 2, max_chars: int = 600) -> list:
+        words = set(_words(question))
+        scored = []
+        for i, terms in enumerate(self._terms):
+            score = sum(self._idf[w] * (1 + math.log(terms[w])) for w in words if w in terms)
+            if score > 0:
+                scored.append((score, i))
+        results, used = [], 0
+        for score, i in sorted(scored, reverse=True)[:limit]:
+            title, text = self.snippets[i]
+            if len(text) > max_chars // limit:
+                # Long verse: keep just the lines that mention the question's words
+                lines = (line.strip() for line in text.split("\n") if words & set(_words(line)))
+                text = "\n".join(dict.fromkeys(lines))  # Choruses repeat; send each line once
+            snippet = f"{title}: {text}" if title else text
+            if used + len(snippet) > max_chars:
+                continue
+            results.append(snippet)
+            used += len(snippet)
+        return results
+
+
+def build_prompt(cfg: dict, persona_dir: Path):
+    """Assemble the cacheable part of a persona's prompt.
+
+    The system prompt becomes one stable, compacted block -- persona prompt plus
+    the length rule -- identical on every request so providers can reuse their
+    prefix cache. Per-question material (the question and any knowledge_files
+    snippets, see KnowledgeIndex) goes last, in the user message.
+    """
+    max_chars = cfg.get("style_rules", {}).get("max_chars")
+    prompt = compact_prompt(cfg["system_prompt"])
+    if max_chars:
+        prompt += f"\nKeep every fortune under {max_chars} characters.\n"
+    cfg["system_prompt"] = prompt
+
+    files = [(persona_dir / f).resolve() for f in cfg.get("knowledge_files", [])]
+    missing = [str(f) for f in files if not f.exists()]
+    if missing:
+        raise FileNotFoundError(f"Knowledge file not found: {', '.join(missing)}")
+    cfg["_knowledge"] = KnowledgeIndex(files) if files else None
+
+
+def prompt_report(persona: str) -> str:
+    """Token counts for a persona's prompt: raw, compacted, and the knowledge it can draw on."""
+    persona_dir = _BASE_DIR / "personas" / persona
+    raw = json.loads((persona_dir / "content.json").read_text(encoding="utf-8"))
+    raw_prompt = raw.get("system_prompt") or (persona_dir / raw["system_prompt_file"]).read_text(encoding="utf-8")
+    cfg = load_config(persona)
+    line = (f"{persona}: system prompt {count_tokens(raw_prompt)} → {count_tokens(cfg['system_prompt'])} tokens "
+            f"(stable prefix)")
+    index = cfg["_knowledge"]
+    if index:
+        knowledge = sum(count_tokens(f"{t}: {b}") for t, b in index.snippets)
+        line += f", knowledge {knowledge} tokens in {len(index.snippets)} snippets (≤ ~150 sent per question)"
+    return line
+
+
 def load_config(persona: str = "default"):
     """Load persona config from personas/<persona>/content.json.
 
-    Resolves system_prompt_file relative to the persona directory.
+    Resolves system_prompt_file relative to the persona directory and runs the
+    prompt build step (build_prompt).
     Falls back to 'default' persona if the requested one doesn't exist.
     """
     persona_dir = _BASE_DIR / "personas" / persona
@@ -49,6 +173,8 @@ def load_config(persona: str = "default"):
             "Check prompts.md or content.json in the persona directory."
         )
 
+    build_prompt(cfg, persona_dir)
+
     # Stash persona name for downstream use
     cfg["_persona_name"] = persona
 
@@ -0,0 +1,258 @@
+# endpointing.py - Adaptive end-of-speech detection on top of speech_recognition
+#
+# The fixed flow paid ~0.8 s of ambient calibration plus a 1.5 s pause on every
+# customer. Here the microphone stays open: between customers a reader thread
+# keeps a running estimate of the noise floor, and during a question each frame
+# goes through a small voice-activity state machine whose required trailing
+# silence adapts to how the customer actually speaks.
+
+import array
+import math
+import os
+import queue
+import threading
+import time
+
+try:
+    import audioop  # Deprecated in 3.11+, still the fastest RMS where available
+except ImportError:
+    audioop = None
+
+MIN_FLOOR = 50.0  # int16 RMS; keeps ratios meaningful in a dead-silent room
+
+# Trailing silence that ends a question: max early in the question, min once settled
+ENDPOINT_MIN_PAUSE = float(os.getenv("ENDPOINT_MIN_PAUSE", "0.6"))
+ENDPOINT_MAX_PAUSE = float(os.getenv("ENDPOINT_MAX_PAUSE", "1.2"))
+
+
+def frame_rms(frame: bytes, sample_width: int = 2) -> float:
+    """Root-mean-square energy of one PCM frame."""
+    if audioop is not None:
+        return float(audioop.rms(frame, sample_width))
+    samples = array.array("h", frame[: len(frame) // 2 * 2])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class NoiseFloor:
+    """Slow exponential average of non-speech frame energy."""
+
+    def __init__(self, initial: float = None, alpha: float = 0.05, speech_ratio: float = 3.0):
+        self.value = initial
+        self.alpha = alpha
+        self.speech_ratio = speech_ratio
+        self.samples = 0
+
+    def update(self, rms: float):
+        self.samples += 1
+        if self.value is None:
+            self.value = max(rms, MIN_FLOOR)
+        elif rms < self.value * self.speech_ratio:  # Ignore speech/bangs
+            self.value = max(MIN_FLOOR, self.value + self.alpha * (rms - self.value))
+
+
+class Endpointer:
+    """Frame-level voice-activity detector with an adaptive end-of-speech pause.
+
+    Speech starts once `start_frames` consecutive frames exceed floor*start_ratio
+    and ends after enough frames below floor*end_ratio. The required pause is
+    max_pause until `settle` seconds of speech have been heard (people hesitate
+    early: "will I... find love?"), then min_pause -- but never shorter than 1.3x
+    the longest gap the speaker has already made mid-question.
+    """
+
+    WAITING, SPEECH, DONE = "waiting", "speech", "done"
+
+    def __init__(self, frame_seconds: float, floor: float, start_ratio: float = 3.0,
+                 end_ratio: float = 2.0, min_pause: float = ENDPOINT_MIN_PAUSE, max_pause: float = ENDPOINT_MAX_PAUSE,
+                 settle: float = 1.2, start_frames: int = 2):
+        self.frame_seconds = frame_seconds
+        self.floor = max(floor or MIN_FLOOR, MIN_FLOOR)
+        self.start_ratio = start_ratio
+        self.end_ratio = end_ratio
+        self.min_pause = min_pause
+        self.max_pause = max_pause
+        self.settle = settle
+        self.start_frames = start_frames
+        self.state = self.WAITING
+        self.frames = 0            # Frames pushed so far
+        self.speech_start = None   # Frame index where speech began
+        self.speech_end = None     # Frame index just after the last voiced frame
+        self._loud_run = 0
+        self._silence = 0          # Consecutive quiet frames while in speech
+        self._longest_gap = 0.0
+
+    @property
+    def silence_seconds(self) -> float:
+        """Length of the current quiet run inside speech."""
+        return self._silence * self.frame_seconds
+
+    def required_pause(self) -> float:
+        # Measured up to the last voiced frame, so a hesitation doesn't count as speech
+        spoken = (self.speech_end - self.speech_start) * self.frame_seconds if self.speech_start is not None else 0.0
+        base = self.max_pause if spoken < self.settle else self.min_pause
+        return min(self.max_pause, max(base, self._longest_gap * 1.3))
+
+    def push(self, rms: float) -> str:
+        """Feed one frame's energy; returns the new state."""
+        self.frames += 1
+        if self.state == self.WAITING:
+            if rms > self.floor * self.start_ratio:
+                self._loud_run += 1
+                if self._loud_run >= self.start_frames:
+                    self.state = self.SPEECH
+                    self.speech_start = self.frames - self._loud_run
+                    self.speech_end = self.frames
+            else:
+                self._loud_run = 0
+        elif self.state == self.SPEECH:
+            if rms > self.floor * self.end_ratio:
+                if self._silence:
+                    self._longest_gap = max(self._longest_gap, self._silence * self.frame_seconds)
+                self._silence = 0
+                self.speech_end = self.frames
+            else:
+                self._silence += 1
+                if self._silence * self.frame_seconds >= self.required_pause():
+                    self.state = self.DONE
+        return self.state
+
+
+class MicListener:
+    """Keeps one microphone stream open and listens with adaptive endpointing.
+
+    A single reader thread owns the stream. While no question is being recorded
+    (and tracking isn't paused, e.g. during our own sound effects) it feeds the
+    noise floor; during listen() it hands frames to the caller instead, so no
+    stale audio ever builds up.
+    """
+
+    def __init__(self, device_index=None, preroll: float = 0.3, chunk_pause: float = 0.3,
+                 min_chunk: float = 1.0, microphone=None, **endpointer_opts):
+        self.device_index = device_index
+        self.microphone = microphone  # sr.Microphone-like source to use instead of a real mic
+        self.preroll = preroll
+        self.chunk_pause = chunk_pause  # Mid-question gap long enough to cut a chunk at
+        self.min_chunk = min_chunk      # Shortest chunk worth sending on its own
+        self.endpointer_opts = endpointer_opts
+        self.floor = NoiseFloor()
+        self._mic = None
+        self._source = None
+        self._consumer = None
+        self._tracking = threading.Event()
+        self._tracking.set()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_endpoint_delay = None  # Seconds of silence waited after the last question
+        self.last_speech_bytes = None    # Offset in the last recording where speech ended
+
+    def start(self, settle: float = 0.3):
+        """Open the microphone and start tracking ambient noise. Raises if no mic.
+
+        Waits `settle` seconds so even the first customer gets a real noise floor.
+        """
+        import speech_recognition as sr
+        self._mic = self.microphone or sr.Microphone(device_index=self.device_index)
+        self._source = self._mic.__enter__()
+        self._thread = threading.Thread(target=self._read_loop, name="mic-reader", daemon=True)
+        self._thread.start()
+        wanted = max(1, int(settle / self.frame_seconds))
+        until = time.monotonic() + settle + 1.0
+        while self.floor.samples < wanted and time.monotonic() < until and not self._stop.is_set():
+            time.sleep(0.02)
+        return self
+
+    @property
+    def frame_seconds(self) -> float:
+        return self._source.CHUNK / self._source.SAMPLE_RATE
+
+    @property
+    def sample_rate(self) -> int:
+        return self._source.SAMPLE_RATE
+
+    @property
+    def sample_width(self) -> int:
+        return self._source.SAMPLE_WIDTH
+
+    def pause_tracking(self):
+        """Stop updating the noise floor (our own sounds are about to play)."""
+        self._tracking.clear()
+
+    def resume_tracking(self):
+        self._tracking.set()
+
+    def listen(self, timeout: float = 10, phrase_time_limit: float = 8, on_chunk=None):
+        """Record one question and return it as sr.AudioData.
+
+        If on_chunk is given it is called with the raw PCM recorded so far (since
+        the previous chunk) whenever the speaker pauses mid-question; the chunks
+        are always a prefix of the returned audio.
+        Raises sr.WaitTimeoutError if nobody starts speaking within timeout.
+        """
+        import speech_recognition as sr
+        frames = queue.Queue()
+        ep = Endpointer(self.frame_seconds, self.floor.value, **self.endpointer_opts)
+        preroll = max(1, int(self.preroll / self.frame_seconds))
+        captured = []
+        cut = 0  # Frames of captured already handed to on_chunk
+        chunk_frames = int(self.min_chunk / self.frame_seconds)
+        started = time.monotonic()
+
+        self._consumer = frames
+        try:
+            while True:
+                try:
+                    frame, rms = frames.get(timeout=1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        raise sr.WaitTimeoutError("microphone stream closed")
+                    continue
+                captured.append(frame)
+                state = ep.push(rms)
+                elapsed = time.monotonic() - started
+                if state == Endpointer.WAITING:
+                    del captured[:-preroll]  # Keep only the pre-roll before speech
+                    if elapsed > timeout:
+                        raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                elif state == Endpointer.DONE:
+                    break
+                elif ep.speech_start is not None and (ep.frames - ep.speech_start) * ep.frame_seconds > phrase_time_limit:
+                    break
+                elif on_chunk and ep.silence_seconds >= self.chunk_pause and len(captured) - cut >= chunk_frames:
+                    on_chunk(b"".join(captured[cut:]))
+                    cut = len(captured)
+        finally:
+            self._consumer = None
+
+        trailing = ep.frames - (ep.speech_end or ep.frames)
+        self.last_endpoint_delay = trailing * ep.frame_seconds
+        self.last_speech_bytes = sum(len(f) for f in captured[:len(captured) - trailing])
+        return sr.AudioData(b"".join(captured), self._source.SAMPLE_RATE, self._source.SAMPLE_WIDTH)
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._mic is not None:
+            try:
+                self._mic.__exit__(None, None, None)
+            except Exception:
+                pass
+            self._mic = None
+
+    def _read_loop(self):
+        width = self._source.SAMPLE_WIDTH
+        while not self._stop.is_set():
+            try:
+                frame = self._source.stream.read(self._source.CHUNK)
+            except Exception as e:
+                print(f"  ⚠ Microphone read error: {e}")
+                self._stop.set()
+                return
+            rms = frame_rms(frame, width)
+            consumer = self._consumer
+            if consumer is not None:
+                consumer.put((frame, rms))
+            elif self._tracking.is_set():
+                self.floor.update(rms)
@@ -0,0 +1,7 @@
+# escpos_codes.py - ESC/POS command bytes shared by the ticket renderer and the printer driver
+
+ESC_INIT = b"\x1b@"              # Reset printer (code page PC437, default modes)
+ESC_ALIGN_CENTER = b"\x1ba\x01"
+GS_SIZE_NORMAL = b"\x1d!\x00"    # width=1, height=1
+ESC_FEED_6 = b"\x1bd\x06"        # Feed 6 lines so the ticket clears the cutter
+GS_CUT_FULL = b"\x1dV\x00"
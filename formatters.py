@@ -1,49 +1,221 @@
 import textwrap
+import unicodedata
+
+from escpos_codes import ESC_INIT, ESC_ALIGN_CENTER, GS_SIZE_NORMAL, ESC_FEED_6, GS_CUT_FULL
+
+PRINTER_CODEPAGE = "cp437"  # What ESC @ leaves the printer on (PC437)
+
+# Typographic characters with a better ASCII stand-in than their decomposition
+_THERMAL_REPLACEMENTS = {
+    '\u2018': "'",   # Left single quote
+    '\u2019': "'",   # Right single quote/apostrophe
+    '\u201a': "'",   # Low single quote
+    '\u201b': "'",   # Reversed single quote
+    '\u2032': "'",   # Prime
+    '\u201c': '"',   # Left double quote
+    '\u201d': '"',   # Right double quote
+    '\u201e': '"',   # Low double quote
+    '\u2033': '"',   # Double prime
+    '\u2039': '<',   # Single angle quotes
+    '\u203a': '>',
+    '\u2010': '-',   # Hyphen, non-breaking hyphen, figure dash
+    '\u2011': '-',
+    '\u2012': '-',
+    '\u2013': '-',   # En dash
+    '\u2014': '-',   # Em dash
+    '\u2015': '-',   # Horizontal bar
+    '\u2212': '-',   # Minus sign
+    '\u2026': '...', # Ellipsis
+    '\u2022': '*',   # Bullet point
+    '\u00d7': 'x',   # Multiplication sign
+    '\u00a9': '(c)',
+    '\u00ae': '(R)',
+    '\u2122': 'TM',
+    '\u20ac': 'EUR',
+    '\t': ' ', '\r': ' ', '\x0b': ' ', '\x0c': ' ',
+    '\u200b': '',    # Zero-width space / joiners / BOM
+    '\u200c': '',
+    '\u200d': '',
+    '\ufeff': '',
+}
+
+
+def _printable(ch: str) -> bool:
+    try:
+        ch.encode(PRINTER_CODEPAGE)
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+class _ThermalTable(dict):
+    """str.translate table for the printer's code page, filled in lazily.
+
+    Characters the code page has map to themselves; others to their accent-free
+    decomposition (accented letters lose the accent), nothing (control characters, emoji and
+    other symbols -- an ESC in the text would be a printer command) or '?'.
+    Each character is worked out once, then it's a plain dict hit.
+    """
+
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        if (code < 0x20 and ch != "\n") or code == 0x7f:
+            out = ""
+        elif _printable(ch):
+            out = ch
+        else:
+            base = "".join(c for c in unicodedata.normalize("NFKD", ch)
+                           if not unicodedata.combining(c) and _printable(c))
+            if base:
+                out = base
+            elif unicodedata.category(ch)[0] in "SCM":  # Symbols, controls, stray marks
+                out = ""
+            else:
+                out = "?"
+        self[code] = out
+        return out
+
+
+_THERMAL_TABLE = _ThermalTable({ord(k): v for k, v in _THERMAL_REPLACEMENTS.items()})
+for _code in range(0x20, 0x7f):
+    _THERMAL_TABLE[_code]  # Pre-warm plain ASCII
 
 
 def sanitize_for_thermal_printer(text: str) -> str:
-    """Replace Unicode characters that thermal printers can't handle with ASCII equivalents."""
-    replacements = {
-        '\u2018': "'",   # Left single quote
-        '\u2019': "'",   # Right single quote/apostrophe
-        '\u201c': '"',   # Left double quote
-        '\u201d': '"',   # Right double quote
-        '\u2013': '-',   # En dash
-        '\u2014': '-',   # Em dash
-        '\u2026': '...', # Ellipsis
-        '\u2022': '*',   # Bullet point
-    }
-    for unicode_char, ascii_char in replacements.items():
-        text = text.replace(unicode_char, ascii_char)
-    return text
+    """Map text onto what the thermal printer's code page can print, in one pass."""
+    return text.translate(_THERMAL_TABLE)
+
+
+def encode_for_printer(text: str) -> bytes:
+    """Sanitized text as printer bytes."""
+    return text.encode(PRINTER_CODEPAGE, errors="replace")
+
+
+TICKET_WIDTH = 32
+
+# Characters textwrap treats as word separators (str.isspace() is broader)
+_WRAP_WHITESPACE = "\t\n\x0b\x0c\r "
+
+
+def _center(line: str) -> str:
+    return line.center(TICKET_WIDTH)
+
+
+def ticket_header_lines(config: dict) -> list:
+    """Lines printed above the fortune body: tear-off spacing plus persona header."""
+    header = sanitize_for_thermal_printer(config.get("header", ""))
+    # Add extra spacing at top for tear-off
+    lines = ["", "", ""]  # 3 blank lines at top
+    if header:
+        lines += [_center(header), "-" * TICKET_WIDTH]
+    return lines
+
+
+def ticket_footer_lines(config: dict) -> list:
+    """Lines printed below the fortune body: persona footer plus tear-off spacing."""
+    footer = sanitize_for_thermal_printer(config.get("footer", ""))
+    lines = []
+    if footer:
+        lines += ["-" * TICKET_WIDTH, _center(footer)]
+    lines += ["", "", "", "", ""]  # 5 blank lines at bottom for tear-off
+    return lines
+
+
+class TicketTemplate:
+    """A persona's ticket frame, sanitized, centered and encoded once.
+
+    Per ticket only the fortune body is sanitized, wrapped and encoded; the
+    result is either the text render_ticket() gives or a ready-to-send ESC/POS
+    job (byte-for-byte what print_client.build_escpos_job() makes of that text).
+    """
+
+    def __init__(self, config: dict, width: int = TICKET_WIDTH):
+        self.width = width
+        self.header_lines = ticket_header_lines(config)
+        self.footer_lines = ticket_footer_lines(config)
+        self.header_text = "\n".join(self.header_lines) + "\n"
+        self.footer_text = "\n" + "\n".join(self.footer_lines)
+        self.header_bytes = encode_for_printer(self.header_text)
+        self._job_head = ESC_INIT + ESC_ALIGN_CENTER + GS_SIZE_NORMAL + self.header_bytes
+        self._job_tail = encode_for_printer(self.footer_text + "\n") + ESC_FEED_6 + GS_CUT_FULL
+
+    def body(self, message: str) -> str:
+        """Sanitized, wrapped fortune text."""
+        return textwrap.fill(sanitize_for_thermal_printer(message), width=self.width)
+
+    def text(self, body: str) -> str:
+        return self.header_text + body + self.footer_text
+
+    def escpos(self, body: str) -> bytes:
+        return self._job_head + encode_for_printer(body) + self._job_tail
+
+    def render(self, message: str) -> str:
+        return self.text(self.body(message))
+
+    def render_escpos(self, message: str) -> bytes:
+        return self.escpos(self.body(message))
+
+
+def ticket_template(config: dict = None) -> TicketTemplate:
+    """Compiled template for a persona config (the active persona's if None).
+
+    Kept on the config itself, so a hot-reloaded persona gets a fresh one.
+    """
+    if config is None:
+        from persona_registry import current_config
+        config = current_config()
+    template = config.get("_ticket")
+    if template is None:
+        template = config["_ticket"] = TicketTemplate(config)
+    return template
 
 
 def render_ticket(message: str, config: dict = None) -> str:
     """Format a fortune message as a thermal printer ticket.
 
-    If config is not provided, loads the default persona config.
+    If config is not provided, uses the active persona's config.
     """
-    if config is None:
-        from config_loader import load_config
-        config = load_config()
+    return ticket_template(config).render(message)
 
-    header = config.get("header", "")
-    footer = config.get("footer", "")
-    width = 32
 
-    # Sanitize all text for thermal printer
-    message = sanitize_for_thermal_printer(message)
-    header = sanitize_for_thermal_printer(header)
-    footer = sanitize_for_thermal_printer(footer)
+class LineWrapper:
+    """Incremental word-wrapper for streamed fortune text.
 
-    def center(line): return line.center(width)
-    body = textwrap.fill(message, width=width)
+    Emits body lines as soon as they can no longer change, producing exactly
+    the lines render_ticket() would for the full message. Only text up to the
+    last complete word is wrapped, and the last line of that is held back,
+    because a later word may still fit on it.
+    """
 
-    # Add extra spacing at top and bottom for tear-off
-    parts = ["", "", ""]  # 3 blank lines at top
-    if header: parts += [center(header), "-" * width]
-    parts += [body]
-    if footer:
-        parts += ["-" * width, center(footer)]
-    parts += ["", "", "", "", ""]  # 5 blank lines at bottom for tear-off
-    return "\n".join(parts)
+    def __init__(self, width: int = TICKET_WIDTH):
+        self.width = width
+        self._pending = ""  # Sanitized text from the held-back line on (translation is per character)
+        self._emitted = 0
+
+    def feed(self, text: str) -> list:
+        """Add streamed text; return any newly completed lines."""
+        clean = sanitize_for_thermal_printer(text)
+        self._pending += clean
+        if not any(ch in clean for ch in _WRAP_WHITESPACE):
+            return []  # No new word boundary, so no line can have completed
+        pending = self._pending
+        cut = max(pending.rfind(ch) for ch in _WRAP_WHITESPACE)
+        wrapped = pending[:cut].rstrip(_WRAP_WHITESPACE)
+        lines = textwrap.wrap(wrapped, width=self.width)
+        if len(lines) < 2:
+            return []
+        # Emitted lines are final: later wraps start from the held-back line, so
+        # a long fortune isn't re-wrapped from the top on every delta
+        self._pending = lines[-1] + pending[len(wrapped):]
+        return self._take(lines[:-1])
+
+    def finish(self) -> list:
+        """Flush the remaining lines once the text is complete."""
+        lines = textwrap.wrap(self._pending, width=self.width)
+        if not lines and self._emitted == 0:
+            lines = [""]  # render_ticket still prints an (empty) body line
+        return self._take(lines)
+
+    def _take(self, lines: list) -> list:
+        self._emitted += len(lines)
+        return lines
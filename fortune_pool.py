@@ -0,0 +1,181 @@
+# fortune_pool.py - Pre-generated fortunes for the default-question and fallback paths
+#
+# A per-persona pool of ready-made fortunes is kept on disk and topped up in the
+# background while the booth is idle. A shy customer (no question heard) or an AI
+# outage is then answered instantly instead of waiting on the network. The file
+# is written by the refill thread, never by the customer taking a fortune.
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Resolve paths relative to this file, not the working directory
+_BASE_DIR = Path(__file__).resolve().parent
+POOL_DIR = _BASE_DIR / ".cache" / "pool"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class FortunePool:
+    """Disk-backed pool of pre-generated fortunes for one persona.
+
+    generate() is called by a background thread, only while the pool is not
+    paused, whenever the pool drops below low_water; it refills up to size.
+    With generate_batch(n) the missing fortunes are asked for in one call
+    instead (it may return fewer). Entries older than ttl seconds are discarded.
+    """
+
+    def __init__(self, persona: str, generate, size: int = None, low_water: int = None,
+                 ttl: float = None, path: Path = None, generate_batch=None):
+        self.persona = persona
+        self.generate = generate
+        self.generate_batch = generate_batch
+        self.size = size if size is not None else _env_int("POOL_SIZE", 6)
+        self.low_water = low_water if low_water is not None else _env_int("POOL_LOW_WATER", 3)
+        self.ttl = ttl if ttl is not None else _env_float("POOL_TTL_HOURS", 12) * 3600
+        self.path = path or POOL_DIR / f"{persona}.json"
+        self._entries = []
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # One writer at a time (refill thread, stop())
+        self._dirty = False
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._paused = set()  # Holders of pause()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    # ---- Customer side ----
+    def take(self):
+        """Pop the oldest fresh fortune, or None if the pool is empty."""
+        with self._lock:
+            self._expire()
+            if not self._entries:
+                return None
+            entry = self._entries.pop(0)
+            self._dirty = True
+        self._wake.set()  # The refill thread saves the pool (and tops it up if low)
+        return entry["text"]
+
+    def pause(self, holder=None):
+        """Stop refilling (a customer cycle is using the AI and devices).
+
+        Booths sharing a pool pause it under their own name (holder); refilling
+        resumes once every holder has resumed.
+        """
+        with self._lock:
+            self._paused.add(holder)
+            self._idle.clear()
+
+    def resume(self, holder=None):
+        """Allow refilling again once the booth is idle."""
+        with self._lock:
+            self._paused.discard(holder)
+            if not self._paused:
+                self._idle.set()
+
+    # ---- Background refill ----
+    def start(self):
+        if self.size <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._refill_loop, name=f"pool-{self.persona}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._idle.set()
+        self._flush()
+
+    def _refill_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            self._flush()
+            if len(self) >= self.low_water:
+                # Re-check periodically so TTL expiry also triggers a refill
+                self._wake.wait(timeout=60)
+                self._wake.clear()
+                continue
+
+            while not self._stop.is_set() and len(self) < self.size:
+                self._idle.wait()
+                if self._stop.is_set():
+                    break
+                try:
+                    if self.generate_batch:
+                        texts = self.generate_batch(self.size - len(self))
+                    else:
+                        texts = [self.generate()]
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    print(f"  ⚠ Fortune pool refill failed ({self.persona}): {e}")
+                    # Back off while the AI is unavailable (max 5 minutes)
+                    self._stop.wait(min(300, 5 * 2 ** failures))
+                    continue
+                for text in texts:
+                    if text:
+                        self._add(text)
+                self._flush()
+
+    def _add(self, text: str):
+        with self._lock:
+            if any(e["text"] == text for e in self._entries):
+                return
+            self._entries.append({"text": text, "created": time.time()})
+            self._dirty = True
+
+    # ---- Persistence ----
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        self._entries = [e for e in self._entries if e["created"] >= cutoff]
+
+    def _load(self):
+        try:
+            self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._entries = []
+        except Exception as e:
+            print(f"  ⚠ Ignoring unreadable fortune pool {self.path}: {e}")
+            self._entries = []
+        self._expire()
+
+    def _flush(self):
+        """Write the pool to disk if it changed since the last write."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                entries = list(self._entries)
+            self._save(entries)
+
+    def _save(self, entries: list):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(entries, indent=1), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"  ⚠ Could not save fortune pool: {e}")
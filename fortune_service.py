@@ -0,0 +1,595 @@
+# fortune_service.py - One AI front for a fleet of kiosks
+#
+# Each kiosk normally talks to the AI providers itself. With this service on
+# one host and AI_PROVIDERS=service on the kiosks, the fleet shares one set of
+# pooled provider connections (AI_PROVIDERS here, hedged and retried as on a
+# kiosk), one response cache and one rate limit. It speaks the OpenAI chat
+# completions API, streamed or not, so kiosks keep building prompts from
+# their own personas and the service needs none.
+#
+# On the way through it:
+#   - coalesces: a request for the same prompt as one already in flight, or
+#     for a similar question (SERVICE_SIMILARITY), is answered from that call
+#     -- streams are fanned out delta by delta -- instead of a second one;
+#   - caches answers with SERVICE_CACHE=1, like RESPONSE_CACHE on a kiosk;
+#   - runs at most SERVICE_CONCURRENCY upstream calls at once and starts at
+#     most SERVICE_RATE_PER_MINUTE; a customer who can't get a slot within
+#     SERVICE_QUEUE_SECONDS gets HTTP 429 and the kiosk falls back to its pool;
+#   - batches pool refills: kiosks send them as low-priority requests for n
+#     answers, identical ones are merged into one upstream request of up to
+#     SERVICE_BATCH_MAX answers, and they only run while no customer waits.
+# GET /health and GET /stats report on it.
+#
+#   python fortune_service.py                           # AI_PROVIDERS from .env, port 8808
+#   python fortune_service.py --mock lognormal:1.2,0.35   # offline, mock provider (sim_devices)
+#   AI_PROVIDERS=service,pool python serial_trigger.py    # on each kiosk (FORTUNE_SERVICE_URL)
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8808"))
+SERVICE_API_KEY = os.getenv("SERVICE_API_KEY", "")  # Empty = no auth (localhost / trusted LAN)
+SERVICE_CONCURRENCY = int(os.getenv("SERVICE_CONCURRENCY", "8"))
+SERVICE_RATE_PER_MINUTE = float(os.getenv("SERVICE_RATE_PER_MINUTE", "0"))  # 0 = no rate limit
+SERVICE_QUEUE_SECONDS = float(os.getenv("SERVICE_QUEUE_SECONDS", "20"))
+SERVICE_COALESCE = os.getenv("SERVICE_COALESCE", "1").lower() in ("1", "true", "yes")
+SERVICE_SIMILARITY = float(os.getenv("SERVICE_SIMILARITY", "0.9"))  # 1 = identical prompts only
+SERVICE_CACHE = os.getenv("SERVICE_CACHE", "0").lower() in ("1", "true", "yes")
+SERVICE_BATCH_MAX = int(os.getenv("SERVICE_BATCH_MAX", "8"))
+SERVICE_BATCH_WAIT = float(os.getenv("SERVICE_BATCH_WAIT", "0.5"))  # Gather refills this long first
+SERVICE_REFILL_SECONDS = float(os.getenv("SERVICE_REFILL_SECONDS", "60"))  # Queue + upstream, per refill
+
+# Upstream connections (and hedge threads) for every slot, with room for hedges
+os.environ.setdefault("AI_MAX_CONNECTIONS", str(2 * SERVICE_CONCURRENCY))
+
+import ai_client  # noqa: E402 -- reads AI_MAX_CONNECTIONS on import
+from response_cache import ResponseCache, cosine, normalize_question, trigrams  # noqa: E402
+
+_BASE_DIR = Path(__file__).resolve().parent
+CACHE_PATH = _BASE_DIR / ".cache" / "service_cache.json"
+
+
+class RateLimited(Exception):
+    pass
+
+
+class RateLimiter:
+    """Upstream budget shared by every kiosk: `concurrency` calls at once, and at most
+    `per_minute` started a minute (a token bucket holding ten seconds' worth).
+
+    Customers go first: acquire(background=True) only succeeds while no
+    customer is waiting for a slot.
+    """
+
+    def __init__(self, concurrency: int, per_minute: float = 0.0):
+        self.concurrency = max(1, concurrency)
+        self.per_minute = per_minute
+        self.burst = max(1.0, per_minute / 6)
+        self.active = 0
+        self.waiting = 0  # Customers queued for a slot
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.per_minute > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.per_minute / 60)
+        self._stamp = now
+
+    def acquire(self, timeout: float = None, background: bool = False) -> bool:
+        """Take a slot (and a token), waiting up to timeout seconds. False if none came."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not background:
+                self.waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    starved = self.per_minute > 0 and self._tokens < 1
+                    if not starved and self.active < self.concurrency and not (background and self.waiting):
+                        self.active += 1
+                        if self.per_minute > 0:
+                            self._tokens -= 1
+                        return True
+                    wait = None if end is None else end - time.monotonic()
+                    if wait is not None and wait <= 0:
+                        return False
+                    if starved:
+                        next_token = (1 - self._tokens) * 60 / self.per_minute
+                        wait = next_token if wait is None else min(wait, next_token)
+                    self._cond.wait(wait)
+            finally:
+                if not background:
+                    self.waiting -= 1
+                    self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class _Flight:
+    """One upstream call and every request that joined it (coalescing)."""
+
+    def __init__(self, context: str, grams):
+        self.context = context   # Everything but the question: system prompt, history, max_tokens
+        self.grams = grams       # Question trigrams, for similar-question matching
+        self.deltas = []
+        self.done = False
+        self.error = None
+        self.listeners = 0
+        self._cond = threading.Condition()
+
+    def put(self, delta: str):
+        with self._cond:
+            self.deltas.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self._cond:
+            self.done, self.error = True, error
+            self._cond.notify_all()
+
+    def follow(self):
+        """Yield the answer's deltas from the start as they arrive; raises the call's error."""
+        sent = 0
+        while True:
+            with self._cond:
+                while sent >= len(self.deltas) and not self.done:
+                    self._cond.wait()
+                pending, sent = self.deltas[sent:], len(self.deltas)
+                done, error = self.done, self.error
+            yield from pending
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class _Refill:
+    """A queued low-priority request for n answers."""
+
+    __slots__ = ("n", "deadline", "texts", "error", "done")
+
+    def __init__(self, n: int, deadline: float):
+        self.n = n
+        self.deadline = deadline  # time.monotonic() after which the kiosk gets an error
+        self.texts = []
+        self.error = None
+        self.done = threading.Event()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # Kiosks hang up on streams they're done with
+            super().handle_error(request, client_address)
+
+
+class FortuneService:
+    """OpenAI-compatible HTTP front with coalescing, cache, rate limit and refill batching."""
+
+    def __init__(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, limiter: RateLimiter = None,
+                 coalesce: bool = SERVICE_COALESCE, similarity: float = SERVICE_SIMILARITY,
+                 cache: ResponseCache = None, queue_seconds: float = SERVICE_QUEUE_SECONDS,
+                 batch_max: int = SERVICE_BATCH_MAX, batch_wait: float = SERVICE_BATCH_WAIT,
+                 refill_seconds: float = SERVICE_REFILL_SECONDS, api_key: str = SERVICE_API_KEY):
+        self.host = host
+        self.port = port
+        self.limiter = limiter or RateLimiter(SERVICE_CONCURRENCY, SERVICE_RATE_PER_MINUTE)
+        self.coalesce = coalesce
+        self.similarity = similarity
+        self.cache = cache
+        self.queue_seconds = queue_seconds
+        self.batch_max = max(1, batch_max)
+        self.batch_wait = batch_wait
+        self.refill_seconds = refill_seconds
+        self.api_key = api_key
+        self.mock = None  # MockAIServer behind --mock, for /stats
+        self.counts = Counter(dict.fromkeys(
+            ("requests", "coalesced", "cache_hits", "upstream", "upstream_failed", "rate_limited",
+             "refill_requests", "refill_batches", "refill_fortunes", "refill_timeouts"), 0))
+        self._flights = {}             # prompt -> _Flight in progress
+        self._refills = OrderedDict()  # prompt -> (messages, max_tokens, [_Refill, ...]), oldest first
+        self._lock = threading.Lock()
+        self._refill_cond = threading.Condition()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    # ---- Customer requests ----
+    def join(self, messages: list, max_tokens: int, stream: bool = False) -> _Flight:
+        """The flight answering this prompt: one in progress for the same (or a similar)
+        question, or a new upstream call. Call leave() when done with it."""
+        context = json.dumps([messages[:-1], max_tokens], sort_keys=True)
+        question = messages[-1].get("content") or ""
+        key = context + "\n" + question
+        with self._lock:
+            self.counts["requests"] += 1
+            flight = self._flights.get(key) if self.coalesce else None
+            grams = trigrams(normalize_question(question))
+            if flight is None and self.coalesce and self.similarity < 1:
+                best = self.similarity
+                for candidate in self._flights.values():
+                    if candidate.context == context and not candidate.done:
+                        score = cosine(grams, candidate.grams)
+                        if score >= best:
+                            flight, best = candidate, score
+            if flight is not None:
+                self.counts["coalesced"] += 1
+                flight.listeners += 1
+                return flight
+            flight = _Flight(context, grams)
+            flight.listeners = 1
+            self._flights[key] = flight
+        threading.Thread(target=self._run, args=(flight, key, messages, max_tokens, stream),
+                         name="service-call", daemon=True).start()
+        return flight
+
+    def leave(self, flight: _Flight):
+        with self._lock:
+            flight.listeners -= 1
+
+    def _run(self, flight: _Flight, key: str, messages: list, max_tokens: int, stream: bool):
+        question = messages[-1].get("content") or ""
+        complete = False
+        try:
+            cached = self.cache.lookup(_digest(flight.context), question) if self.cache else None
+            if cached:
+                self._count("cache_hits")
+                flight.put(cached)
+                flight.finish()
+                return
+            if not self.limiter.acquire(self.queue_seconds):
+                self._count("rate_limited")
+                raise RateLimited(f"no upstream slot within {self.queue_seconds:g}s")
+            self._count("upstream")
+            try:
+                if stream:
+                    parts = ai_client.stream_messages(messages, max_tokens)
+                    try:
+                        for delta in parts:
+                            flight.put(delta)
+                            if flight.listeners <= 0:
+                                break  # Every kiosk hung up (they close once past max_chars)
+                        else:
+                            complete = True
+                    finally:
+                        parts.close()
+                else:
+                    text, _ = ai_client.complete_messages(messages, max_tokens)
+                    flight.put(text)
+                    complete = True
+            except Exception:
+                self._count("upstream_failed")
+                raise
+            finally:
+                self.limiter.release()
+        except Exception as e:
+            flight.finish(e)
+        else:
+            flight.finish()
+            if self.cache and complete:
+                self.cache.store(_digest(flight.context), question, "".join(flight.deltas))
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    # ---- Pool refills ----
+    def refill(self, messages: list, max_tokens: int, n: int) -> list:
+        """Up to n answers, served by the batcher when no customer is waiting. Blocks for
+        at most refill_seconds; TimeoutError if no answers came by then."""
+        order = _Refill(min(max(1, n), self.batch_max), time.monotonic() + self.refill_seconds)
+        key = json.dumps([messages, max_tokens], sort_keys=True)
+        self._count("refill_requests")
+        with self._refill_cond:
+            self._refills.setdefault(key, (messages, max_tokens, []))[2].append(order)
+            self._refill_cond.notify()
+        if not order.done.wait(self.refill_seconds):
+            self._count("refill_timeouts")
+            raise TimeoutError(f"no refill answers within {self.refill_seconds:g}s")
+        if order.error is not None:
+            raise order.error
+        return order.texts
+
+    def _batch_loop(self):
+        while True:
+            with self._refill_cond:
+                while not self._refills:
+                    self._refill_cond.wait()
+            time.sleep(self.batch_wait)  # Let other kiosks refilling the same persona join in
+            self.limiter.acquire(background=True)
+            try:
+                self._serve_batch()
+            finally:
+                self.limiter.release()
+
+    def _serve_batch(self):
+        with self._refill_cond:
+            key = next(iter(self._refills))
+            messages, max_tokens, orders = self._refills[key]
+            now = time.monotonic()
+            orders[:] = [order for order in orders if order.deadline > now]  # Their kiosks got an error
+            batch, total = [], 0
+            for order in orders:
+                if batch and total + order.n > self.batch_max:
+                    break
+                batch.append(order)
+                total += order.n
+            del orders[:len(batch)]
+            if not orders:
+                del self._refills[key]
+        if not batch:
+            return
+        self._count("upstream")
+        try:
+            texts, _ = ai_client.complete_batch(messages, max_tokens, total,
+                                                deadline=min(order.deadline for order in batch))
+        except Exception as e:
+            self._count("upstream_failed")
+            for order in batch:
+                order.error = e
+                order.done.set()
+            return
+        self._count("refill_batches")
+        self._count("refill_fortunes", len(texts))
+        unserved = []
+        for order in batch:
+            order.texts, texts = texts[:order.n], texts[order.n:]
+            if order.texts:
+                order.done.set()
+            else:
+                unserved.append(order)  # The provider ignored n; next batch
+        if unserved:
+            with self._refill_cond:
+                entry = self._refills.setdefault(key, (messages, max_tokens, []))
+                entry[2][:0] = unserved
+                self._refills.move_to_end(key, last=False)
+
+    # ---- Status ----
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counts)
+            out["in_flight"] = len(self._flights)
+        with self._refill_cond:
+            out["refills_queued"] = sum(o.n for _, _, orders in self._refills.values() for o in orders)
+        out["upstream_active"] = self.limiter.active
+        out["customers_waiting"] = self.limiter.waiting
+        if self.cache:
+            out["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+        out["providers"] = ai_client.provider_stats()
+        if self.mock is not None:
+            out["mock"] = {"requests": self.mock.requests, "errors": self.mock.errors}
+        return out
+
+    # ---- HTTP ----
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive: kiosks reuse their pooled connection
+
+            def _json(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status: int, message: str, kind: str = "server_error"):
+                self._json(status, {"error": {"message": message, "type": kind}})
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _authorized(self) -> bool:
+                if not service.api_key or self.headers.get("Authorization") == f"Bearer {service.api_key}":
+                    return True
+                self._error(401, "bad service key", "invalid_request_error")
+                return False
+
+            def do_GET(self):
+                if self.path.startswith("/health"):
+                    self._json(200, {"ok": True})
+                elif not self._authorized():
+                    return
+                elif self.path.startswith("/stats"):
+                    self._json(200, service.stats())
+                elif self.path.startswith("/v1/models"):
+                    model = self.path.rsplit("/", 1)[-1]  # Kiosk warm-up / keepalive ping
+                    self._json(200, {"id": model, "object": "model", "created": 0, "owned_by": "narly"})
+                else:
+                    self._error(404, "not found", "invalid_request_error")
+
+            def do_POST(self):
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                except ValueError:
+                    self._error(400, "body is not JSON", "invalid_request_error")
+                    return
+                if not self._authorized():
+                    return
+                messages = request.get("messages")
+                if not self.path.endswith("/chat/completions"):
+                    self._error(404, "not found", "invalid_request_error")
+                    return
+                if not isinstance(messages, list) or not messages:
+                    self._error(400, "messages missing", "invalid_request_error")
+                    return
+                max_tokens = request.get("max_tokens") or 256
+                model = request.get("model", "fortune")
+                n = request.get("n") or 1
+                if request.get("priority") == "background" or n > 1:
+                    try:
+                        texts = service.refill(messages, max_tokens, n)
+                    except Exception as e:
+                        self._error(502, f"upstream: {e}")
+                        return
+                    self._completion(model, texts)
+                    return
+
+                stream = bool(request.get("stream"))
+                flight = service.join(messages, max_tokens, stream)
+                try:
+                    if stream:
+                        self._stream(model, flight.follow())
+                    else:
+                        try:
+                            text = "".join(flight.follow())
+                        except RateLimited as e:
+                            self._error(429, str(e), "rate_limit_error")
+                            return
+                        except Exception as e:
+                            self._error(502, f"upstream: {e}")
+                            return
+                        self._completion(model, [text])
+                finally:
+                    service.leave(flight)
+
+            def _completion(self, model: str, texts: list):
+                self._json(200, {
+                    "id": "chatcmpl-narly", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": i, "message": {"role": "assistant", "content": t},
+                                 "finish_reason": "stop"} for i, t in enumerate(texts)],
+                })
+
+            def _stream(self, model: str, deltas):
+                # Hold the status until the first delta, so a failed upstream is an HTTP
+                # error the kiosk can move on from before anything is printed
+                try:
+                    first = next(deltas)
+                except StopIteration:
+                    self._error(502, "upstream: empty stream")
+                    return
+                except RateLimited as e:
+                    self._error(429, str(e), "rate_limit_error")
+                    return
+                except Exception as e:
+                    self._error(502, f"upstream: {e}")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def event(delta: dict, finish=None):
+                    chunk = {"id": "chatcmpl-narly", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+                try:
+                    event({"role": "assistant", "content": first})
+                    for delta in deltas:
+                        event({"content": delta})
+                    event({}, "stop")
+                    self._chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Kiosk closed the stream (past max_chars or deadline)
+                except Exception as e:
+                    print(f"  ⚠ Stream broke mid-answer: {e}")
+                    self.close_connection = True  # No [DONE]: the kiosk sees a cut stream
+
+            def log_message(self, *args):
+                pass  # Keep requests off the console
+
+        self._server = _Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fortune-service", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="service-refills", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def summary(stats: dict) -> str:
+    requests = stats["requests"] or 1
+    return (f"{stats['requests']} requests, {stats['coalesced']} coalesced ({stats['coalesced'] / requests:.0%}), "
+            f"{stats['cache_hits']} cached, {stats['rate_limited']} rate-limited; "
+            f"{stats['upstream']} upstream calls ({stats['upstream_failed']} failed); "
+            f"{stats['refill_requests']} refills in {stats['refill_batches']} batches "
+            f"({stats['refill_fortunes']} fortunes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared AI front for a fleet of Narly kiosks")
+    parser.add_argument("--host", default=SERVICE_HOST, help=f"Listen address (default: {SERVICE_HOST})")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help=f"Port (default: {SERVICE_PORT})")
+    parser.add_argument("--mock", nargs="?", const="lognormal:1.2,0.35", metavar="LATENCY",
+                        help="Answer from a local mock provider (sim_devices) with this time-to-first-token model")
+    parser.add_argument("--mock-tps", type=float, default=40.0, help="Mock tokens per second after the first")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="Share of mock requests that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock:
+        from sim_devices import MockAIServer
+        mock = MockAIServer(args.mock, args.mock_tps, error_rate=args.mock_error_rate, seed=args.seed).start()
+        os.environ.update(AI_PROVIDERS="local", LOCAL_AI_BASE_URL=mock.url, LOCAL_AI_MODEL="sim")
+        print(f"🧪 Mock provider on {mock.url} (first token {args.mock})")
+    names = os.getenv("AI_PROVIDERS") or os.getenv("AI_PROVIDER", "openai")
+    if "service" in [n.strip().lower() for n in names.split(",")]:
+        print("❌ AI_PROVIDERS for the service itself can't include 'service' -- name the real providers")
+        sys.exit(1)
+
+    ai_client.init_providers()
+    cache = ResponseCache(CACHE_PATH) if SERVICE_CACHE else None
+    service = FortuneService(args.host, args.port, cache=cache)
+    service.mock = mock
+    try:
+        service.start()
+    except OSError as e:
+        print(f"❌ Cannot listen on {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    rate = f"{SERVICE_RATE_PER_MINUTE:g}/min" if SERVICE_RATE_PER_MINUTE > 0 else "no rate limit"
+    print(f"🔮 Fortune service on {service.url} → {names} "
+          f"({SERVICE_CONCURRENCY} at once, {rate}, coalescing {'on' if SERVICE_COALESCE else 'off'}"
+          f"{', cache on' if cache else ''})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n📊 {summary(service.stats())}")
+    finally:
+        service.stop()
+        if mock is not None:
+            mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,88 @@
 # led_client.py
+import os
 import time
 try:
     import serial
 except Exception:
     serial = None
 
+_REOPEN_AFTER = 5.0  # Seconds before a failed direct port is tried again
+
+
 class LedClient:
-    def __init__(self, port="/dev/tty.usbmodem143101", baud=115200):
+    def __init__(self, port="/dev/tty.usbmodem143101", baud=115200, bus=None):
         self._ok = False
         self._ser = None
-        if serial is None:
+        self._bus = bus
+        self._port = port
+        self._baud = baud
+        self._retry_at = 0.0
+        if bus is not None:
+            # Shared SerialBus already owns the port -- no open, no reset wait; it holds
+            # commands while the board is reconnecting
+            self._ok = True
+            return
+        self._open()
+
+    def _open(self):
+        if serial is None or self._port is None:
             return
         try:
-            self._ser = serial.Serial(port, baudrate=baud, timeout=1)
-            time.sleep(2.0)  # Uno resets on open
+            self._ser = serial.Serial(self._port, baudrate=self._baud, timeout=0.2)
+            self._wait_ready()  # Uno resets on open
             self._ok = True
         except Exception:
             self._ok = False
+            self._retry_at = time.monotonic() + _REOPEN_AFTER
+
+    def _wait_ready(self, timeout: float = None):
+        """Read until the sketch's READY line (or its echo of a probe) instead of sleeping."""
+        timeout = timeout if timeout is not None else float(os.getenv("ARDUINO_READY_TIMEOUT", "5"))
+        start = time.monotonic()
+        probed = False
+        while time.monotonic() - start < timeout:
+            line = self._ser.readline().decode("utf-8", errors="ignore").strip()
+            if line == "READY" or line.startswith("Received: "):
+                return True
+            if not probed and time.monotonic() - start > 2.5:  # Board didn't reset on open
+                self._ser.write(b"STOP\n")
+                probed = True
+        return False
+
+    def _send(self, line: str):
+        if self._bus is not None:
+            self._bus.write(line)
+        else:
+            self._ser.write(line.encode("utf-8"))
+
+    def _ready(self) -> bool:
+        """Direct port: after a failure, reopen it once _REOPEN_AFTER has passed (replugged board)."""
+        if not self._ok and self._bus is None and self._port and time.monotonic() >= self._retry_at:
+            self.close()
+            self._open()
+        return self._ok
+
+    def _failed(self):
+        self._ok = False
+        self._retry_at = time.monotonic() + _REOPEN_AFTER
 
     def start(self, mode="GLOW"):
-        if self._ok:
+        if self._ready():
             try:
-                self._ser.write((f"START {mode}\n").encode("utf-8"))
+                self._send(f"START {mode}\n")
             except Exception:
-                self._ok = False
+                self._failed()
 
     def stop(self):
-        if self._ok:
+        if self._ready():
             try:
-                self._ser.write(b"STOP\n")
+                self._send("STOP\n")
             except Exception:
-                self._ok = False
+                self._failed()
 
     def close(self):
+        if self._bus is not None:
+            return  # The bus outlives individual clients
         try:
             if self._ser:
                 self._ser.close()
@@ -0,0 +1,316 @@
+# metrics.py - Per-stage timings for the coin cycle: rolling histograms, JSONL log, Prometheus text
+#
+# Every stage of a customer cycle (cue, listen, STT, AI, render, printer and the
+# cycle as a whole) reports its time.monotonic() duration, an outcome
+# (ok / timeout / error / fallback / ...) and sizes such as audio seconds,
+# prompt and response chars or ticket bytes. Recording is a few appends under
+# a lock; percentiles are computed only when asked for (session summary,
+# /metrics) and the JSON-lines file is written by a background thread, so the
+# hot path pays microseconds.
+#
+# Events carry the id of the cycle they belong to (set_cycle(); the stage
+# engine carries it into its worker threads), so one customer can be followed
+# through the log. With several booths in one process (multi_booth.py) events
+# also carry the booth's name (set_booth()).
+
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_BASE_DIR = Path(__file__).resolve().parent
+
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "500"))  # Samples per rolling histogram
+METRICS_FILE = os.getenv("METRICS_FILE", str(_BASE_DIR / ".cache" / "metrics" / "metrics.jsonl"))  # "" = off
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+METRICS_BACKUPS = int(os.getenv("METRICS_BACKUPS", "3"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # e.g. 9108 -> http://127.0.0.1:9108/metrics
+QUANTILES = (0.5, 0.9, 0.99)
+
+_cycle = contextvars.ContextVar("metrics_cycle", default=None)
+_booth = contextvars.ContextVar("metrics_booth", default=None)
+
+
+def set_cycle(cycle_id):
+    """Tag events recorded from here on (in this thread/context) with cycle_id."""
+    _cycle.set(cycle_id)
+
+
+def current_cycle():
+    """Cycle id events in this thread/context are tagged with (None outside a cycle)."""
+    return _cycle.get()
+
+
+def set_booth(name):
+    """Tag events recorded from here on (in this thread/context) with booth name (None = untagged)."""
+    _booth.set(name)
+
+
+def _quantile(values: list, q: float) -> float:
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+class _Series:
+    """Rolling window of one stage's durations and sizes, plus lifetime totals."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.durations = deque(maxlen=window)
+        self.sizes = {}     # size name -> deque of values
+        self.outcomes = {}  # outcome -> count
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float, outcome: str, sizes: dict):
+        self.durations.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        for name, value in sizes.items():
+            values = self.sizes.get(name)
+            if values is None:
+                values = self.sizes[name] = deque(maxlen=self.window)
+            values.append(value)
+
+
+class _Span:
+    """Context manager timing one stage; set .outcome or add to .sizes inside the block."""
+
+    __slots__ = ("_metrics", "stage", "sizes", "outcome", "_start")
+
+    def __init__(self, metrics, stage: str, sizes: dict):
+        self._metrics = metrics
+        self.stage = stage
+        self.sizes = sizes
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = self.outcome
+        if exc_type is not None and outcome == "ok":
+            outcome = "timeout" if "Timeout" in exc_type.__name__ else "error"
+        self._metrics.record(self.stage, time.monotonic() - self._start, outcome, **self.sizes)
+        return False
+
+
+class JsonLinesLog:
+    """Append-only JSON-lines file written by a background thread, rotated by size.
+
+    put() only queues the event; the file is opened on first use. At max_bytes
+    the file is rotated (name -> name.1 -> name.2 ...) keeping `backups` old ones.
+    """
+
+    def __init__(self, path, max_bytes: int, backups: int, name: str = "metrics"):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.name = name
+        self._events = queue.SimpleQueue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def put(self, event: dict):
+        if self.path is None:
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name=f"{self.name}-writer", daemon=True)
+                    self._writer.start()
+        self._events.put(event)
+
+    def _write_loop(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"  ⚠ {self.name.capitalize()} log disabled ({self.path}): {e}")
+            self.path = None
+            return
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            f.write(json.dumps(event) + "\n")
+            if self._events.empty():
+                f.flush()
+            if f.tell() >= self.max_bytes:
+                f.close()
+                self._rotate()
+                f = open(self.path, "a", encoding="utf-8")
+        f.close()
+
+    def _rotate(self):
+        """log.jsonl -> .1 -> .2 ... keeping `backups` old files."""
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def files(self) -> list:
+        """Existing log files, oldest first."""
+        old = [self.path.with_name(f"{self.path.name}.{i}") for i in range(self.backups, 0, -1)]
+        return [p for p in old + [self.path] if p.exists()]
+
+    def close(self):
+        """Write out everything queued and stop the writer."""
+        if self._writer is not None:
+            self._events.put(None)
+            self._writer.join(timeout=2)
+            self._writer = None
+
+
+class Metrics:
+    """Rolling per-stage histograms with a JSON-lines log and a Prometheus text export."""
+
+    def __init__(self, path: str = METRICS_FILE, window: int = METRICS_WINDOW,
+                 max_bytes: int = METRICS_MAX_BYTES, backups: int = METRICS_BACKUPS):
+        self.window = window
+        self.log = JsonLinesLog(path, max_bytes, backups) if path else None
+        self._series = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._server = None
+
+    # ---- Recording (hot path) ----
+    def record(self, stage: str, seconds: float, outcome: str = "ok", **fields):
+        """Add one stage sample. Numeric fields are sizes (histogrammed); others only go to the log."""
+        sizes = {k: v for k, v in fields.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = _Series(self.window)
+            series.add(seconds, outcome, sizes)
+        if self.log is not None or self._listeners:
+            event = {"ts": round(time.time(), 3), "cycle": _cycle.get(), "stage": stage,
+                     "seconds": round(seconds, 4), "outcome": outcome, **fields}
+            booth = _booth.get()
+            if booth is not None:
+                event["booth"] = booth
+            if self.log is not None:
+                self.log.put(event)
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"  ⚠ Metrics listener error: {e}")
+
+    def subscribe(self, callback):
+        """Register callback(event: dict) for every sample recorded from now on (e.g. the session recorder)."""
+        self._listeners.append(callback)
+        return callback
+
+    def stage(self, name: str, **sizes) -> _Span:
+        return _Span(self, name, sizes)
+
+    # ---- Reading ----
+    def snapshot(self) -> dict:
+        """{stage: {count, total, outcomes, p50/p90/p99, sizes: {name: {p50/p90/p99}}}} over the window."""
+        with self._lock:
+            raw = {name: (sorted(s.durations), {k: sorted(v) for k, v in s.sizes.items()},
+                          dict(s.outcomes), s.count, s.total) for name, s in self._series.items()}
+        out = {}
+        for name, (durations, sizes, outcomes, count, total) in raw.items():
+            entry = {"count": count, "total": total, "outcomes": outcomes}
+            entry.update({f"p{int(q * 100)}": _quantile(durations, q) for q in QUANTILES})
+            entry["sizes"] = {k: {f"p{int(q * 100)}": _quantile(v, q) for q in QUANTILES} for k, v in sizes.items()}
+            out[name] = entry
+        return out
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition (summaries over the rolling window, lifetime counters)."""
+        snap = self.snapshot()
+        lines = [
+            "# HELP narly_stage_seconds Stage duration over the last samples of each stage.",
+            "# TYPE narly_stage_seconds summary",
+        ]
+        for name, s in snap.items():
+            for q in QUANTILES:
+                lines.append(f'narly_stage_seconds{{stage="{name}",quantile="{q}"}} {s[f"p{int(q * 100)}"]:.4f}')
+            lines.append(f'narly_stage_seconds_sum{{stage="{name}"}} {s["total"]:.4f}')
+            lines.append(f'narly_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines += ["# HELP narly_stage_outcomes_total Stage runs by outcome.",
+                  "# TYPE narly_stage_outcomes_total counter"]
+        for name, s in snap.items():
+            for outcome, n in sorted(s["outcomes"].items()):
+                lines.append(f'narly_stage_outcomes_total{{stage="{name}",outcome="{outcome}"}} {n}')
+        lines += ["# HELP narly_stage_size Sizes handled per stage (audio seconds, chars, bytes).",
+                  "# TYPE narly_stage_size gauge"]
+        for name, s in snap.items():
+            for size, qs in s["sizes"].items():
+                for q in QUANTILES:
+                    lines.append(f'narly_stage_size{{stage="{name}",size="{size}",quantile="{q}"}} '
+                                 f'{qs[f"p{int(q * 100)}"]:g}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """One line per stage for the session summary."""
+        lines = []
+        for name, s in self.snapshot().items():
+            outcomes = " ".join(f"{k}={v}" for k, v in sorted(s["outcomes"].items()))
+            lines.append(f"{name:<12} n={s['count']:<4} p50 {s['p50']:.2f}s p90 {s['p90']:.2f}s "
+                         f"p99 {s['p99']:.2f}s  {outcomes}")
+        return "\n".join(lines)
+
+    # ---- Export ----
+    def serve(self, port: int = METRICS_PORT, host: str = "127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json on a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, ctype = json.dumps(metrics.snapshot()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = metrics.prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep scrapes off the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self):
+        """Flush the log and stop the endpoint."""
+        if self.log is not None:
+            self.log.close()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def record(stage: str, seconds: float, outcome: str = "ok", **fields):
+    _metrics.record(stage, seconds, outcome, **fields)
+
+
+def stage(name: str, **sizes) -> _Span:
+    """with stage("stt") as span: ...  -- times the block; exceptions count as timeout/error."""
+    return _metrics.stage(name, **sizes)
@@ -0,0 +1,355 @@
+# multi_booth.py - One process driving several Narly cabinets
+#
+# Each booth (Arduino + mic + printer + speaker + persona) gets its own coin queue,
+# pipeline, LEDs and persona, and runs the same serial_trigger flow as a
+# single kiosk on its own thread. They share what is expensive to have twice
+# on a Raspberry Pi-class host: the AI providers (one client, pooled
+# connections, hedging stats), the speech-to-text router and its local model,
+# the response cache, one fortune pool per persona, metrics, one pool of
+# device-I/O threads and one of AI request threads. Both pools serve the
+# booths round-robin and cap what any one booth can hold (FairExecutor), so a
+# booth with a hung printer or slow (hedged, abandoned) AI requests can't
+# starve the others.
+#
+# Booths come from booths.json (see booths.example.json) or, without one, are
+# discovered: one per Arduino-like serial port, paired in order with USB
+# microphones, USB audio outputs and ESC/POS printers. The pairing is printed
+# so it can be pinned in booths.json (by Arduino serial number, mic and
+# speaker name and printer USB address).
+#
+#   python multi_booth.py --list-devices
+#   python multi_booth.py                             # discover and run
+#   python multi_booth.py --config booths.json --pipelined
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from boot import BootSequence
+from ai_client import init_providers, set_fortune_pool, set_request_executor
+from persona_registry import get_registry
+from print_client import find_printers, make_spooler
+from sfx import init_sfx, close_sfx, list_outputs
+from stage_engine import StageEngine, FairExecutor
+import metrics
+import serial_trigger as st
+
+_BASE_DIR = Path(__file__).resolve().parent
+BOOTHS_FILE = _BASE_DIR / "booths.json"
+
+MULTI_BOOTH_WORKERS = int(os.getenv("MULTI_BOOTH_WORKERS", "0"))      # 0 = 2 per booth (min 4)
+MULTI_BOOTH_PER_BOOTH = int(os.getenv("MULTI_BOOTH_PER_BOOTH", "3"))  # listen + generate + print
+MULTI_BOOTH_AI_PER_BOOTH = int(os.getenv("MULTI_BOOTH_AI_PER_BOOTH", "2"))  # a request + its hedge
+
+
+# ---- Devices ----
+def list_mics() -> list:
+    """Names of the audio inputs, by device index (empty without PyAudio)."""
+    try:
+        import speech_recognition as sr
+        return sr.Microphone.list_microphone_names()
+    except Exception:
+        return []
+
+
+def _pick_mic(spec, mics: list, taken: set):
+    """Device index for a booths.json "mic": an index, or a name fragment (first free match)."""
+    if spec is None or isinstance(spec, int):
+        return spec
+    for index, name in enumerate(mics):
+        if spec.lower() in (name or "").lower() and index not in taken:
+            return index
+    raise ValueError(f"no free audio input matching '{spec}'")
+
+
+def _printer_target(spec) -> dict:
+    """Booth printer from a booths.json "printer": USB match args ({"bus", "address"} or
+    {"serial_number"}) or "lpr:NAME" for a CUPS queue."""
+    if isinstance(spec, str) and spec.startswith("lpr:"):
+        return {"lpr_printer": spec[4:]}
+    if isinstance(spec, dict):
+        return {"spooler": make_spooler(spec)}
+    return {}
+
+
+def load_booths(path: Path, persona: str) -> list:
+    """Booths described in booths.json."""
+    entries = json.loads(path.read_text(encoding="utf-8"))["booths"]
+    ports = dict((serial_number, device) for device, serial_number in st.find_ports())
+    mics, taken = list_mics(), set()
+    booths = []
+    for i, entry in enumerate(entries, 1):
+        name = entry.get("name", f"booth{i}")
+        port = entry.get("port")
+        if port is None and entry.get("serial_number"):
+            port = ports.get(entry["serial_number"])
+            if port is None:
+                print(f"  ⚠ Booth '{name}': no Arduino with serial number {entry['serial_number']} - skipped")
+                continue
+        try:
+            mic = _pick_mic(entry.get("mic"), mics, taken)
+        except ValueError as e:
+            print(f"  ⚠ Booth '{name}': {e} - using the default mic")
+            mic = None
+        taken.add(mic)
+        booths.append(st.Booth(name, port, entry.get("persona", persona), mic, speaker=entry.get("speaker"),
+                               **_printer_target(entry.get("printer"))))
+    return booths
+
+
+def discover_booths(persona: str) -> list:
+    """One booth per Arduino, paired in order with USB mics, USB speakers and (if
+    ESCPOS_USB_VENDOR_ID is set) printers."""
+    ports = st.find_ports()
+    usb_mics = [i for i, name in enumerate(list_mics()) if "usb" in (name or "").lower()]
+    usb_speakers = [name for name in list_outputs() if "usb" in name.lower()]
+    printers = find_printers() if os.getenv("ESCPOS_USB_VENDOR_ID") else []
+    booths = []
+    for i, (device, serial_number) in enumerate(ports):
+        mic = usb_mics[i] if i < len(usb_mics) else None
+        speaker = usb_speakers[i] if i < len(usb_speakers) else None
+        printer = printers[i] if i < len(printers) else None
+        booths.append(st.Booth(f"booth{i + 1}", device, persona, mic, speaker=speaker, **_printer_target(printer)))
+    if len(usb_mics) < len(ports) or len(usb_speakers) < len(ports) or (printers and len(printers) < len(ports)):
+        print(f"  ⚠ {len(ports)} Arduinos but {len(usb_mics)} USB mics, {len(usb_speakers)} USB speakers and "
+              f"{len(printers)} USB printers - booths without their own share the defaults")
+    return booths
+
+
+def describe(booth) -> str:
+    mics = list_mics()
+    mic = "default mic" if booth.mic_index is None else \
+        f"mic #{booth.mic_index}" + (f" ({mics[booth.mic_index]})" if booth.mic_index < len(mics) else "")
+    printer = f"lpr:{booth.lpr_printer}" if booth.lpr_printer else "own USB printer" if booth.spooler else "default printer"
+    speaker = f"speaker '{booth.speaker}'" if booth.speaker else "default speaker"
+    return f"{booth.name}: {booth.port}, {mic}, {speaker}, {printer}, persona '{booth.persona}'"
+
+
+def list_devices():
+    print("Arduinos:")
+    for device, serial_number in st.find_ports():
+        print(f"  {device}  serial_number={serial_number}")
+    print("Audio inputs:")
+    for index, name in enumerate(list_mics()):
+        print(f"  #{index}  {name}")
+    print("Audio outputs:")
+    for name in list_outputs():
+        print(f"  {name}")
+    print("ESC/POS printers (ESCPOS_USB_VENDOR_ID/PRODUCT_ID):")
+    for args in find_printers():
+        print(f"  {json.dumps(args)}")
+
+
+# ---- Console ----
+class _BoothConsole:
+    """stdout that starts every line printed for a booth with its name."""
+
+    def __init__(self, stream, booths):
+        self._stream = stream
+        self._booths = booths
+        self._fresh = threading.local()  # Per thread: next write starts a line
+        self._lock = threading.Lock()
+
+    def write(self, text: str):
+        booth = st.current_booth()
+        tag = f"[{booth.name}] " if booth in self._booths else ""
+        out = []
+        for piece in text.splitlines(keepends=True):
+            if tag and getattr(self._fresh, "line", True) and piece.strip():
+                piece = tag + piece
+            self._fresh.line = piece.endswith("\n")
+            out.append(piece)
+        with self._lock:
+            return self._stream.write("".join(out))
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+# ---- Per-booth cycle stats (from the shared metrics) ----
+class BoothStats:
+    """Cycle outcomes and durations per booth, fed by metrics.subscribe()."""
+
+    def __init__(self):
+        self._cycles = {}  # booth -> deque of seconds
+        self._outcomes = {}  # booth -> {outcome: count}
+        self._lock = threading.Lock()
+
+    def on_metric(self, event: dict):
+        if event["stage"] != "cycle" or event.get("booth") is None:
+            return
+        with self._lock:
+            self._cycles.setdefault(event["booth"], deque(maxlen=500)).append(event["seconds"])
+            outcomes = self._outcomes.setdefault(event["booth"], {})
+            outcomes[event["outcome"]] = outcomes.get(event["outcome"], 0) + 1
+
+    def summary(self) -> str:
+        lines = []
+        with self._lock:
+            for name, seconds in sorted(self._cycles.items()):
+                values = sorted(seconds)
+                outcomes = " ".join(f"{k}={v}" for k, v in sorted(self._outcomes[name].items()))
+                lines.append(f"{name:<12} n={len(values):<4} p50 {values[len(values) // 2]:.2f}s "
+                             f"p90 {values[int(0.9 * (len(values) - 1))]:.2f}s  {outcomes}")
+        return "\n".join(lines)
+
+
+# ---- Running ----
+def share_engine(booths: list, workers: int = 0, per_booth: int = MULTI_BOOTH_PER_BOOTH) -> FairExecutor:
+    """Give every booth's stages one thread pool, served round-robin by booth."""
+    workers = workers or MULTI_BOOTH_WORKERS or max(4, 2 * len(booths))
+    executor = FairExecutor(workers, key=lambda: st.current_booth().name, per_key=per_booth,
+                            thread_name_prefix="booth-io")
+    st._engine.close()
+    st._engine = StageEngine(executor=executor, on_stage=st._record_stage)
+    print(f"   Shared device I/O: {workers} threads, at most {per_booth} per booth")
+    return executor
+
+
+def share_ai(booths: list, per_booth: int = MULTI_BOOTH_AI_PER_BOOTH) -> FairExecutor:
+    """AI requests of every booth on one pool, round-robin by booth and at most per_booth each."""
+    workers = per_booth * (len(booths) + 1)  # +1: pool refills run outside any booth
+    executor = FairExecutor(workers, key=lambda: st.current_booth().name, per_key=per_booth,
+                            thread_name_prefix="booth-ai")
+    set_request_executor(executor, workers)
+    print(f"   Shared AI requests: {workers} threads, at most {per_booth} per booth")
+    return executor
+
+
+def _run_booth(booth, dry_run: bool):
+    st.use_booth(booth)
+    try:
+        st.listen_serial_mode(booth.port, dry_run=dry_run)
+    except Exception as e:
+        print(f"  ✗ Booth stopped: {e}")
+
+
+def run_booths(booths: list, dry_run: bool = False, workers: int = 0, per_booth: int = MULTI_BOOTH_PER_BOOTH):
+    """Serve every booth (devices already open) until Ctrl+C or every booth's Arduino is gone."""
+    executor = share_engine(booths, workers, per_booth)
+    stats = BoothStats()
+    metrics.get_metrics().subscribe(stats.on_metric)
+    stdout = sys.stdout
+    sys.stdout = _BoothConsole(stdout, booths)
+    threads = [threading.Thread(target=_run_booth, args=(b, dry_run), name=f"booth-{b.name}", daemon=True)
+               for b in booths]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\n\n🛑 Stopping booths (finishing customers in progress)...")
+        for b in booths:
+            b.stopping = True
+        for t in threads:
+            t.join(st.TIMEOUT_CYCLE)
+    finally:
+        sys.stdout = stdout
+
+    st.print_session_summary(booths)
+    for line in stats.summary().splitlines():
+        print(f"🎪 {line}")
+    waits = sorted(executor.waits)
+    if waits:
+        print(f"🧵 Shared I/O: {len(booths)} booths, wait for a thread p90 {waits[int(0.9 * (len(waits) - 1))]:.2f}s "
+              f"max {waits[-1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several Narly booths from one process")
+    parser.add_argument("--config", type=Path, default=BOOTHS_FILE,
+                        help="Booth list (default: booths.json; discovered from USB devices if missing)")
+    parser.add_argument("--list-devices", action="store_true", help="Show Arduinos, audio inputs and printers, then exit")
+    parser.add_argument("--persona", default="default", help="Persona of booths that don't name one")
+    parser.add_argument("--dry-run", action="store_true", help="Show tickets instead of printing them")
+    parser.add_argument("--stream", action="store_true", help="Stream AI responses onto the printers")
+    parser.add_argument("--stream-stt", action="store_true", help="Transcribe questions in chunks while customers speak")
+    parser.add_argument("--pipelined", action="store_true", help="Overlap customers within each booth")
+    parser.add_argument("--pipeline-depth", type=int, default=st.PIPELINE_DEPTH)
+    parser.add_argument("--workers", type=int, default=0, help="Shared device-I/O threads (default: 2 per booth)")
+    parser.add_argument("--per-booth", type=int, default=MULTI_BOOTH_PER_BOOTH,
+                        help=f"Most threads one booth may hold (default: {MULTI_BOOTH_PER_BOOTH})")
+    args = parser.parse_args()
+
+    if args.list_devices:
+        list_devices()
+        return
+    booths = load_booths(args.config, args.persona) if args.config.exists() else discover_booths(args.persona)
+    if not booths:
+        print("❌ No booths: no Arduino found and no booths.json (see booths.example.json, or --list-devices)")
+        sys.exit(1)
+    st.STREAM_PRINT, st.STREAM_STT = args.stream, args.stream_stt
+    st.PIPELINED, st.PIPELINE_DEPTH = args.pipelined, max(1, args.pipeline_depth)
+
+    print(f"🎪 {len(booths)} booth(s):")
+    for b in booths:
+        print(f"   {describe(b)}")
+
+    # Shared parts once, every booth's devices in parallel
+    for b in booths:
+        try:
+            get_registry().get(b.persona)
+        except Exception as e:
+            print(f"  ⚠ Booth '{b.name}': persona '{b.persona}' not available ({e}) - using 'default'")
+            b.persona = "default"
+    share_ai(booths)  # Before init_providers() sizes the connection pools
+    boot = BootSequence()
+    boot.add("ai", init_providers)
+    boot.add("stt", st._boot_stt)
+    for speaker in sorted({b.speaker or "" for b in booths}):
+        boot.add(f"sfx:{speaker or 'default'}", lambda o=speaker: init_sfx(output=o or None))
+    if metrics.METRICS_PORT:
+        boot.add("metrics", lambda: metrics.get_metrics().serve(metrics.METRICS_PORT))
+    for b in booths:
+        boot.add(f"mic:{b.name}", lambda b=b: st.open_mic(b.mic_index))
+        boot.add(f"arduino:{b.name}", lambda b=b: st.connect_arduino(b.port))
+        if b.spooler and not args.dry_run:
+            boot.add(f"printer:{b.name}", b.spooler.device.open)
+    for persona in sorted({b.persona for b in booths}):
+        boot.add(f"pool:{persona}", lambda p=persona: st.shared_pool(p), after="ai")
+    results = boot.run()
+    print(boot.report())
+
+    st._stt = results["stt"]
+    running = []
+    for b in booths:
+        b.mic, b.bus, b.pool = results[f"mic:{b.name}"], results[f"arduino:{b.name}"], results[f"pool:{b.persona}"]
+        if b.bus is None:
+            print(f"  ✗ Booth '{b.name}': Arduino on {b.port} not available - not started")
+        else:
+            running.append(b)
+    shared = [b.name for b in running if b.speaker is None]
+    if len(shared) > 1:
+        print(f"  ⚠ Booths {', '.join(shared)} play their cues on the same default speaker - "
+              f"give each a \"speaker\" in booths.json")
+    personas = {b.persona for b in running}
+    # The "pool" AI provider can't tell booths apart, so it only serves a single-persona floor
+    set_fortune_pool(running[0].pool if len(personas) == 1 and running else None)
+    if results.get("metrics"):
+        print(f"📈 Metrics: http://127.0.0.1:{metrics.METRICS_PORT}/metrics")
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: get_registry().reload())
+
+    try:
+        if running:
+            run_booths(running, args.dry_run, args.workers, args.per_booth)
+    finally:
+        for b in booths:
+            if b.mic:
+                b.mic.close()
+        close_sfx()
+        metrics.get_metrics().close()
+
+
+if __name__ == "__main__":
+    main()
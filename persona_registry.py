@@ -0,0 +1,136 @@
+# persona_registry.py - Every persona loaded once, hot-reloaded on edit, switchable at runtime
+#
+# load_config() does the actual loading and validation; the registry keeps the
+# resolved configs in memory, re-checks the persona's files' mtimes at most
+# once per check_interval and reloads just that persona when one changed. A bad
+# edit is reported and the last good config stays in use.
+
+import os
+import threading
+import time
+
+from config_loader import load_config, list_personas, _BASE_DIR
+
+
+class PersonaRegistry:
+    """In-memory persona configs plus the active persona name."""
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = check_interval if check_interval is not None else float(
+            os.getenv("PERSONA_RELOAD_SECONDS", "1.0"))
+        self._configs = {}   # name -> cfg
+        self._mtimes = {}    # name -> {path: mtime}
+        self._checked = {}   # name -> time.monotonic() of the last mtime check
+        self._lock = threading.RLock()
+        self._active = "default"
+        self.reloads = 0
+
+    # ---- Loading ----
+    def load_all(self):
+        """Load and validate every persona under personas/; invalid ones are reported and skipped."""
+        for name in list_personas():
+            try:
+                self._load(name)
+            except Exception as e:
+                print(f"  ⚠ Persona '{name}' not loaded: {e}")
+        return self
+
+    def _files(self, name: str, cfg: dict) -> list:
+        persona_dir = _BASE_DIR / "personas" / name
+        files = [persona_dir / "content.json"]
+        if cfg.get("system_prompt_file"):
+            files.append(persona_dir / cfg["system_prompt_file"])
+        files += [persona_dir / f for f in cfg.get("knowledge_files", [])]
+        return files
+
+    def _stat(self, files) -> dict:
+        mtimes = {}
+        for path in files:
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _load(self, name: str) -> dict:
+        if not (_BASE_DIR / "personas" / name / "content.json").exists():
+            raise KeyError(f"unknown persona '{name}'")
+        cfg = load_config(name)
+        with self._lock:
+            self._configs[name] = cfg
+            self._mtimes[name] = self._stat(self._files(name, cfg))
+            self._checked[name] = time.monotonic()
+        return cfg
+
+    def reload(self, name: str = None):
+        """Force a reload of one persona (or all of them), keeping old configs on error."""
+        for n in ([name] if name else list(self._configs) + [p for p in list_personas() if p not in self._configs]):
+            try:
+                self._load(n)
+                self.reloads += 1
+            except Exception as e:
+                print(f"  ⚠ Persona '{n}' reload failed, keeping previous version: {e}")
+
+    def get(self, name: str) -> dict:
+        """Config for a persona, reloaded first if any of its files changed on disk."""
+        with self._lock:
+            cfg = self._configs.get(name)
+            if cfg is None:
+                return self._load(name)
+            now = time.monotonic()
+            if now - self._checked.get(name, 0) < self.check_interval:
+                return cfg
+            self._checked[name] = now
+            if self._stat(self._mtimes[name]) == self._mtimes[name]:
+                return cfg
+        try:
+            cfg = self._load(name)
+            self.reloads += 1
+            print(f"  🔁 Persona '{name}' reloaded from disk")
+        except Exception as e:
+            print(f"  ⚠ Persona '{name}' changed but failed to load, keeping previous version: {e}")
+            with self._lock:
+                self._mtimes[name] = self._stat(self._mtimes[name])  # Don't retry until it changes again
+        return cfg
+
+    # ---- Active persona ----
+    @property
+    def active(self) -> str:
+        return self._active
+
+    def names(self) -> list:
+        with self._lock:
+            return sorted(self._configs)
+
+    def config(self) -> dict:
+        """Config of the active persona."""
+        return self.get(self._active)
+
+    def switch(self, name: str) -> bool:
+        """Make name the active persona. Validates first; the swap itself is atomic."""
+        try:
+            self.get(name)
+        except Exception as e:
+            print(f"  ⚠ Cannot switch to persona '{name}': {e}")
+            return False
+        with self._lock:
+            self._active = name
+        return True
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> PersonaRegistry:
+    """Process-wide registry, loading every persona on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PersonaRegistry().load_all()
+        return _registry
+
+
+def current_config() -> dict:
+    """Config of the active persona (hot-reloaded)."""
+    return get_registry().config()
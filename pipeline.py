@@ -0,0 +1,119 @@
+# pipeline.py - Overlapping customer cycles: listen → generate → print workers
+#
+# Each stage runs on its own worker thread and hands jobs on through bounded
+# queues, so customer N+1 can be recorded and their fortune generated while
+# customer N's ticket prints. Exactly one listen worker (mic) and one print
+# worker (printer) exist, which keeps device ownership strict; a full queue
+# blocks the stage before it, which is the backpressure.
+
+import queue
+import threading
+
+from coin_ledger import CoinLedger
+
+_STOP = object()  # Sentinel passed down the pipeline on shutdown
+
+
+class PipelinedRunner:
+    """Three-stage worker pipeline connected by bounded queues.
+
+    listen(pulses) -> job, generate(job) -> job and print_job(job) are supplied
+    by the caller. Coins are taken from a CoinLedger (the caller's, so serial
+    input can feed it directly, or a private unbounded one fed by submit()).
+    on_state(listening, pending) is called whenever the number of in-flight
+    jobs changes, e.g. to drive LEDs or pause background work. Calls are
+    serialised and arrive in state order, so the callback may keep its own
+    state without a lock.
+    """
+
+    def __init__(self, listen, generate, print_job, coins: CoinLedger = None, depth: int = 1,
+                 on_state=None):
+        self._listen = listen
+        self._generate = generate
+        self._print_job = print_job
+        self._on_state = on_state
+        self._coins = coins or CoinLedger(max_depth=0)
+        self._to_generate = queue.Queue(maxsize=depth)
+        self._to_print = queue.Queue(maxsize=depth)
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()  # One on_state call at a time, newest state last
+        self._listening = False
+        self._pending = 0  # Jobs past listening but not yet printed
+        self._workers = [
+            threading.Thread(target=self._listen_loop, name="pipeline-listen", daemon=True),
+            threading.Thread(target=self._generate_loop, name="pipeline-generate", daemon=True),
+            threading.Thread(target=self._print_loop, name="pipeline-print", daemon=True),
+        ]
+
+    def start(self):
+        for t in self._workers:
+            t.start()
+        return self
+
+    def submit(self, pulses: int, source: str = "submit"):
+        """Queue a coin; it is served as soon as the mic is free."""
+        self._coins.add_pulses(pulses, source)
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._pending + (1 if self._listening else 0) + self._coins.depth
+
+    def stop(self, timeout: float = None):
+        """Stop taking coins, let jobs already past the mic finish, then stop all workers."""
+        self._coins.close()
+        for t in self._workers:
+            t.join(timeout)
+
+    # ---- Workers ----
+    def _set_state(self, listening: bool = None, pending_delta: int = 0):
+        with self._state_lock:
+            with self._lock:
+                if listening is not None:
+                    self._listening = listening
+                self._pending += pending_delta
+                state = (self._listening, self._pending)
+            if self._on_state:
+                try:
+                    self._on_state(*state)
+                except Exception as e:
+                    print(f"  ⚠ Pipeline state callback error: {e}")
+
+    def _listen_loop(self):
+        while True:
+            event = self._coins.next_coin()
+            if event is None:  # Ledger closed
+                self._to_generate.put(_STOP)
+                return
+            self._set_state(listening=True)
+            try:
+                job = self._listen(event.pulses)
+            except Exception as e:
+                print(f"  ✗ Unexpected error in listen stage: {e}")
+                job = None
+            self._set_state(listening=False, pending_delta=1)
+            self._to_generate.put(job)  # Blocks while generation is backed up
+
+    def _generate_loop(self):
+        while True:
+            job = self._to_generate.get()
+            if job is _STOP:
+                self._to_print.put(_STOP)
+                return
+            try:
+                job = self._generate(job)
+            except Exception as e:
+                print(f"  ✗ Unexpected error in generate stage: {e}")
+            self._to_print.put(job)
+
+    def _print_loop(self):
+        while True:
+            job = self._to_print.get()
+            if job is _STOP:
+                return
+            try:
+                self._print_job(job)
+            except Exception as e:
+                print(f"  ✗ Unexpected error in print stage: {e}")
+            finally:
+                self._set_state(pending_delta=-1)
@@ -1,23 +1,185 @@
 import os
+import queue
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 
-def _print_via_escpos(text: str):
-    """Print via USB escpos library (direct USB connection)."""
+from escpos_codes import ESC_INIT, ESC_ALIGN_CENTER, GS_SIZE_NORMAL, ESC_FEED_6, GS_CUT_FULL
+
+PRINT_RETRIES = int(os.getenv("PRINT_RETRIES", "2"))  # Extra attempts after a failed USB write
+
+# Sent before a ticket whose first write failed part-way: finish the torn line, cut it off, mark the copy
+REPRINT_PREFIX = ESC_INIT + b"\n" + ESC_FEED_6 + GS_CUT_FULL + ESC_ALIGN_CENTER + b"- reprint -\n"
+
+def _open_escpos(usb_args: dict = None):
+    """Open the USB ESC/POS printer configured in the environment.
+
+    usb_args (e.g. {"bus": 1, "address": 7} or {"serial_number": "..."}) picks
+    one of several identical printers.
+    """
     from escpos.printer import Usb
     vendor = int(os.getenv("ESCPOS_USB_VENDOR_ID", "0"), 16)
     product = int(os.getenv("ESCPOS_USB_PRODUCT_ID", "0"), 16)
     in_ep = int(os.getenv("ESCPOS_IN_EP", "0"), 16) if os.getenv("ESCPOS_IN_EP") else None
     out_ep = int(os.getenv("ESCPOS_OUT_EP", "0"), 16) if os.getenv("ESCPOS_OUT_EP") else None
+    extra = {"usb_args": usb_args} if usb_args else {}
+
+    return Usb(vendor, product, in_ep=in_ep, out_ep=out_ep, timeout=0, **extra)
+
+def find_printers() -> list:
+    """usb_args of every connected printer with the configured vendor/product id, in bus order."""
+    try:
+        import usb.core
+        vendor = int(os.getenv("ESCPOS_USB_VENDOR_ID", "0"), 16)
+        product = int(os.getenv("ESCPOS_USB_PRODUCT_ID", "0"), 16)
+        devices = usb.core.find(find_all=True, idVendor=vendor, idProduct=product) or []
+        return sorted(({"bus": d.bus, "address": d.address} for d in devices),
+                      key=lambda a: (a["bus"], a["address"]))
+    except Exception:
+        return []
+
+def build_escpos_job(text: str) -> bytes:
+    """Whole ticket as one ESC/POS byte buffer: setup, every line, feed and cut."""
+    body = (text + "\n").encode("cp437", errors="replace")
+    return ESC_INIT + ESC_ALIGN_CENTER + GS_SIZE_NORMAL + body + ESC_FEED_6 + GS_CUT_FULL
+
+class EscposDevice:
+    """One USB printer session kept open across tickets; reopened after a failure."""
+
+    def __init__(self, opener=None):
+        self._opener = opener or _open_escpos  # Returns an object with _raw(data) and close()
+        self._printer = None
+        self.lock = threading.RLock()  # One job (or streamed ticket) on the device at a time
+        self.opens = 0  # First open included
+
+    def open(self):
+        """Open the USB session now (no-op if already open). Raises if the printer is unavailable."""
+        with self.lock:
+            if self._printer is None:
+                self._printer = self._opener()
+                self.opens += 1
+
+    def write(self, data: bytes):
+        """Send raw bytes in one transfer, opening the device first if needed."""
+        with self.lock:
+            self.open()
+            try:
+                self._printer._raw(data)
+            except Exception:
+                self.reset()  # Device lost (unplugged, paper door, ...) -- reopen next time
+                raise
+
+    def reset(self):
+        with self.lock:
+            try:
+                if self._printer is not None:
+                    self._printer.close()
+            except Exception:
+                pass
+            self._printer = None
+
+class PrintSpooler:
+    """Job queue in front of the USB printer: one worker, bulk writes, retry with reopen.
+
+    Each ticket is written as a single ESC/POS buffer. A failed write drops the
+    device session and is retried (up to PRINT_RETRIES times) on a fresh one.
+    If the device opened, part of the ticket may already be on paper, so the
+    retry first cuts that off and marks the copy (REPRINT_PREFIX). Job
+    latency (queue wait + write) is kept for stats().
+    """
+
+    def __init__(self, device: EscposDevice = None, retries: int = PRINT_RETRIES):
+        self.device = device or EscposDevice()
+        self.retries = retries
+        self._jobs = queue.Queue()
+        self._latencies = deque(maxlen=200)
+        self.jobs = 0
+        self.failed = 0
+        self.retried = 0
+        self._thread = threading.Thread(target=self._run, name="print-spooler", daemon=True)
+        self._thread.start()
 
-    p = Usb(vendor, product, in_ep=in_ep, out_ep=out_ep, timeout=0)
-    p.set(align="center", width=1, height=1)
-    for line in text.split("\n"):
-        p.text(line + "\n")
-    p.cut()
+    def submit(self, text: str, job: bytes = None) -> Future:
+        """Queue a ticket; job is its prebuilt ESC/POS buffer, if the caller has one."""
+        future = Future()
+        self._jobs.put((job or build_escpos_job(text), time.monotonic(), future))
+        return future
 
-def _print_via_os(text: str):
-    """Print via system lpr/CUPS (works with PRINTER env var)."""
-    printer = os.getenv("PRINTER", "") or os.getenv("PRINTER_NAME", "")
+    def _run(self):
+        while True:
+            data, queued_at, future = self._jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            error = None
+            payload = data
+            for attempt in range(self.retries + 1):
+                try:
+                    self.device.open()  # Failing here sent nothing: a plain retry is safe
+                except Exception as e:
+                    error = e
+                else:
+                    try:
+                        self.device.write(payload)
+                        error = None
+                        break
+                    except Exception as e:
+                        error = e
+                        payload = REPRINT_PREFIX + data
+                if attempt < self.retries:
+                    self.retried += 1
+                    time.sleep(0.5 * (attempt + 1))  # Give USB a moment to re-enumerate
+            self.jobs += 1
+            self._latencies.append(time.monotonic() - queued_at)
+            if error is None:
+                future.set_result(None)
+            else:
+                self.failed += 1
+                future.set_exception(error)
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        return {
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "retried": self.retried,
+            "opens": self.device.opens,
+            "latency_avg": sum(lat) / len(lat) if lat else 0.0,
+            "latency_p90": lat[int(0.9 * (len(lat) - 1))] if lat else 0.0,
+        }
+
+# Created on first USB print so lpr-only setups never touch USB
+_spooler = None
+_spooler_lock = threading.Lock()
+
+def get_spooler() -> PrintSpooler:
+    global _spooler
+    with _spooler_lock:
+        if _spooler is None:
+            _spooler = PrintSpooler()
+        return _spooler
+
+def warm_up_printer():
+    """Open the USB printer before the first ticket is due (lpr needs no setup)."""
+    if os.getenv("ESCPOS_USB_VENDOR_ID"):
+        get_spooler().device.open()
+
+def make_spooler(usb_args: dict = None) -> PrintSpooler:
+    """Spooler for one more USB printer (multi-booth), picked by usb_args."""
+    return PrintSpooler(EscposDevice(opener=lambda: _open_escpos(usb_args)))
+
+def spooler_stats():
+    """Spooler counters and job latency, or None if USB printing hasn't been used."""
+    return _spooler.stats() if _spooler else None
+
+def _print_via_escpos(text: str, job: bytes = None, spooler: PrintSpooler = None):
+    """Print via the persistent USB escpos session (one bulk write per ticket)."""
+    (spooler or get_spooler()).submit(text, job).result()
+
+def _print_via_os(text: str, printer: str = None):
+    """Print via system lpr/CUPS (printer, else the PRINTER env var)."""
+    printer = printer or os.getenv("PRINTER", "") or os.getenv("PRINTER_NAME", "")
     cmd = ["lpr"]
     if printer:
         cmd += ["-P", printer]
@@ -28,19 +190,21 @@ def _print_via_os(text: str):
     if proc.returncode != 0:
         raise RuntimeError(f"lpr failed (exit {proc.returncode}): {stderr.decode('utf-8', errors='ignore')}")
 
-def print_ticket(text: str):
+def print_ticket(text: str, job: bytes = None, spooler: PrintSpooler = None, lpr_printer: str = None):
     """
     Print ticket with fallback strategy:
-    1. Try USB escpos if ESCPOS_USB_VENDOR_ID is set
+    1. Try USB escpos if ESCPOS_USB_VENDOR_ID is set (sending job as-is when given,
+       e.g. from TicketTemplate.escpos())
     2. Fall back to system lpr (respects PRINTER or PRINTER_NAME env vars)
     3. Raise exception if both fail
+    spooler and lpr_printer pick a booth's own printer (default: the process-wide one).
     """
     errors = []
 
     # Try USB escpos first if configured
     if os.getenv("ESCPOS_USB_VENDOR_ID"):
         try:
-            _print_via_escpos(text)
+            _print_via_escpos(text, job, spooler)
             return  # Success
         except Exception as e:
             errors.append(f"USB escpos failed: {e}")
@@ -48,10 +212,65 @@ def print_ticket(text: str):
 
     # Try system lpr (primary method if no USB, fallback otherwise)
     try:
-        _print_via_os(text)
+        _print_via_os(text, lpr_printer)
         return  # Success
     except Exception as e:
         errors.append(f"System lpr failed: {e}")
 
     # Both methods failed
     raise RuntimeError(f"All print methods failed:\n" + "\n".join(errors))
+
+
+class PrintSession:
+    """Print one ticket line by line while the rest of it is still being produced.
+
+    Lines reach a USB escpos printer as soon as they are written, over the
+    spooler's persistent session (held exclusively until finish()). lpr cannot
+    take a partial job, so without USB (or if the first USB write fails) lines
+    are collected and printed in one go by finish(). spooler and lpr_printer
+    pick a booth's own printer, as for print_ticket().
+    """
+
+    def __init__(self, spooler: PrintSpooler = None, lpr_printer: str = None):
+        self._device = None
+        self._lines = []
+        self._lpr_printer = lpr_printer
+        if os.getenv("ESCPOS_USB_VENDOR_ID"):
+            device = (spooler or get_spooler()).device
+            device.lock.acquire()
+            try:
+                device.write(ESC_INIT + ESC_ALIGN_CENTER + GS_SIZE_NORMAL)
+                self._device = device
+            except Exception as e:
+                device.lock.release()
+                print(f"  ⚠ USB escpos unavailable for streaming, buffering for lpr: {e}")
+
+    def write_lines(self, lines, data: bytes = None):
+        """Print lines; data is their cp437 encoding (newlines included) if already known."""
+        if not lines:
+            return
+        if self._device is not None:
+            if data is None:
+                data = "".join(line + "\n" for line in lines).encode("cp437", errors="replace")
+            try:
+                self._device.write(data)
+            except Exception:
+                self._release()
+                raise
+        else:
+            self._lines.extend(lines)
+
+    def finish(self):
+        """Cut the paper (USB) or submit the collected ticket (lpr)."""
+        if self._device is not None:
+            try:
+                self._device.write(ESC_FEED_6 + GS_CUT_FULL)
+            finally:
+                self._release()
+        else:
+            _print_via_os("\n".join(self._lines), self._lpr_printer)
+
+    def _release(self):
+        if self._device is not None:
+            self._device.lock.release()
+            self._device = None
@@ -0,0 +1,245 @@
+# replay.py - Feed a recorded session back through the pipeline on simulated devices
+#
+# Takes a trace written with SESSION_RECORD=1 (session_recorder.py) and runs
+# it through serial_trigger with the stand-ins from sim_devices.py: coins and
+# persona switches arrive when they did, each customer's recorded question
+# audio is "spoken" into the mic after the cue, the transcript comes back as
+# recorded, and the mock AI answers with the recorded response after the
+# recorded latency (or fails where it failed). With --speed N all device time
+# runs N times faster. The report puts the recorded stage timings next to the
+# replayed ones, so a latency spike can be reproduced and an engine change
+# compared on real traffic. Every ticket printed from an AI answer must come
+# out as recorded; a mismatch (or a missing ticket) exits 1.
+#
+#   python replay.py --list                          # sessions in the trace
+#   python replay.py                                 # latest session at 10x
+#   python replay.py --session 3f9c21aa --speed 1
+#   python replay.py old_trace.jsonl --pipelined     # same traffic, other engine
+
+import argparse
+import base64
+import json
+import math
+import struct
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from formatters import encode_for_printer
+from session_recorder import SessionRecorder
+from sim_devices import MockAIServer, SimBooth
+
+
+# ---- Trace ----
+def load_events(paths) -> list:
+    """Every event in the trace files, in order (unreadable lines skipped)."""
+    events = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass  # Torn last line of a killed kiosk
+    return events
+
+
+def split_sessions(events) -> list:
+    """[{"id", "info", "events"}] -- events before the first session line (rotated away) form "partial"."""
+    sessions = []
+    for event in events:
+        if event.get("type") == "session":
+            sessions.append({"id": event["session"], "info": event, "events": []})
+        elif sessions:
+            sessions[-1]["events"].append(event)
+        else:
+            sessions.append({"id": "partial", "info": {}, "events": [event]})
+    return sessions
+
+
+def _stand_in_speech(seconds: float, rate: int = 16000) -> tuple:
+    """Word-like tone bursts for a question recorded without audio (SESSION_AUDIO=0)."""
+    samples = []
+    while len(samples) < seconds * rate:
+        n = len(samples)
+        samples += [int(6000 * math.sin(2 * math.pi * 180 * (n + i) / rate)) for i in range(int(0.3 * rate))]
+        samples += [0] * int(0.1 * rate)
+    return rate, struct.pack(f"<{len(samples)}h", *samples)
+
+
+def build_replay(session: dict) -> dict:
+    """Arrivals, serial script, question audio, transcripts and AI answers of one session."""
+    events = session["events"]
+    coins = [e for e in events if e["type"] == "coin" and e.get("credits", 1) > 0]
+    if not coins:
+        raise ValueError(f"session {session['id']} has no coins to replay")
+    t0 = coins[0]["t"]
+    arrivals = [e["t"] - t0 for e in coins for _ in range(e.get("credits", 1))]
+    script = [(max(-0.25, e["t"] - t0), f"PERSONA {e['name']}") for e in events if e["type"] == "persona"]
+
+    cycles = {}
+    for e in events:
+        if e.get("cycle") is not None:
+            cycles.setdefault(e["cycle"], []).append(e)
+    customers = [cycles[c] for c in sorted(cycles)
+                 if any(e["type"] == "stage" and e["stage"] == "cycle" for e in cycles[c])]
+
+    clips, answers, ai_script, tickets = [], [], [], []
+    for cycle in customers:
+        kinds = {}
+        for e in cycle:
+            kinds.setdefault(e["type"], []).append(e)
+        stages = {e["stage"]: e for e in kinds.get("stage", [])}
+        question = (kinds.get("question") or [{}])[0]
+        audio = (kinds.get("audio") or [None])[0]
+        if audio is not None:
+            clips.append((audio["rate"], base64.b64decode(audio["pcm"])))
+        elif question.get("text") is not None or question.get("error") == "unknown":
+            clips.append(_stand_in_speech(stages.get("listen", {}).get("audio_seconds", 2.0)))
+        else:
+            clips.append(None)  # Nobody spoke
+        if clips[-1] is not None:
+            answers.append((question.get("text") or "").replace("|", "/"))
+        if kinds.get("ai_request"):
+            response = (kinds.get("ai_response") or [{}])[0]
+            if "ai" in stages:
+                first = total = stages["ai"]["seconds"]
+            else:
+                total = stages.get("ai_stream", stages.get("ai_first_token", {})).get("seconds", 0.0)
+                first = stages.get("ai_first_token", {}).get("seconds", total)
+            ai_script.append({"text": response.get("text"), "ok": bool(response.get("text")),
+                              "first": first, "total": total})
+        # Only tickets printed from an AI answer are reproducible (pool and fallback texts aren't)
+        ticket = (kinds.get("ticket") or [{}])[0]
+        tickets.append(ticket.get("text") if kinds.get("ai_request") and response.get("text")
+                       and not ticket.get("fallback") else None)
+
+    recorded = {}
+    for e in events:
+        if e["type"] == "stage":
+            recorded.setdefault(e["stage"], []).append(e["seconds"])
+    return {"arrivals": arrivals, "script": script, "clips": clips, "answers": answers,
+            "ai_script": ai_script, "tickets": tickets, "recorded": recorded, "customers": len(customers),
+            "duration": events[-1]["t"] - t0 if events else 0.0}
+
+
+# ---- Report ----
+def _words(text: str) -> str:
+    return " ".join(text.split())
+
+
+def mismatched_tickets(replay: dict, results: dict) -> list:
+    """Customer numbers (1-based) whose replayed ticket differs from the recorded one."""
+    printed = results.get("tickets", [])
+    bad = []
+    for i, recorded in enumerate(replay["tickets"]):
+        if recorded is None:
+            continue
+        expected = _words(encode_for_printer(recorded).decode("cp437"))
+        if i >= len(printed) or _words(printed[i]) != expected:
+            bad.append(i + 1)
+    return bad
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def _clock(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes // 60}h{minutes % 60:02d}m" if minutes >= 60 else f"{minutes}m{secs:02d}s"
+
+
+def list_sessions(sessions):
+    print(f"  {'session':<10}{'started':<18}{'persona':<16}{'coins':>6}{'length':>9}  audio")
+    for s in sessions:
+        events = s["events"]
+        started = s["info"].get("started")
+        when = datetime.fromtimestamp(started).strftime("%Y-%m-%d %H:%M") if started else "?"
+        coins = sum(e.get("credits", 1) for e in events if e["type"] == "coin")
+        audio = "yes" if any(e["type"] == "audio" for e in events) else "no"
+        length = _clock(events[-1]["t"]) if events else "-"
+        print(f"  {s['id']:<10}{when:<18}{s['info'].get('persona', '?'):<16}{coins:>6}{length:>9}  {audio}")
+
+
+def report(session: dict, replay: dict, results: dict, speed: float, mode: str):
+    print(f"\n📼 Session {session['id']} ({session['info'].get('persona', '?')}, replayed {mode} at {speed:g}x): "
+          f"{results['customers']}/{len(replay['arrivals'])} customers over {_clock(replay['duration'])}")
+    q = lambda d: f"p50 {d['p50']:.2f}s  p90 {d['p90']:.2f}s  p99 {d['p99']:.2f}s"
+    print(f"  {'throughput':<20}{results['throughput_per_hour']:.1f} customers/hour")
+    print(f"  {'coin → first line':<20}{q(results['coin_to_first_line'])}")
+    print(f"  {'coin → cut':<20}{q(results['coin_to_cut'])}")
+    print(f"  {'cycles':<20}" + " ".join(f"{k}={v}" for k, v in sorted(results["cycles"].items())))
+
+    print(f"\n  {'stage':<16}{'recorded p50':>13}{'p90':>8}{'replay p50':>12}{'p90':>8}")
+    replayed = results["stages"]
+    for name in sorted(set(replay["recorded"]) | set(replayed)):
+        values = replay["recorded"].get(name, [])
+        rec = f"{_percentile(values, 0.5):>12.2f}s{_percentile(values, 0.9):>7.2f}s" if values else f"{'-':>13}{'-':>8}"
+        rep = replayed.get(name)
+        now = f"{rep['p50']:>11.2f}s{rep['p90']:>7.2f}s" if rep else f"{'-':>12}{'-':>8}"
+        print(f"  {name:<16}{rec}{now}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded kiosk session on simulated devices")
+    parser.add_argument("traces", nargs="*", type=Path, help="Trace files, oldest first (default: SESSION_FILE and its backups)")
+    parser.add_argument("--list", action="store_true", help="List the sessions in the trace and exit")
+    parser.add_argument("--session", help="Session id to replay (default: the latest)")
+    parser.add_argument("--speed", type=float, default=10.0, help="Device time speed-up (default: 10)")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, help="Override the recorded --stream")
+    parser.add_argument("--pipelined", action=argparse.BooleanOptionalAction, help="Override the recorded --pipelined")
+    parser.add_argument("--pipeline-depth", type=int)
+    parser.add_argument("--line-rate", type=float, default=30.0, help="Printer text lines per second")
+    parser.add_argument("--cue-seconds", type=float, default=0.8, help="Length of the 'mic ready' cue")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    paths = args.traces or SessionRecorder().log.files()
+    sessions = split_sessions(load_events(paths))
+    if not sessions:
+        print(f"No recorded sessions in {', '.join(map(str, paths)) or SessionRecorder().log.path} "
+              f"-- run the kiosk with SESSION_RECORD=1")
+        sys.exit(1)
+    if args.list:
+        list_sessions(sessions)
+        return
+    chosen = [s for s in sessions if s["id"] == args.session] if args.session else sessions[-1:]
+    if not chosen:
+        print(f"No session '{args.session}' (see --list)")
+        sys.exit(1)
+    session = chosen[-1]
+    info = session["info"]
+    replay = build_replay(session)
+
+    stream = info.get("stream", False) if args.stream is None else args.stream
+    pipelined = info.get("pipelined", False) if args.pipelined is None else args.pipelined
+    depth = args.pipeline_depth or info.get("pipeline_depth", 1)
+    mode = "pipelined" if pipelined else "streamed" if stream else "one at a time"
+    print(f"📼 Replaying session {session['id']}: {len(replay['arrivals'])} coins over "
+          f"{_clock(replay['duration'])} at {args.speed:g}x ({mode})")
+
+    server = MockAIServer(script=replay["ai_script"]).start()
+    booth = SimBooth(replay["clips"] or [None], replay["arrivals"], server, line_rate=args.line_rate,
+                     cue_seconds=args.cue_seconds, speed=args.speed, script=replay["script"],
+                     persona=info.get("persona", "default"), stream=stream,
+                     stream_stt=info.get("stream_stt", False), pipelined=pipelined, pipeline_depth=depth,
+                     env={"STT_STATIC_TEXT": "|".join(replay["answers"]) or "What is my fortune?",
+                          # One recorded answer per request: no retries, no hedged duplicates
+                          "AI_RETRIES": "0", "AI_HEDGE": "0"})
+    results = booth.run()
+    report(session, replay, results, args.speed, mode)
+    if args.json:
+        args.json.write_text(json.dumps({"session": session["id"], "speed": args.speed, "mode": mode,
+                                         "results": results}, indent=2) + "\n")
+    checked = sum(t is not None for t in replay["tickets"])
+    bad = mismatched_tickets(replay, results)
+    print(f"  {'tickets':<20}{checked - len(bad)}/{checked} AI tickets as recorded"
+          + (f" (differ: customer {', '.join(map(str, bad))})" if bad else ""))
+    if results["customers"] < len(replay["arrivals"]) or bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# response_cache.py - Serve cached fortunes for questions similar to earlier ones
+#
+# Festival questions repeat a lot ("will I find love?", "what does my future
+# hold?"). Questions are normalized and compared with character-trigram cosine
+# similarity -- no external service -- and a near match is answered from a small
+# set of fortunes collected for that question, never the same one twice in a row.
+# Changes are written to disk by a background thread every SAVE_SECONDS (and at
+# exit), never on the customer's path.
+
+import atexit
+import json
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+# Resolve paths relative to this file, not the working directory
+_BASE_DIR = Path(__file__).resolve().parent
+CACHE_PATH = _BASE_DIR / ".cache" / "response_cache.json"
+SAVE_SECONDS = 5.0
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _NON_WORD.sub(" ", question.lower()).strip()
+
+
+def trigrams(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(n * b[g] for g, n in a.items() if g in b)
+    norm = math.sqrt(sum(n * n for n in a.values())) * math.sqrt(sum(n * n for n in b.values()))
+    return dot / norm
+
+
+class ResponseCache:
+    """Per-persona similar-question cache with LRU eviction and JSON persistence.
+
+    A question only counts as a hit once its entry holds `variants` fortunes;
+    until then misses add variety to the nearest entry instead of creating a
+    new one.
+    """
+
+    def __init__(self, path: Path = None, threshold: float = None, max_entries: int = None,
+                 variants: int = None):
+        self.path = path or CACHE_PATH
+        self.threshold = threshold if threshold is not None else float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.75"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("RESPONSE_CACHE_MAX", "300"))
+        self.variants = variants if variants is not None else int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+        self.hits = 0
+        self.misses = 0
+        self._personas = {}      # persona -> OrderedDict(normalized question -> entry)
+        self._last_served = {}   # persona -> fortune text
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # One writer at a time (flusher thread, close())
+        self._dirty = False
+        self._closed = threading.Event()
+        self._load()
+        threading.Thread(target=self._flush_loop, name="response-cache-save", daemon=True).start()
+        atexit.register(self.close)
+
+    def lookup(self, persona: str, question: str):
+        """Return a cached fortune for a similar question, or None on a miss."""
+        norm = normalize_question(question)
+        with self._lock:
+            entries = self._personas.get(persona)
+            key, score = self._nearest(entries, norm)
+            if key is None or score < self.threshold:
+                self.misses += 1
+                return None
+            entry = entries[key]
+            last = self._last_served.get(persona)
+            choices = [f for f in entry["fortunes"] if f != last]
+            if len(entry["fortunes"]) < self.variants or not choices:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            fortune = random.choice(choices)
+            self._last_served[persona] = fortune
+            self.hits += 1
+            self._dirty = True
+            return fortune
+
+    def store(self, persona: str, question: str, fortune: str):
+        """Record a freshly generated fortune (also marks it as last served)."""
+        norm = normalize_question(question)
+        if not norm or not fortune:
+            return
+        with self._lock:
+            entries = self._personas.setdefault(persona, OrderedDict())
+            key, score = self._nearest(entries, norm)
+            if key is None or score < self.threshold:
+                key = norm
+                entries[key] = {"grams": trigrams(norm), "fortunes": []}
+            entry = entries[key]
+            if fortune not in entry["fortunes"]:
+                entry["fortunes"].append(fortune)
+                del entry["fortunes"][:-self.variants]
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)  # Least recently used
+            self._last_served[persona] = fortune
+            self._dirty = True
+
+    def _nearest(self, entries, norm: str):
+        if not entries or not norm:
+            return None, 0.0
+        if norm in entries:
+            return norm, 1.0
+        grams = trigrams(norm)
+        best, best_score = None, 0.0
+        for key, entry in entries.items():
+            score = cosine(grams, entry["grams"])
+            if score > best_score:
+                best, best_score = key, score
+        return best, best_score
+
+    # ---- Persistence ----
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"  ⚠ Ignoring unreadable response cache {self.path}: {e}")
+            return
+        for persona, items in data.items():
+            entries = OrderedDict()
+            for key, fortunes in items:  # Stored least- to most-recently used
+                entries[key] = {"grams": trigrams(key), "fortunes": fortunes}
+            self._personas[persona] = entries
+
+    def flush(self):
+        """Write pending changes to disk (no-op if nothing changed)."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = {
+                    persona: [[key, list(e["fortunes"])] for key, e in entries.items()]
+                    for persona, entries in self._personas.items()
+                }
+            self._save(data)
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._closed.wait(SAVE_SECONDS):
+            self.flush()
+
+    def _save(self, data: dict):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"  ⚠ Could not save response cache: {e}")
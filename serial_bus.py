@@ -0,0 +1,296 @@
+# serial_bus.py - One long-lived owner for the Arduino serial port
+#
+# The Uno resets every time its port is opened, so the port is opened exactly
+# once. A reader thread hands each incoming line to subscribers, and a writer
+# thread drains a queue of outgoing commands (LED START/STOP, ...). Instead of
+# sleeping through the reset, callers wait_ready() for the sketch's READY line.
+#
+# If the board drops off USB the bus supervises the port instead of dying: it
+# backs off, looks for the board again (by its USB serial number, so a new
+# device name after the replug is fine), reopens it and waits for READY
+# before the queued commands go out. Subscribers, the write queue and
+# whatever the kiosk has queued (coins) stay as they are; reconnects and
+# downtime are counted and recorded as metrics stage "serial_reconnect".
+
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+try:
+    import serial
+except Exception:
+    serial = None
+
+SERIAL_RECONNECT = os.getenv("SERIAL_RECONNECT", "1").lower() in ("1", "true", "yes")
+SERIAL_BACKOFF_MIN = float(os.getenv("SERIAL_BACKOFF_MIN", "0.5"))
+SERIAL_BACKOFF_MAX = float(os.getenv("SERIAL_BACKOFF_MAX", "2"))
+
+
+class SerialBus:
+    """Shared serial connection with a background reader and a write queue.
+
+    finder() lists (device, serial number) of the boards present, to find
+    this one again after a replug; opener(port) opens a serial-like object
+    (default: pyserial). generation goes up each time the port is reopened;
+    booted is the generation whose sketch was last seen printing READY.
+    """
+
+    def __init__(self, port: str, baud: int = 115200, timeout: float = 1.0, serial_number: str = None,
+                 finder=None, opener=None, reconnect: bool = SERIAL_RECONNECT, ready_timeout: float = 5.0):
+        self.port = port
+        self.baud = baud
+        self.timeout = timeout
+        self.serial_number = serial_number
+        self.reconnect = reconnect
+        self.ready_timeout = ready_timeout
+        self.generation = 0
+        self.booted = None  # Last generation whose sketch was seen starting (a READY line)
+        self.reconnects = 0
+        self.downtime = 0.0
+        self._finder = finder
+        self._opener = opener
+        self._supervised = False
+        self._down_since = None
+        self._up = threading.Event()  # Port open and in sync: the writer may send
+        self._ser = None
+        self._subscribers = []
+        self._sub_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        self.ready = threading.Event()  # Set once the sketch is known to be running
+
+    @property
+    def ok(self) -> bool:
+        return self._ser is not None
+
+    @property
+    def alive(self) -> bool:
+        """True while the reader thread is still consuming the port (or getting it back)."""
+        return (self.ok or self.down) and not self._stop.is_set()
+
+    @property
+    def down(self) -> bool:
+        """The board is gone and the bus is trying to reconnect."""
+        return self._down_since is not None
+
+    def open(self, ser=None):
+        """Open the port and start the reader/writer threads. Raises on failure.
+
+        ser: an already-open serial-like object (readline/write/close) to use
+        instead of the port, e.g. a simulated board from sim_devices.py. It is
+        only reconnected if an opener was given.
+        """
+        if ser is None and self._opener is None and serial is None:
+            raise RuntimeError("pyserial is not installed")
+        self._ser = ser if ser is not None else self._open_port(self.port)
+        self._supervised = self.reconnect and (ser is None or self._opener is not None)
+        if self.serial_number is None:
+            self.serial_number = next((sn for device, sn in self._ports() if device == self.port), None)
+        self._stop.clear()
+        self.ready.clear()
+        self._up.set()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="serial-reader", daemon=True),
+            threading.Thread(target=self._write_loop, name="serial-writer", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def subscribe(self, callback):
+        """Register callback(line: str) for every non-empty line read from the port."""
+        with self._sub_lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._sub_lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def write(self, line: str):
+        """Queue a newline-terminated command. Never blocks on the device."""
+        if not line.endswith("\n"):
+            line += "\n"
+        self._writes.put(line.encode("utf-8"))
+
+    def wait_ready(self, timeout: float, probe: str = "STOP", probe_after: float = 2.5) -> bool:
+        """Block until the sketch prints READY (it does at the end of its reset).
+
+        A board that didn't reset on open never prints READY, so after
+        probe_after seconds the probe command is sent; the sketch echoes every
+        command ("Received: ..."), which counts as ready too.
+        Returns False on timeout.
+        """
+        if self.ready.wait(min(timeout, probe_after)):
+            return True
+        if probe and self.alive:
+            self.write(probe)
+        return self.ready.wait(max(0.0, timeout - probe_after))
+
+    def reset_input_buffer(self):
+        try:
+            if self._ser:
+                self._ser.reset_input_buffer()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Port, whether it is connected, reconnects and total seconds without the board."""
+        down = time.monotonic() - self._down_since if self.down else 0.0
+        return {"port": self.port, "connected": self.ok, "reconnects": self.reconnects,
+                "downtime": self.downtime + down}
+
+    def close(self):
+        self._stop.set()
+        self._writes.put(None)  # Wake the writer
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout=2)
+        try:
+            if self._ser:
+                self._ser.close()
+        except Exception:
+            pass
+        self._ser = None
+
+    # ---- Threads ----
+    def _dispatch(self, line: str):
+        if line == "READY":
+            self.booted = self.generation
+        if line == "READY" or line.startswith("Received: "):
+            self.ready.set()
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for cb in subscribers:
+            try:
+                cb(line)
+            except Exception as e:
+                print(f"  ⚠ Serial subscriber error: {e}")
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                raw = self._ser.readline()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                if not self._supervised:
+                    print(f"  ⚠ Serial read error: {e}")
+                    self._stop.set()
+                    break
+                self._lost(e)
+                if not self._reconnect_loop():
+                    break
+                continue
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line:
+                self._dispatch(line)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            data = self._writes.get()
+            if data is None:
+                continue
+            while not self._up.wait(0.5):  # Hold commands while the board is away
+                if self._stop.is_set():
+                    return
+            try:
+                self._ser.write(data)
+            except Exception as e:
+                if not self.down:
+                    print(f"  ⚠ Serial write error: {e}")
+
+    # ---- Reconnect ----
+    def _open_port(self, port: str):
+        if self._opener is not None:
+            return self._opener(port)
+        return serial.Serial(port, self.baud, timeout=self.timeout)
+
+    def _ports(self) -> list:
+        try:
+            return self._finder() if self._finder else []
+        except Exception:
+            return []
+
+    def _locate(self):
+        """The board's device now: by serial number if known, else the old name (or the only board)."""
+        ports = self._ports()
+        if self.serial_number:
+            return next((device for device, sn in ports if sn == self.serial_number), None)
+        devices = [device for device, _ in ports]
+        if len(devices) == 1 and self.port not in devices:
+            return devices[0]
+        return self.port
+
+    def _lost(self, error: Exception):
+        self._up.clear()
+        self.ready.clear()
+        self._down_since = time.monotonic()
+        print(f"  🔌 Arduino on {self.port} lost ({error}) - reconnecting")
+        self._drop_port()
+
+    def _drop_port(self):
+        try:
+            self._ser.close()
+        except Exception:
+            pass
+        self._ser = None
+
+    def _reconnect_loop(self) -> bool:
+        """Reopen the board with exponential backoff. False if the bus was closed meanwhile."""
+        delay = SERIAL_BACKOFF_MIN
+        while not self._stop.wait(delay):
+            delay = min(SERIAL_BACKOFF_MAX, delay * 2)
+            port = self._locate()
+            if port is None:
+                continue  # Not plugged back in yet
+            try:
+                self._ser = self._open_port(port)
+            except Exception:
+                continue
+            self.generation += 1
+            if not self._resync():
+                self.ready.clear()
+                self._drop_port()  # Gone again before it came up: keep backing off
+                continue
+            self.port = port
+            seconds = time.monotonic() - self._down_since
+            self.downtime += seconds
+            self.reconnects += 1
+            self._down_since = None
+            self._up.set()
+            synced = self.ready.is_set()
+            metrics.record("serial_reconnect", seconds, "ok" if synced else "no_ready")
+            print(f"  🔌 Arduino back on {port} after {seconds:.1f}s{'' if synced else ' (no READY yet)'}")
+            return True
+        if self.down:
+            self.downtime += time.monotonic() - self._down_since
+            self._down_since = None
+        return False
+
+    def _resync(self) -> bool:
+        """Read (and dispatch) until the restarted sketch's READY, probing like wait_ready().
+
+        False if the port failed meanwhile."""
+        start = time.monotonic()
+        probed = False
+        while not self.ready.is_set() and not self._stop.is_set() and time.monotonic() - start < self.ready_timeout:
+            try:
+                raw = self._ser.readline()
+            except Exception:
+                return False
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line:
+                self._dispatch(line)
+            if not probed and time.monotonic() - start > 2.5:  # Board didn't reset on open
+                try:
+                    self._ser.write(b"STOP\n")
+                except Exception:
+                    pass
+                probed = True
+        return True
@@ -1,20 +1,33 @@
 # serial_trigger.py - Orchestrates the full fortune-telling flow
-# Adds short audio cues (afplay) and fail-safe LED cues without changing core logic.
+# Adds short audio cues (sfx.py) and fail-safe LED cues without changing core logic.
 
+import os
 import sys
 import re
+import contextvars
+import threading
+import signal
 import argparse
-import subprocess
-import serial
 import time
-import speech_recognition as sr
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
-from ai_client import get_ai_response, init_ai
-from formatters import render_ticket
-from print_client import print_ticket
-from config_loader import load_config, list_personas
+from boot import BootSequence
+from ai_client import get_ai_response, get_ai_batch, select_persona, init_providers, stream_ai_response, set_fortune_pool, provider_stats, length_stats
+from formatters import ticket_template, LineWrapper
+from print_client import print_ticket, PrintSession, spooler_stats, warm_up_printer
+from config_loader import list_personas, prompt_report
+from persona_registry import get_registry
+from serial_bus import SerialBus
+from fortune_pool import FortunePool
+from stage_engine import StageEngine, StageTimeout, StageBusy
+from pipeline import PipelinedRunner
+from coin_ledger import CoinLedger
+from endpointing import MicListener
+from sfx import init_sfx, play as play_sfx, wait_for, close_sfx
+import metrics
+import session_recorder
+# speech_recognition and stt (plus any local speech model) are imported when first
+# needed, on a boot thread, so they load in parallel with everything else
 
 # ---- Optional LED client (safe no-op if missing) ----
 try:
@@ -32,11 +45,16 @@ _BASE_DIR = Path(__file__).resolve().parent
 # ---- Serial config ----
 PORT = "/dev/cu.usbmodem143301"  # Change to your Arduino port, e.g. "COM4" on Windows
 BAUD = 115200
+ARDUINO_READY_TIMEOUT = float(os.getenv("ARDUINO_READY_TIMEOUT", "5"))  # Max wait for READY after open
+ARDUINO_SERIAL_NUMBER = os.getenv("ARDUINO_SERIAL_NUMBER", "")  # Pick the board by USB serial number
 
 # ---- Timeout configuration (in seconds) ----
 TIMEOUT_RECORDING = 15      # Max time to wait for speech input
+LISTEN_TIMEOUT    = 10      # Max wait for the customer to start speaking
+PHRASE_TIME_LIMIT = 8       # Longest question recorded
 TIMEOUT_AI        = 30      # Max time for AI response
 TIMEOUT_PRINT     = 10      # Max time for printing
+TIMEOUT_CYCLE     = 75      # Total budget for one coin → paper cycle (fallback print excluded)
 
 # ---- Audio cues ----
 SFX_START = str(_BASE_DIR / "sfx" / "sfx_magic.mp3")      # Plays when mic is ready
@@ -45,117 +63,370 @@ SFX_END   = str(_BASE_DIR / "sfx" / "sfx_generate.mp3")   # Plays when AI starts
 # LED control usually shares the same board/port
 LED_PORT = PORT  # override with --port if you use a separate LED Arduino
 
-# ---- Module-level config (set at startup by main()) ----
-_config = None
+# ---- Streaming (set by --stream): print each line while the AI is still generating ----
+STREAM_PRINT = False
+
+# ---- Pipelining (set by --pipelined): listen to customer N+1 while N prints ----
+PIPELINED = False
+PIPELINE_DEPTH = 1  # Jobs buffered between stages before the previous stage blocks
+
+FALLBACK_MESSAGE = "Narly drifted off in the currents... try again in a moment."
+
+# ---- Stage runner: hard deadlines, one shared executor for device I/O ----
+def _record_stage(stage: str, seconds: float, outcome: str):
+    metrics.record(f"stage_{stage}", seconds, outcome)
+
+_engine = StageEngine(on_stage=_record_stage)
+
+LED_BUSY_MODE = "SPARKLE"  # Shown while the coin queue is full
+
+# ---- Always-open mic with adaptive endpointing (None = fixed recognizer.listen) ----
+ENDPOINTING = os.getenv("ENDPOINTING", "adaptive")  # "fixed" restores calibrate + 1.5 s pause
+
+# ---- Speech-to-text router (STT_MODE/STT_BACKEND) and overlapped chunk transcription (--stream-stt) ----
+_stt = None
+STREAM_STT = False
+
+# ---- Booths: one cabinet's devices, coin queue and persona ----
+class Booth:
+    """Per-cabinet state. A single kiosk runs the default booth; multi_booth.py runs several
+    in one process, each on its own threads with current_booth() pointing at it."""
+
+    def __init__(self, name: str = "booth", port: str = None, persona: str = None, mic_index=None,
+                 spooler=None, lpr_printer: str = None, speaker: str = None):
+        self.name = name
+        self.port = port
+        self.persona = persona          # None: follow the registry's active persona (single kiosk)
+        self.mic_index = mic_index      # Audio input device (None = system default)
+        self.spooler = spooler          # PrintSpooler of this cabinet's USB printer (None = process-wide)
+        self.lpr_printer = lpr_printer  # CUPS printer name (None = PRINTER env var)
+        self.speaker = speaker          # Audio output for the cues, by name (None = system default)
+        self.bus = None                 # Serial bus to the cabinet's Arduino
+        self.ledger = None              # Coin credits waiting for a cycle (created by the active mode)
+        self.runner = None              # Pipelined runner (None = one customer at a time)
+        self.mic = None                 # Always-open MicListener (None = fixed recognizer.listen)
+        self.pool = None                # Pre-generated fortunes for the no-question and AI-failure paths
+        # Persona switch requested at runtime (serial PERSONA line, SIGUSR1, simulate prompt),
+        # applied between customers so no ticket mixes two personas and queued coins just wait
+        self.pending_persona = None
+        # Guards pending_persona and the switch: the pipeline's state callback and the main
+        # loop both apply it. Reentrant because SIGUSR1 requests on the main thread
+        self.persona_lock = threading.RLock()
+        self.pipeline_led_mode = None
+        self.led_mode = None            # Animation the current stage asked for (None = off)
+        self.led_busy = False           # Coin queue full: LED_BUSY_MODE holds until it has room
+        self.stopping = False           # Set to end the serial loop (multi-booth shutdown)
+
+    def device(self, kind: str) -> str:
+        """Stage engine device key: "mic", "printer" -- qualified by name when booths share the engine."""
+        return kind if self is _default_booth else f"{self.name}:{kind}"
+
+_default_booth = Booth()
+_booth = contextvars.ContextVar("booth", default=_default_booth)
+
+# ---- Fortune pools shared by the booths showing the same persona (multi-booth) ----
+_pools = {}
 
 # ----------------------------------------
 # Helpers
 # ----------------------------------------
-def afplay(path: str, wait=False, volume=1.0):
-    """Play a short WAV/AIFF/MP3 via macOS 'afplay'. Never crash if missing."""
-    if not path or not Path(path).exists():
-        return
+def find_ports() -> list:
+    """(device, serial number) of every Arduino-like serial port, in device order."""
     try:
-        if wait:
-            subprocess.run(["afplay", "-v", str(volume), path], check=False)  # Wait for completion
-        else:
-            subprocess.Popen(["afplay", "-v", str(volume), path])  # Fire and forget
+        import serial.tools.list_ports
+        return sorted((p.device, p.serial_number) for p in serial.tools.list_ports.comports()
+                      if "Arduino" in (p.description or "") or "usbmodem" in (p.device or ""))
     except Exception:
-        pass
+        return []
+
+def find_port(serial_number: str = None):
+    """Try to auto-detect an Arduino-like serial device if --port not provided
+    (the one with this USB serial number, if given)."""
+    ports = find_ports()
+    if serial_number:
+        return next((device for device, sn in ports if sn == serial_number), None)
+    return ports[0][0] if ports else None
+
+def current_booth() -> Booth:
+    """The booth this thread (or stage) works for."""
+    return _booth.get()
+
+def use_booth(booth: Booth):
+    """Make booth current in this thread and in the stages it starts."""
+    _booth.set(booth)
+    metrics.set_booth(None if booth is _default_booth else booth.name)
+
+def in_booth(booth: Booth, fn):
+    """fn wrapped to run for booth, e.g. on a worker thread that didn't start in its context."""
+    def run(*args, **kwargs):
+        use_booth(booth)
+        return fn(*args, **kwargs)
+    return run
+
+def booth_persona() -> str:
+    b = current_booth()
+    return b.persona or get_registry().active
+
+def booth_config() -> dict:
+    """Config of the current booth's persona (hot-reloaded)."""
+    return get_registry().get(booth_persona())
+
+def make_bus(port: str) -> SerialBus:
+    """Serial bus for port that finds its board again (by serial number) after a replug."""
+    return SerialBus(port, BAUD, finder=find_ports, ready_timeout=ARDUINO_READY_TIMEOUT)
 
-def find_port():
-    """Try to auto-detect an Arduino-like serial device if --port not provided."""
+def open_bus(port: str):
+    """Open the shared serial bus on port. Returns None if the device is unavailable."""
     try:
-        import serial.tools.list_ports
-        for p in serial.tools.list_ports.comports():
-            if "Arduino" in (p.description or "") or "usbmodem" in (p.device or ""):
-                return p.device
-    except Exception:
-        pass
-    return None
+        return make_bus(port).open()
+    except Exception as e:
+        print(f"  ⚠ Could not open serial port {port}: {e}")
+        return None
+
+def connect_arduino(port: str, required: bool = True):
+    """Open the shared bus and wait for the sketch's READY line (the Uno resets on open).
+
+    required=False returns None instead of raising when the port can't be opened.
+    """
+    bus = make_bus(port).open() if required else open_bus(port)
+    if bus and not bus.wait_ready(ARDUINO_READY_TIMEOUT):
+        print(f"  ⚠ No READY from Arduino within {ARDUINO_READY_TIMEOUT:.0f}s - continuing anyway")
+    return bus
+
+class BoothLed(LedClient):
+    """LedClient that keeps LED_BUSY_MODE up while the booth's coin queue is full.
+
+    Stage animations asked for meanwhile are remembered and shown once it has room.
+    """
+
+    def __init__(self, booth):
+        if booth.bus is None:
+            super().__init__(port=None)  # No port -> safe no-op
+        else:
+            super().__init__(bus=booth.bus)
+        self._booth = booth
+
+    def start(self, mode="GLOW"):
+        self._booth.led_mode = mode
+        if not self._booth.led_busy:
+            super().start(mode)
+
+    def stop(self):
+        self._booth.led_mode = None
+        if not self._booth.led_busy:
+            super().stop()
+
+def make_led():
+    """LED client bound to the booth's bus (no-op if the bus isn't open)."""
+    return BoothLed(current_booth())
+
+def open_mic(device_index=None):
+    """Start the always-open mic listener. Returns None (fixed endpointing) on failure."""
+    if ENDPOINTING != "adaptive":
+        return None
+    try:
+        return MicListener(device_index=device_index).start()
+    except Exception as e:
+        print(f"  ⚠ Adaptive endpointing unavailable, using fixed pause: {e}")
+        return None
+
+def make_pool(persona: str, register: bool = True) -> FortunePool:
+    """Background fortune pool for persona, also served by the "pool" AI provider (register)."""
+    question = get_registry().get(persona).get("default_question", "What is my fortune?")
+    pool = FortunePool(persona, lambda: get_ai_response(question, use_cache=False, use_pool=False,
+                                                        persona=persona, metric="ai_refill"),
+                       generate_batch=lambda n: get_ai_batch(question, n, persona=persona)).start()
+    if register:
+        set_fortune_pool(pool)
+    return pool
+
+def shared_pool(persona: str) -> FortunePool:
+    """The one pool for persona that every booth showing it takes from (multi-booth)."""
+    if persona not in _pools:
+        _pools[persona] = make_pool(persona, register=False)
+    return _pools[persona]
+
+def request_persona(name: str):
+    """Ask for a persona switch; it happens as soon as no customer is in flight."""
+    b = current_booth()
+    with b.persona_lock:
+        b.pending_persona = name
+    print(f"  🎭 Persona switch to '{name}' requested")
+    session_recorder.record("persona", name=name)
+
+def apply_pending_persona():
+    """Switch persona if one was requested. Call only while no cycle is in flight."""
+    b = current_booth()
+    with b.persona_lock:
+        name, b.pending_persona = b.pending_persona, None
+        if name and name != booth_persona() and _switch_persona(b, name):
+            print(f"  🎭 Persona is now '{name}'")
+
+def _switch_persona(b: Booth, name: str) -> bool:
+    """Point the booth (or the single kiosk) at persona name and its pool."""
+    if b.persona is None:  # Single kiosk: the process-wide active persona
+        if not get_registry().switch(name):
+            return False
+        if b.pool:
+            b.pool.stop()
+        b.pool = make_pool(name)
+    else:
+        try:
+            get_registry().get(name)
+        except Exception as e:
+            print(f"  ⚠ Cannot switch to persona '{name}': {e}")
+            return False
+        b.persona = name
+        b.pool = shared_pool(name)
+    return True
+
+def next_persona():
+    """SIGUSR1: cycle to the next persona."""
+    names = get_registry().names()
+    if names:
+        active = get_registry().active
+        request_persona(names[(names.index(active) + 1) % len(names)] if active in names else names[0])
+
+def take_pooled_fortune():
+    """Pop a pre-generated fortune for the booth's persona (None if none ready)."""
+    pool = current_booth().pool
+    return pool.take() if pool else None
 
 # ----------------------------------------
 # Recording / Transcription
 # ----------------------------------------
-def record_and_transcribe():
-    """Record audio from microphone and transcribe to text."""
+def record_and_transcribe(deadline: float = None):
+    """Record audio from microphone and transcribe to text.
+
+    deadline (time.monotonic()) caps the listen window and the STT request.
+    With --stream-stt (and the always-open mic) chunks are transcribed while
+    the customer is still talking.
+    """
+    import speech_recognition as sr
+    from stt import make_stt, StreamingTranscriber
+
+    global _stt
+    if _stt is None:
+        _stt = make_stt()
+    b = current_booth()
+    mic = b.mic
     recognizer = sr.Recognizer()
-    mic = sr.Microphone()
+    transcriber = None
+    if mic:
+        mic.pause_tracking()  # Our own sound isn't ambient noise
 
     # Play sound first - signals mic is about to be ready
-    afplay(SFX_START, wait=True, volume=3.0)  # 2x louder (adjust 1.0-4.0)
+    cue = play_sfx(SFX_START, volume=3.0, output=b.speaker)  # 2x louder (adjust 1.0-4.0)
 
-    print("  🎤 Listening for question...")
     try:
-        with mic as source:
-            # Quick ambient noise calibration while sound plays
-            recognizer.adjust_for_ambient_noise(source, duration=0.8)
-            # Settings tuned for noisy environments
-            recognizer.pause_threshold = 1.5  # Allow pauses while thinking through question
-            recognizer.energy_threshold = 1100  # Lower threshold to capture speech
-            recognizer.dynamic_energy_threshold = False  # Use fixed threshold
+        listen_timeout, phrase_limit = LISTEN_TIMEOUT, PHRASE_TIME_LIMIT
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            listen_timeout = max(0.5, min(listen_timeout, left - 2))
+            phrase_limit = max(1, min(phrase_limit, left - 2))
+        if mic and STREAM_STT:
+            transcriber = StreamingTranscriber(_stt, mic.sample_rate, mic.sample_width, deadline)
+        with metrics.stage("cue"):
+            # Mic opens the moment the cue has left the speaker (a stalled output can't eat the cycle)
+            wait_for(cue, 10.0 if deadline is None else max(0.0, min(10.0, deadline - time.monotonic())))
+        print("  🎤 Listening for question...")
+        with metrics.stage("listen") as span:
+            if mic:
+                # Noise floor is already known; the endpointer decides when they're done
+                audio = mic.listen(timeout=listen_timeout, phrase_time_limit=phrase_limit,
+                                   on_chunk=transcriber.feed if transcriber else None)
+                print(f"  ✓ End of speech after {mic.last_endpoint_delay:.2f}s silence")
+                span.sizes["endpoint_delay"] = mic.last_endpoint_delay
+            else:
+                with sr.Microphone(device_index=b.mic_index) as source:
+                    # Quick ambient noise calibration while sound plays
+                    with metrics.stage("calibrate"):
+                        recognizer.adjust_for_ambient_noise(source, duration=0.8)
+                    # Settings tuned for noisy environments
+                    recognizer.pause_threshold = 1.5  # Allow pauses while thinking through question
+                    recognizer.energy_threshold = 1100  # Lower threshold to capture speech
+                    recognizer.dynamic_energy_threshold = False  # Use fixed threshold
 
-            # Mic is ready now, listen for speech
-            audio = recognizer.listen(source, timeout=10, phrase_time_limit=8)
+                    # Mic is ready now, listen for speech
+                    audio = recognizer.listen(source, timeout=listen_timeout, phrase_time_limit=phrase_limit)
+            span.sizes["audio_seconds"] = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        session_recorder.record_audio(audio)
 
         print("  🧠 Transcribing...")
-        text = recognizer.recognize_google(audio)
+        # Lets the STT request time out by itself rather than hang the mic stage
+        stt_timeout = max(0.5, deadline - time.monotonic()) if deadline is not None else None
+        with metrics.stage("stt") as span:
+            if transcriber:
+                text = transcriber.finish(audio, stt_timeout, mic.last_speech_bytes)
+                print(f"  ✓ Merged {transcriber.chunks} chunk transcript(s)")
+                span.sizes["chunks"] = transcriber.chunks
+            else:
+                text = _stt.transcribe(audio, stt_timeout)
+            span.sizes["chars"] = len(text)
         print(f"  ✓ Question: {text}")
+        session_recorder.record("question", text=text)
         return text
     except sr.WaitTimeoutError:
         print("  ⚠ No speech detected (timeout)")
+        session_recorder.record("question", text=None, error="no speech")
         return None
     except sr.UnknownValueError:
         print("  ⚠ Could not understand audio")
+        session_recorder.record("question", text=None, error="unknown")
         return None
     except sr.RequestError as e:
         print(f"  ⚠ Speech recognition error: {e}")
+        session_recorder.record("question", text=None, error=str(e))
         return None
     except Exception as e:
         print(f"  ⚠ Microphone error: {e}")
+        session_recorder.record("question", text=None, error=str(e))
         return None
 
-def record_and_transcribe_with_timeout():
-    """Wrapper to enforce timeout on recording/transcription."""
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(record_and_transcribe)
-        try:
-            # Wait for recording + transcription to complete
-            # The inner function handles its own timeout (WaitTimeoutError)
-            return future.result(timeout=TIMEOUT_RECORDING + 10)  # Extra time for transcription
-        except TimeoutError:
-            print(f"  ⚠ Total timeout exceeded - force stopping")
-            return None
-        except Exception as e:
-            print(f"  ⚠ Unexpected error during recording: {e}")
-            return None
+def record_and_transcribe_with_timeout(cycle=None):
+    """Run recording/transcription as a mic stage with a hard deadline."""
+    try:
+        # Extra time over the recording window for transcription
+        return _engine.run("record", record_and_transcribe, timeout=TIMEOUT_RECORDING + 10,
+                           cycle=cycle, device=current_booth().device("mic"))
+    except StageTimeout as e:
+        print(f"  ⚠ Recording timeout ({e.limit:.0f}s exceeded) - moving on")
+        return None
+    except StageBusy as e:
+        print(f"  ⚠ {e}")
+        return None
+    except Exception as e:
+        print(f"  ⚠ Unexpected error during recording: {e}")
+        return None
 
 # ----------------------------------------
 # AI generation
 # ----------------------------------------
-def generate_fortune(question: str) -> str:
+def generate_fortune(question: str, deadline: float = None) -> str:
     """Call AI to generate fortune response."""
     print("  🔮 Generating fortune...")
+    persona = booth_persona()
+    session_recorder.record("ai_request", question=question, persona=persona)
     try:
-        fortune = get_ai_response(question)
+        fortune = get_ai_response(question, deadline=deadline, persona=persona)
         print(f"  ✓ Fortune generated ({len(fortune)} chars)")
+        session_recorder.record("ai_response", text=fortune)
         return fortune
     except Exception as e:
         print(f"  ⚠ AI error: {e}")
+        session_recorder.record("ai_response", text=None, error=str(e))
         return None
 
-def generate_fortune_with_timeout(question: str):
-    """Wrapper to enforce timeout on AI generation."""
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(generate_fortune, question)
-        try:
-            return future.result(timeout=TIMEOUT_AI)
-        except TimeoutError:
-            print(f"  ⚠ AI timeout ({TIMEOUT_AI}s exceeded)")
-            return None
-        except Exception as e:
-            print(f"  ⚠ Unexpected error during AI generation: {e}")
-            return None
+def generate_fortune_with_timeout(question: str, cycle=None):
+    """Run AI generation as a stage with a hard deadline (the request times out with it)."""
+    try:
+        return _engine.run("generate", generate_fortune, question, timeout=TIMEOUT_AI, cycle=cycle)
+    except StageTimeout as e:
+        print(f"  ⚠ AI timeout ({e.limit:.0f}s exceeded)")
+        return None
+    except Exception as e:
+        print(f"  ⚠ Unexpected error during AI generation: {e}")
+        return None
 
 # ----------------------------------------
 # Printing
@@ -164,35 +435,42 @@ def print_fortune(fortune: str, dry_run: bool = False):
     """Format and print fortune ticket."""
     print("  🖨️  Printing fortune...")
     try:
-        ticket = render_ticket(fortune, _config)
+        with metrics.stage("render") as span:
+            template = ticket_template(booth_config())
+            body = template.body(fortune)
+            text, job = template.text(body), template.escpos(body)
+            span.sizes.update(fortune_chars=len(fortune), ticket_bytes=len(job))
+        session_recorder.record("ticket", text=text)
         if dry_run:
             print("\n--- DRY RUN OUTPUT ---")
-            print(ticket)
+            print(text)
             print("--- END DRY RUN ---\n")
         else:
-            print_ticket(ticket)
+            b = current_booth()
+            with metrics.stage("printer", ticket_bytes=len(job)):
+                print_ticket(text, job, spooler=b.spooler, lpr_printer=b.lpr_printer)
             print("  ✓ Printed successfully")
     except Exception as e:
         print(f"  ⚠ Print error: {e}")
         raise
 
-def print_fortune_with_timeout(fortune: str, dry_run: bool = False):
-    """Wrapper to enforce timeout on printing."""
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(print_fortune, fortune, dry_run)
-        try:
-            future.result(timeout=TIMEOUT_PRINT)
-        except TimeoutError:
-            print(f"  ⚠ Print timeout ({TIMEOUT_PRINT}s exceeded)")
-            raise
-        except Exception as e:
-            print(f"  ⚠ Unexpected error during printing: {e}")
-            raise
+def print_fortune_with_timeout(fortune: str, dry_run: bool = False, cycle=None):
+    """Run printing as a printer stage with a hard deadline. Raises on failure."""
+    try:
+        _engine.run("print", print_fortune, fortune, dry_run, timeout=TIMEOUT_PRINT,
+                    cycle=cycle, device=current_booth().device("printer"))
+    except StageTimeout as e:
+        print(f"  ⚠ Print timeout ({e.limit:.0f}s exceeded)")
+        raise
+    except Exception as e:
+        print(f"  ⚠ Unexpected error during printing: {e}")
+        raise
 
 def print_fallback(dry_run: bool = False):
     """Print fallback message when something goes wrong."""
-    fallback_msg = "Narly drifted off in the currents... try again in a moment."
-    ticket = render_ticket(fallback_msg, _config)
+    b = current_booth()
+    ticket = ticket_template(booth_config()).render(FALLBACK_MESSAGE)
+    session_recorder.record("ticket", text=ticket, fallback=True)
 
     print("  ⚠ Printing fallback message.")
     if dry_run:
@@ -201,12 +479,11 @@ def print_fallback(dry_run: bool = False):
         print("--- END FALLBACK ---\n")
     else:
         try:
-            # Use timeout for fallback too
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(print_ticket, ticket)
-                future.result(timeout=TIMEOUT_PRINT)
+            # Use timeout for fallback too (own budget: the cycle may already be spent)
+            _engine.run("fallback", print_ticket, ticket, timeout=TIMEOUT_PRINT, device=b.device("printer"),
+                        spooler=b.spooler, lpr_printer=b.lpr_printer)
             print("  ✓ Fallback printed")
-        except TimeoutError:
+        except StageTimeout:
             print(f"  ✗ Fallback print timeout ({TIMEOUT_PRINT}s) - showing on console:")
             print("\n" + ticket + "\n")
         except Exception as e:
@@ -214,138 +491,454 @@ def print_fallback(dry_run: bool = False):
             print("  → Showing fallback on console instead:")
             print("\n" + ticket + "\n")
 
+# ----------------------------------------
+# Streaming generation + printing
+# ----------------------------------------
+class _ConsoleSession:
+    """Dry-run stand-in for PrintSession: shows ticket lines as they are produced."""
+    def __init__(self):
+        print("\n--- DRY RUN OUTPUT (streaming) ---")
+
+    def write_lines(self, lines, data: bytes = None):
+        for line in lines:
+            print(line)
+
+    def finish(self):
+        print("--- END DRY RUN ---\n")
+
+def stream_fortune(question: str, dry_run: bool = False, deadline: float = None) -> bool:
+    """Generate and print at once: header immediately, then each body line as it completes.
+
+    Returns False if no fortune text arrived; the ticket is then finished with the
+    fallback message so the customer still gets a complete slip.
+    """
+    print("  🔮 Generating fortune (streaming to printer)...")
+    b = current_booth()
+    persona = booth_persona()
+    session_recorder.record("ai_request", question=question, persona=persona, stream=True)
+    template = ticket_template(get_registry().get(persona))
+    session = _ConsoleSession() if dry_run else PrintSession(spooler=b.spooler, lpr_printer=b.lpr_printer)
+    session.write_lines(template.header_lines, template.header_bytes)
+
+    wrapper = LineWrapper()
+    pieces, body = [], []
+    chars = 0
+    error = None
+    try:
+        for piece in stream_ai_response(question, deadline=deadline, persona=persona):
+            chars += len(piece)
+            pieces.append(piece)
+            lines = wrapper.feed(piece)
+            body += lines
+            session.write_lines(lines)
+    except Exception as e:
+        print(f"  ⚠ AI error: {e}")
+        error = str(e)
+    session_recorder.record("ai_response", text="".join(pieces) or None, error=error)
+    if chars == 0:
+        print("  ⚠ No fortune text received - finishing ticket from the pool or fallback message")
+        wrapper.feed(take_pooled_fortune() or FALLBACK_MESSAGE)
+
+    lines = wrapper.finish()
+    body += lines
+    session.write_lines(lines)
+    session.write_lines(template.footer_lines)
+    session.finish()
+    session_recorder.record("ticket", text=template.text("\n".join(body)), fallback=chars == 0)
+    if chars:
+        print(f"  ✓ Fortune streamed and printed ({chars} chars)")
+    return chars > 0
+
+def stream_fortune_with_timeout(question: str, dry_run: bool = False, cycle=None) -> bool:
+    """Run a streamed ticket as a printer stage with the combined AI + print deadline.
+
+    The AI stream stops at the deadline and the ticket is finished with what
+    arrived. A timeout is not followed by a fallback ticket: the header is
+    already on paper.
+    """
+    try:
+        return _engine.run("stream", stream_fortune, question, dry_run, timeout=TIMEOUT_AI + TIMEOUT_PRINT,
+                           cycle=cycle, device=current_booth().device("printer"))
+    except StageTimeout as e:
+        print(f"  ⚠ Streaming timeout ({e.limit:.0f}s exceeded)")
+        return False
+    except Exception as e:
+        print(f"  ⚠ Unexpected error during streamed printing: {e}")
+        raise
+
 # ----------------------------------------
 # Coin event flow with audio + LEDs
 # ----------------------------------------
+def resolve_question(question):
+    """Choose what to answer when nobody spoke. Returns (question, pooled_fortune)."""
+    if question:
+        return question, None
+    fortune = take_pooled_fortune()
+    if fortune:
+        print("  → No question heard - using a pre-generated fortune")
+        return None, fortune
+    question = booth_config().get("default_question", "What is my fortune?")
+    print(f"  → Using default question: {question}")
+    return question, None
+
+def generate_or_pool(question: str, cycle=None):
+    """Generate a fortune; fall back to the pool if the AI fails. None if both fail."""
+    fortune = generate_fortune_with_timeout(question, cycle)
+    if not fortune:
+        fortune = take_pooled_fortune()
+        if fortune:
+            print("  → AI unavailable - using a pre-generated fortune")
+    return fortune
+
+def print_or_fallback(fortune: str, dry_run: bool = False, cycle=None) -> bool:
+    """Print the ticket; print the fallback slip instead if that fails. Returns False on fallback."""
+    try:
+        print_fortune_with_timeout(fortune, dry_run, cycle)
+        print("✓ Fortune cycle complete\n")
+        return True
+    except Exception:
+        print_fallback(dry_run)
+        return False
+
 def on_coin_event(pulses: int, dry_run: bool = False):
     """
     Main orchestration: triggered when coin is inserted.
     Flow: coin → record → transcribe → generate → print
-    All steps have timeout protection.
+    All steps have hard deadlines inside a total cycle budget.
     """
     print(f"\n💰 [COIN EVENT] pulses={pulses}")
+    cycle = _engine.new_cycle(TIMEOUT_CYCLE)
+    metrics.set_cycle(cycle.id)
+    outcome = "fallback"  # ok once the customer's fortune is on paper
 
-    # Create a safe LED client (no-op if not available)
-    led = LedClient(LED_PORT, BAUD)
+    # LED commands go through the shared bus (no-op if not available)
+    led = make_led()
+    b = current_booth()
+    # Keep background pool refills off the AI while a customer is waiting
+    if b.pool:
+        b.pool.pause(b.name)
 
     try:
         # Step 1: Record and transcribe (with timeout) — show "listening"
         led.start("GLOW")
-        question = record_and_transcribe_with_timeout()
+        question = record_and_transcribe_with_timeout(cycle)
         led.stop()
 
-        if not question:
-            question = _config.get("default_question", "What is my fortune?") if _config else "What is my fortune?"
-            print(f"  → Using default question: {question}")
+        question, fortune = resolve_question(question)
 
-        # Step 2: Generate fortune (with timeout) — show "thinking"
-        led.start("PULSE")
-        afplay(SFX_END)  # Play generate sound to signal AI is working
-        fortune = generate_fortune_with_timeout(question)
-        if not fortune:
-            led.stop()
-            print_fallback(dry_run)
-            return
+        if fortune is None:
+            # Step 2: Generate fortune (with timeout) — show "thinking"
+            led.start("PULSE")
+            play_sfx(SFX_END, output=current_booth().speaker)  # Play generate sound to signal AI is working
+            if STREAM_PRINT:
+                # Steps 2+3 overlap: lines print while the fortune is generated
+                if stream_fortune_with_timeout(question, dry_run, cycle):
+                    print("✓ Fortune cycle complete\n")
+                    outcome = "ok"
+                return
+            fortune = generate_or_pool(question, cycle)
+            if not fortune:
+                led.stop()
+                print_fallback(dry_run)
+                return
 
         # Step 3: Print (with timeout)
         try:
-            print_fortune_with_timeout(fortune, dry_run)
-            print("✓ Fortune cycle complete\n")
-        except Exception:
-            print_fallback(dry_run)
+            if print_or_fallback(fortune, dry_run, cycle):
+                outcome = "ok"
         finally:
             led.stop()
 
     except Exception as e:
+        outcome = "error"
         print(f"  ✗ Unexpected error in coin event handler: {e}")
         print_fallback(dry_run)
     finally:
+        metrics.record("cycle", time.monotonic() - cycle.started, outcome, pulses=pulses)
         led.stop()
         led.close()
+        if b.pool:
+            b.pool.resume(b.name)
+        if b.mic:
+            b.mic.resume_tracking()
+
+# ----------------------------------------
+# Pipelined mode: overlap customers across stages
+# ----------------------------------------
+def _pipeline_listen(pulses: int) -> dict:
+    """Listen worker: owns the mic for one customer at a time."""
+    print(f"\n💰 [COIN EVENT] pulses={pulses} (pipelined)")
+    cycle = _engine.new_cycle(TIMEOUT_CYCLE)
+    metrics.set_cycle(cycle.id)
+    question, fortune = resolve_question(record_and_transcribe_with_timeout(cycle))
+    if fortune is None:
+        play_sfx(SFX_END, output=current_booth().speaker)  # Play generate sound to signal AI is working
+    return {"cycle": cycle, "question": question, "fortune": fortune}
+
+def _pipeline_generate(job: dict) -> dict:
+    """Generate worker: runs while the mic serves the next customer."""
+    if job and job["fortune"] is None:
+        metrics.set_cycle(job["cycle"].id)
+        job["fortune"] = generate_or_pool(job["question"], job["cycle"])
+    return job
+
+def _pipeline_print(job: dict, dry_run: bool = False):
+    """Print worker: owns the printer for one ticket at a time."""
+    if not job:
+        print_fallback(dry_run)
+        return
+    metrics.set_cycle(job["cycle"].id)
+    outcome = "fallback"
+    try:
+        if job["fortune"]:
+            # A fortune in hand is always worth printing, so no cycle budget here
+            if print_or_fallback(job["fortune"], dry_run):
+                outcome = "ok"
+        else:
+            print_fallback(dry_run)
+    finally:
+        metrics.record("cycle", time.monotonic() - job["cycle"].started, outcome)
+
+def _pipeline_state(listening: bool, pending: int):
+    """LEDs show the most customer-facing stage; pool refills and noise tracking wait for an empty pipeline."""
+    b = current_booth()
+    mode = "GLOW" if listening else "PULSE" if pending else None
+    # PipelinedRunner serialises these calls, so the check-then-set needs no lock
+    if mode != b.pipeline_led_mode:
+        b.pipeline_led_mode = mode
+        led = make_led()
+        if mode:
+            led.start(mode)
+        else:
+            led.stop()
+    if b.pool:
+        if listening or pending:
+            b.pool.pause(b.name)
+        else:
+            b.pool.resume(b.name)
+    if b.mic and not (listening or pending):
+        b.mic.resume_tracking()
+    if not (listening or pending):
+        apply_pending_persona()
+
+def start_pipeline(dry_run: bool = False) -> PipelinedRunner:
+    """Start pipeline workers that take coins straight from the ledger."""
+    if STREAM_PRINT:
+        print("   Note: --stream is ignored in pipelined mode (generation already overlaps printing)")
+    print(f"   Pipelined mode: up to {PIPELINE_DEPTH} customer(s) queued between stages")
+    b = current_booth()  # The workers run on their own threads
+    return PipelinedRunner(
+        in_booth(b, _pipeline_listen),
+        in_booth(b, _pipeline_generate),
+        in_booth(b, lambda job: _pipeline_print(job, dry_run)),
+        coins=b.ledger,
+        depth=PIPELINE_DEPTH,
+        on_state=in_booth(b, _pipeline_state),
+    ).start()
+
+# ----------------------------------------
+# Coin queue
+# ----------------------------------------
+def open_ledger() -> CoinLedger:
+    return CoinLedger(on_backpressure=in_booth(current_booth(), signal_backpressure))
+
+def signal_backpressure(full: bool):
+    """Coin queue filled up (or has room again): tell the customers via the LEDs."""
+    b = current_booth()
+    led = LedClient(port=None) if b.bus is None else LedClient(bus=b.bus)
+    b.led_busy = full
+    if full:
+        print(f"  🚦 Coin queue full ({b.ledger.max_depth}) - further coins are dropped until it drains")
+        led.start(LED_BUSY_MODE)
+    else:
+        print("  🚦 Coin queue has room again")
+        # Back to whatever the current stage asked for while the queue was full
+        if b.led_mode:
+            led.start(b.led_mode)
+        else:
+            led.stop()
+
+def serve_queued_coins(dry_run: bool = False, timeout: float = 0):
+    """Run one cycle per queued credit, oldest first (one-customer-at-a-time mode)."""
+    ledger = current_booth().ledger
+    while True:
+        apply_pending_persona()  # Between customers
+        event = ledger.next_coin(timeout)
+        if event is None:
+            return
+        if event.wait >= 1:
+            print(f"\n⏳ Customer waited {event.wait:.1f}s in the coin queue")
+        metrics.record("queue_wait", event.wait)
+        on_coin_event(event.pulses, dry_run)
+        timeout = 0
+
+def dispatch_coin(pulses: int, dry_run: bool = False, source: str = "simulate"):
+    """Credit a coin; run it inline unless pipeline workers are taking coins from the ledger."""
+    b = current_booth()
+    credits = b.ledger.add_pulses(pulses, source)
+    session_recorder.record("coin", pulses=pulses, source=source, credits=credits)
+    if not b.runner:
+        serve_queued_coins(dry_run)
+
+def stop_pipeline():
+    runner = current_booth().runner
+    if runner:
+        print("   Finishing tickets already in the pipeline...")
+        runner.stop(timeout=TIMEOUT_CYCLE)
+
+def print_session_summary(booths=None):
+    """Counters worth seeing when the kiosk shuts down (booths: all of them, multi-booth)."""
+    booths = booths or [current_booth()]
+    for b in booths:
+        if b.ledger:
+            print(f"🪙 Coins{f' [{b.name}]' if len(booths) > 1 else ''}: {b.ledger.summary()}")
+    for name, st in provider_stats().items():
+        print(f"🔮 AI {name}: calls={st['calls']} failed={st['failed']} won={st['wins']} "
+              f"hedged={st['hedged']} latency p90 {st['latency_p90']:.2f}s")
+    length = length_stats()
+    if length["responses"]:
+        print(f"✂️  AI length: responses={length['responses']} truncated={length['truncated']} "
+              f"tokens ~{length['tokens_generated']} generated / ~{length['tokens_printed']} printed")
+    if _stt:
+        for line in _stt.summary().splitlines():
+            print(f"🗣️  STT {line}")
+    for b in booths:
+        serial_stats = b.bus.stats() if b.bus else None
+        if serial_stats and (serial_stats["reconnects"] or serial_stats["downtime"]):
+            print(f"🔌 Arduino{f' [{b.name}]' if len(booths) > 1 else ''}: reconnects={serial_stats['reconnects']} "
+                  f"downtime {serial_stats['downtime']:.1f}s")
+    for b in booths:
+        stats = b.spooler.stats() if b.spooler else spooler_stats()
+        if stats:
+            print(f"🖨️  Printer{f' [{b.name}]' if len(booths) > 1 else ''}: jobs={stats['jobs']} "
+                  f"failed={stats['failed']} retried={stats['retried']} opens={stats['opens']} "
+                  f"latency avg {stats['latency_avg']:.2f}s p90 {stats['latency_p90']:.2f}s")
+    for line in metrics.get_metrics().summary().splitlines():
+        print(f"⏱️  {line}")
 
 # ----------------------------------------
 # Modes
 # ----------------------------------------
 def listen_serial_mode(port: str, dry_run: bool = False):
-    """Listen for COIN X messages from Arduino on serial port."""
+    """Listen for COIN X messages from Arduino on serial port (for the current booth)."""
+    b = current_booth()
     print(f"🔌 Hardware mode: Listening on {port} @ {BAUD}...")
     print("   Waiting for coin insertion...\n")
 
-    ser = serial.Serial(port, BAUD, timeout=1)
+    if b.bus is None:  # Normally opened (and READY) during boot
+        print("   Initializing Arduino...")
+        b.bus = connect_arduino(port)
+    b.ledger = open_ledger()
     line_re = re.compile(r"^\s*COIN\s+(\d+)\s*$")
+    persona_re = re.compile(r"^\s*PERSONA\s+(\S+)\s*$")
+    boot_coin_dropped = None  # Bus generation (sketch start) whose spurious first coin was dropped
 
-    # Allow Arduino to settle and ignore spurious signals during boot
-    print("   Initializing Arduino...")
-    time.sleep(3)
-    ser.reset_input_buffer()  # Clear any buffered boot messages
+    b.bus.reset_input_buffer()  # Clear any buffered boot messages
     print("   Ready!\n")
 
-    first_coin_ignored = False  # Flag to ignore first spurious coin signal
+    def on_line(raw: str):
+        """Runs on the bus reader thread: credit coins, echo everything else."""
+        nonlocal boot_coin_dropped
+        use_booth(b)
+        session_recorder.record("serial", line=raw)
+        # Skip Arduino boot/ready messages
+        if "ready" in raw.lower() or "arduino" in raw.lower():
+            print(f"[arduino] {raw}")
+            return
+        m = persona_re.match(raw)
+        if m:
+            request_persona(m.group(1))
+            return
+        m = line_re.match(raw)
+        if not m:
+            # Optional debug output
+            print(f"[arduino] {raw}")
+            return
+        pulses = int(m.group(1))
+        # Ignore the first COIN signal after each sketch start (likely spurious from boot). After
+        # a reconnect only if the sketch really restarted (READY): a board that kept running
+        # only echoed the probe, and its next coin is a customer's
+        generation = b.bus.generation
+        if boot_coin_dropped != generation:
+            restarted = boot_coin_dropped is None or b.bus.booted == generation
+            boot_coin_dropped = generation
+            if restarted:
+                print(f"[arduino] Ignoring first coin signal: {raw}")
+                b.ledger.drop(pulses, "boot" if generation == 0 else "reconnect")
+                return
+        credits = b.ledger.add_pulses(pulses, "serial")
+        session_recorder.record("coin", pulses=pulses, source="serial", credits=credits)
 
-    try:
-        while True:
-            raw = ser.readline().decode("utf-8", errors="ignore")
-            if not raw:
-                continue
-            raw = raw.strip()
-
-            # Skip Arduino boot/ready messages
-            if "ready" in raw.lower() or "arduino" in raw.lower():
-                print(f"[arduino] {raw}")
-                continue
-
-            m = line_re.match(raw)
-            if m:
-                # Ignore the first COIN signal (likely spurious from boot)
-                if not first_coin_ignored:
-                    print(f"[arduino] Ignoring first coin signal: {raw}")
-                    first_coin_ignored = True
-                    continue
+    b.bus.subscribe(on_line)
+    if PIPELINED:
+        b.runner = start_pipeline(dry_run)
 
-                pulses = int(m.group(1))
-                on_coin_event(pulses, dry_run)
+    try:
+        while not b.stopping:
+            if b.runner:
+                time.sleep(1)  # Pipeline workers take coins from the ledger
+                if b.runner.in_flight == 0:
+                    apply_pending_persona()
             else:
-                # Optional debug output
-                if raw:
-                    print(f"[arduino] {raw}")
+                serve_queued_coins(dry_run, timeout=1)
+            if not b.bus.alive:
+                raise RuntimeError(f"Serial connection on {port} was lost")
     except KeyboardInterrupt:
         print("\n\n🛑 Exiting serial mode.")
     finally:
-        ser.close()
+        stop_pipeline()
+        b.bus.close()
+        if b is _default_booth:  # multi_booth.py prints one summary for every booth
+            print_session_summary()
 
 def simulate_mode(dry_run: bool = False, auto: bool = False, interval: int = 10):
     """Simulate coin events for testing without hardware."""
+    b = current_booth()
     print("🎮 Simulation mode")
 
+    # The LED port is opened once for the whole session (during boot); LEDs stay a no-op if it's absent
+    if b.bus is None and LED_PORT:
+        print("   Initializing LEDs...")
+        b.bus = connect_arduino(LED_PORT, required=False)
     # Reset LEDs to DIM on startup (clears any leftover state from previous session)
-    print("   Initializing LEDs...")
-    led_init = LedClient(LED_PORT, BAUD)
-    led_init.stop()
-    led_init.close()
+    make_led().stop()
     print("   LEDs ready\n")
+    b.ledger = open_ledger()
+    if PIPELINED:
+        b.runner = start_pipeline(dry_run)
     if auto:
         print(f"   Auto-triggering every {interval} seconds (Ctrl+C to stop)\n")
         try:
             while True:
                 print("[AUTO] Simulating coin insertion...")
-                on_coin_event(pulses=1, dry_run=dry_run)
+                dispatch_coin(pulses=1, dry_run=dry_run)
                 time.sleep(interval)
         except KeyboardInterrupt:
             print("\n\n🛑 Exiting simulation mode.")
     else:
-        print("   Press ENTER to simulate coin insertion (Ctrl+C to stop)\n")
+        print("   Press ENTER to simulate coin insertion, or type 'persona <name>' (Ctrl+C to stop)\n")
         try:
             while True:
-                input("Press ENTER for coin → ")
-                on_coin_event(pulses=1, dry_run=dry_run)
+                command = input("Press ENTER for coin → ").split()
+                if len(command) == 2 and command[0].lower() == "persona":
+                    request_persona(command[1])
+                    if not b.runner or b.runner.in_flight == 0:
+                        apply_pending_persona()
+                    continue
+                dispatch_coin(pulses=1, dry_run=dry_run)
         except KeyboardInterrupt:
             print("\n\n🛑 Exiting simulation mode.")
 
+    stop_pipeline()
+    if b.bus:
+        b.bus.close()
+    print_session_summary()
+
 # ----------------------------------------
 # CLI
 # ----------------------------------------
 def main():
-    global PORT, LED_PORT, _config
+    global PORT, LED_PORT, STREAM_PRINT, STREAM_STT, PIPELINED, PIPELINE_DEPTH, _stt
 
     parser = argparse.ArgumentParser(
         description="Narly Fortune Orchestrator - coordinates coin → mic → AI → print flow"
@@ -358,14 +951,35 @@ def main():
     )
     parser.add_argument(
         "--port",
-        default=PORT,
-        help=f"Serial port for hardware mode (default: {PORT})"
+        default=None,
+        help=f"Arduino serial port (default: the board with ARDUINO_SERIAL_NUMBER if set, else {PORT})"
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Show output without actually printing to thermal printer"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the AI response onto the printer line by line as it is generated"
+    )
+    parser.add_argument(
+        "--stream-stt",
+        action="store_true",
+        help="Transcribe the question in chunks while the customer is still speaking"
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Overlap customers: record/generate the next fortune while the previous ticket prints"
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=PIPELINE_DEPTH,
+        help=f"Customers buffered between pipelined stages (default: {PIPELINE_DEPTH})"
+    )
     parser.add_argument(
         "--auto",
         action="store_true",
@@ -387,6 +1001,11 @@ def main():
         action="store_true",
         help="List available personas and exit"
     )
+    parser.add_argument(
+        "--prompt-report",
+        action="store_true",
+        help="Show prompt token counts for every persona and exit"
+    )
 
     args = parser.parse_args()
 
@@ -396,25 +1015,85 @@ def main():
         for name in list_personas():
             print(f"  {name}")
         sys.exit(0)
+    if args.prompt_report:
+        for name in list_personas():
+            print(prompt_report(name))
+        sys.exit(0)
 
-    # Load persona config once at startup
-    _config = load_config(args.persona)
-    init_ai(args.persona)
-    print(f"Persona: {_config['_persona_name']}")
+    STREAM_PRINT = args.stream
+    STREAM_STT = args.stream_stt
+    PIPELINED = args.pipelined
+    PIPELINE_DEPTH = max(1, args.pipeline_depth)
 
     # Keep LED port aligned to main serial unless you override at runtime
-    PORT = args.port or PORT
-    LED_PORT = PORT
-
+    port = args.port or (find_port(ARDUINO_SERIAL_NUMBER) if ARDUINO_SERIAL_NUMBER else PORT)
+    PORT = port or PORT
+    LED_PORT = port  # None: that board isn't plugged in, LEDs stay a no-op in simulate mode
     if args.mode == "hardware":
-        port = args.port or find_port()
+        if not port and ARDUINO_SERIAL_NUMBER:
+            print(f"❌ No Arduino with serial number {ARDUINO_SERIAL_NUMBER} (ARDUINO_SERIAL_NUMBER).")
+            sys.exit(1)
         if not port:
             print("❌ Could not auto-detect serial port.")
             print("   Use --port to specify manually, e.g.: --port /dev/cu.usbmodem143101")
             sys.exit(1)
-        listen_serial_mode(port, dry_run=args.dry_run)
-    else:
-        simulate_mode(dry_run=args.dry_run, auto=args.auto, interval=args.interval)
+
+    # Bring everything up at once; the Arduino's reset is usually the long pole
+    boot = BootSequence()
+    # Every persona is loaded once (and hot-reloaded on edit); this picks the active one
+    boot.add("personas", lambda: select_persona(args.persona))
+    # Top up pre-generated fortunes in the background (POOL_SIZE=0 disables)
+    boot.add("pool", lambda: make_pool(get_registry().active), after=("personas", "ai"))
+    boot.add("ai", init_providers)
+    boot.add("stt", _boot_stt)  # Loads the local speech model once, if STT_MODE uses it
+    # Keep the mic open so the noise floor is known before the first customer
+    boot.add("mic", open_mic)
+    boot.add("sfx", init_sfx)  # Cues decoded into memory, output stream left open
+    if not args.dry_run:
+        boot.add("printer", warm_up_printer)
+    if metrics.METRICS_PORT:
+        boot.add("metrics", lambda: metrics.get_metrics().serve(metrics.METRICS_PORT))
+    if args.mode == "hardware":
+        boot.add("arduino", lambda: connect_arduino(port))
+    elif LED_PORT:
+        boot.add("arduino", lambda: connect_arduino(LED_PORT, required=False))
+    results = boot.run()
+    b = current_booth()
+    b.pool, _stt, b.mic, b.bus = results["pool"], results["stt"], results["mic"], results.get("arduino")
+    print(boot.report())
+
+    persona = get_registry().active
+    print(f"Persona: {persona} (loaded: {', '.join(get_registry().names())})")
+    if b.pool and b.pool.size > 0:
+        print(f"Fortune pool: {len(b.pool)}/{b.pool.size} ready")
+    if STREAM_STT and not b.mic:
+        print("   Note: --stream-stt needs adaptive endpointing; transcribing whole questions")
+    if results.get("metrics"):
+        print(f"📈 Metrics: http://127.0.0.1:{metrics.METRICS_PORT}/metrics")
+    # SESSION_RECORD=1: trace every cycle for replay.py
+    session_recorder.start_session(persona=persona, mode=args.mode, stream=STREAM_PRINT, stream_stt=STREAM_STT,
+                                   pipelined=PIPELINED, pipeline_depth=PIPELINE_DEPTH, dry_run=args.dry_run)
+
+    # Switch persona without a restart: SIGUSR1 cycles personas, SIGHUP reloads them from disk
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: next_persona())
+        signal.signal(signal.SIGHUP, lambda *_: get_registry().reload())
+
+    try:
+        if args.mode == "hardware":
+            listen_serial_mode(port, dry_run=args.dry_run)
+        else:
+            simulate_mode(dry_run=args.dry_run, auto=args.auto, interval=args.interval)
+    finally:
+        if b.mic:
+            b.mic.close()
+        close_sfx()
+        metrics.get_metrics().close()  # Flush the JSON-lines log
+        session_recorder.get_recorder().close()
+
+def _boot_stt():
+    from stt import make_stt
+    return make_stt()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+# session_recorder.py - Compact trace of every customer cycle, for replay.py
+#
+# With SESSION_RECORD=1 the kiosk writes what it saw and did as JSON lines:
+# raw serial lines, coins, persona switches, the captured question audio,
+# the transcript, the AI request and response, the printed ticket and every
+# metrics sample (per-stage timings with their outcomes and sizes). Each line
+# is {"t": seconds since the session started, "type": ..., "cycle": id, ...};
+# a "session" line opens each run of the kiosk.
+#
+# Audio is kept as base64 PCM (about 45 KB per second of question at 16 kHz;
+# SESSION_AUDIO=0 leaves it out). Lines are written by a background thread
+# into SESSION_FILE, rotated at SESSION_MAX_BYTES with SESSION_BACKUPS old
+# files kept, so the trace never grows past (backups + 1) x max bytes.
+
+import base64
+import os
+import time
+import uuid
+from pathlib import Path
+
+import metrics
+
+_BASE_DIR = Path(__file__).resolve().parent
+
+SESSION_RECORD = os.getenv("SESSION_RECORD", "0").lower() in ("1", "true", "yes")
+SESSION_FILE = os.getenv("SESSION_FILE", str(_BASE_DIR / ".cache" / "sessions" / "session.jsonl"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(20 * 1024 * 1024)))
+SESSION_BACKUPS = int(os.getenv("SESSION_BACKUPS", "4"))
+SESSION_AUDIO = os.getenv("SESSION_AUDIO", "1").lower() in ("1", "true", "yes")
+
+
+class SessionRecorder:
+    """Timestamped event trace written to a rotating JSON-lines file; a no-op until start()."""
+
+    def __init__(self, path: str = SESSION_FILE, max_bytes: int = SESSION_MAX_BYTES,
+                 backups: int = SESSION_BACKUPS, audio: bool = SESSION_AUDIO):
+        self.log = metrics.JsonLinesLog(path, max_bytes, backups, name="session")
+        self.audio = audio
+        self.session = None
+        self._started = None
+
+    @property
+    def active(self) -> bool:
+        return self.session is not None
+
+    def start(self, **info):
+        """Open a session (info: persona, mode, flags ...) and start taking metrics samples."""
+        self.session = uuid.uuid4().hex[:8]
+        self._started = time.monotonic()
+        self.log.put({"t": 0.0, "type": "session", "session": self.session,
+                      "started": round(time.time(), 3), **info})
+        metrics.get_metrics().subscribe(self._on_metric)
+        return self
+
+    def record(self, kind: str, **fields):
+        """Add one event, tagged with the current cycle. Cheap; never raises."""
+        if self.session is None:
+            return
+        self.log.put({"t": round(time.monotonic() - self._started, 3), "type": kind,
+                      "cycle": metrics.current_cycle(), **fields})
+
+    def record_audio(self, audio):
+        """The question as captured (an sr.AudioData)."""
+        if self.session is None or not self.audio:
+            return
+        self.record("audio", rate=audio.sample_rate, width=audio.sample_width,
+                    pcm=base64.b64encode(audio.frame_data).decode("ascii"))
+
+    def _on_metric(self, event: dict):
+        fields = {k: v for k, v in event.items() if k not in ("ts", "cycle")}
+        self.log.put({"t": round(time.monotonic() - self._started, 3), "type": "stage",
+                      "cycle": event.get("cycle"), **fields})
+
+    def close(self):
+        self.log.close()
+
+
+_recorder = SessionRecorder()
+
+
+def get_recorder() -> SessionRecorder:
+    return _recorder
+
+
+def start_session(**info) -> SessionRecorder:
+    """Start recording if SESSION_RECORD is on. Returns the recorder."""
+    if SESSION_RECORD and not _recorder.active:
+        _recorder.start(**info)
+        print(f"📼 Recording session {_recorder.session} to {_recorder.log.path}")
+    return _recorder
+
+
+def record(kind: str, **fields):
+    _recorder.record(kind, **fields)
+
+
+def record_audio(audio):
+    _recorder.record_audio(audio)
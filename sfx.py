@@ -0,0 +1,265 @@
+# sfx.py - In-process sound cues: decoded once, played from one open output stream
+#
+# Spawning `afplay` per cue put a process start and an MP3 decode in front of
+# the mic opening (and played nothing on Linux). With `pip install miniaudio`
+# the cues under sfx/ are decoded into memory at startup and mixed into a
+# playback device that stays open for the whole session, so a cue starts
+# within one device buffer. play() returns a Future that completes when the
+# cue has actually left the speaker, which is when the mic may open.
+#
+# Without miniaudio (or without an output device) a command-line player is
+# used instead (afplay, mpg123 or ffplay, whichever exists); its Future
+# completes when the player exits. Nothing here ever raises to the caller.
+#
+# Each output device (a booth's own speaker, by name) gets its own player;
+# output=None is the system default.
+
+import array
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+try:
+    import audioop  # Deprecated in 3.11+, still the fastest mixing where available
+except ImportError:
+    audioop = None
+
+try:
+    import miniaudio
+except ImportError:
+    miniaudio = None
+
+SFX_DIR = Path(__file__).resolve().parent / "sfx"
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BUFFER_MSEC = int(os.getenv("SFX_BUFFER_MSEC", "30"))  # Output buffer: start latency of a cue
+
+
+def _scale(pcm: bytes, factor: float) -> bytes:
+    if factor == 1.0:
+        return pcm
+    if audioop is not None:
+        return audioop.mul(pcm, 2, factor)
+    samples = array.array("h", pcm)
+    for i, s in enumerate(samples):
+        samples[i] = max(-32768, min(32767, int(s * factor)))
+    return samples.tobytes()
+
+
+def _mix(a: bytes, b: bytes) -> bytes:
+    if audioop is not None:
+        return audioop.add(a, b, 2)
+    x, y = array.array("h", a), array.array("h", b)
+    return array.array("h", (max(-32768, min(32767, p + q)) for p, q in zip(x, y))).tobytes()
+
+
+def _done(future: Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Voice:
+    """One cue being played: position in its decoded PCM plus its volume."""
+
+    def __init__(self, pcm: bytes, volume: float, future: Future):
+        self.pcm = pcm
+        self.volume = volume
+        self.future = future
+        self.pos = 0
+
+    def take(self, nbytes: int) -> bytes:
+        piece = self.pcm[self.pos:self.pos + nbytes]
+        self.pos += nbytes
+        piece = _scale(piece, self.volume)
+        return piece + bytes(nbytes - len(piece)) if len(piece) < nbytes else piece
+
+    @property
+    def finished(self) -> bool:
+        return self.pos >= len(self.pcm)
+
+
+def list_outputs() -> list:
+    """Names of the audio outputs (empty without miniaudio)."""
+    try:
+        return [d["name"] for d in miniaudio.Devices().get_playbacks()]
+    except Exception:
+        return []
+
+
+def _find_output(name: str):
+    """miniaudio device id of the first output whose name contains name."""
+    for device in miniaudio.Devices().get_playbacks():
+        if name.lower() in device["name"].lower():
+            return device["id"]
+    raise RuntimeError(f"no audio output matching '{name}'")
+
+
+class SoundEngine:
+    """Decoded cues mixed into one persistent miniaudio playback device (output: name, None = default)."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS, buffer_msec: int = BUFFER_MSEC,
+                 output: str = None):
+        if miniaudio is None:
+            raise RuntimeError("miniaudio is not installed")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.latency = buffer_msec / 1000.0
+        self._sounds = {}  # path -> decoded PCM (int16, interleaved)
+        self._voices = []
+        self._lock = threading.Lock()
+        self._device = miniaudio.PlaybackDevice(
+            output_format=miniaudio.SampleFormat.SIGNED16, nchannels=channels,
+            sample_rate=sample_rate, buffersize_msec=buffer_msec, app_name="narly-sfx",
+            device_id=_find_output(output) if output else None)
+        mixer = self._mixer()
+        next(mixer)
+        self._device.start(mixer)
+
+    def load(self, path: str):
+        """Decode a cue into memory (any format miniaudio reads: mp3, wav, flac, ogg)."""
+        decoded = miniaudio.decode_file(str(path), output_format=miniaudio.SampleFormat.SIGNED16,
+                                        nchannels=self.channels, sample_rate=self.sample_rate)
+        self._sounds[str(path)] = decoded.samples.tobytes()
+
+    def duration(self, path: str) -> float:
+        pcm = self._sounds.get(str(path), b"")
+        return len(pcm) / (2 * self.channels * self.sample_rate)
+
+    def play(self, path: str, volume: float = 1.0) -> Future:
+        """Start a cue now; the Future completes once it has finished playing."""
+        future = Future()
+        key = str(path)
+        if key not in self._sounds:
+            self.load(key)  # Not preloaded: decode on first use
+        with self._lock:
+            self._voices.append(_Voice(self._sounds[key], volume, future))
+        return future
+
+    def close(self):
+        self._device.close()
+        with self._lock:
+            for voice in self._voices:
+                _done(voice.future)
+            self._voices = []
+
+    def _mixer(self):
+        """Generator miniaudio pulls frames from; silence when no cue is playing."""
+        frame_bytes = 2 * self.channels
+        required = yield b""
+        while True:
+            nbytes = required * frame_bytes
+            with self._lock:
+                voices = list(self._voices)
+            out = None
+            for voice in voices:
+                chunk = voice.take(nbytes)
+                out = chunk if out is None else _mix(out, chunk)
+            finished = [v for v in voices if v.finished]
+            if finished:
+                with self._lock:
+                    self._voices = [v for v in self._voices if not v.finished]
+                for voice in finished:
+                    # The last samples still have to drain through the device buffer
+                    threading.Timer(self.latency, _done, (voice.future,)).start()
+            required = yield out if out is not None else bytes(nbytes)
+
+
+class CommandPlayer:
+    """Fallback: one player process per cue (afplay on macOS, mpg123 or ffplay elsewhere).
+
+    Only mpg123 can be pointed at an output device (its -a); the others use the default.
+    """
+
+    def __init__(self, output: str = None):
+        self.command = next((c for c in ("afplay", "mpg123", "ffplay") if shutil.which(c)), None)
+        self.output = output
+
+    def _argv(self, path: str, volume: float) -> list:
+        if self.command == "afplay":
+            return ["afplay", "-v", str(volume), path]
+        if self.command == "mpg123":
+            device = ["-a", self.output] if self.output else []
+            return ["mpg123", "-q", "-f", str(int(32768 * volume)), *device, path]
+        return ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",
+                "-volume", str(min(100, int(100 * volume))), path]
+
+    def load(self, path: str):
+        pass  # Players decode on every run
+
+    def play(self, path: str, volume: float = 1.0) -> Future:
+        future = Future()
+        if self.command is None:
+            _done(future)
+            return future
+        proc = subprocess.Popen(self._argv(str(path), volume), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        threading.Thread(target=lambda: (proc.wait(), _done(future)), name="sfx-player", daemon=True).start()
+        return future
+
+    def close(self):
+        pass
+
+
+_player = None  # Default output
+_outputs = {}   # Output name -> player, for booths with their own speaker
+_player_lock = threading.Lock()
+
+
+def init_sfx(paths=None, output: str = None):
+    """Open the sound output (output: device name, None = default) and decode the cues
+    (default: every sfx/*.mp3). Returns the player."""
+    global _player
+    with _player_lock:
+        player = _outputs.get(output) if output else _player
+        if player is None:
+            try:
+                player = SoundEngine(output=output)
+            except Exception as e:
+                player = CommandPlayer(output)
+                how = f"playing cues with {player.command}" if player.command else "sound cues disabled"
+                print(f"  Note: in-process audio unavailable{f' on {output}' if output else ''} ({e}); {how}")
+            if output:
+                _outputs[output] = player
+            else:
+                _player = player
+        for path in (paths if paths is not None else sorted(SFX_DIR.glob("*.mp3"))):
+            try:
+                player.load(path)
+            except Exception as e:
+                print(f"  ⚠ Could not load sound {Path(path).name}: {e}")
+        return player
+
+
+def play(path: str, volume: float = 1.0, wait: bool = False, output: str = None) -> Future:
+    """Play a cue on output (device name, None = default) without blocking; wait=True
+    returns only once it has finished.
+
+    Never raises: a missing file or broken audio output yields a completed Future.
+    """
+    try:
+        if not path or not Path(path).exists():
+            raise FileNotFoundError(path)
+        player = _outputs.get(output) if output else _player
+        future = (player or init_sfx([], output)).play(path, volume)
+    except Exception:
+        future = Future()
+        _done(future)
+    if wait:
+        wait_for(future)
+    return future
+
+
+def wait_for(future: Future, timeout: float = 10.0):
+    """Block until a cue has finished (bounded, in case the output device stalls)."""
+    try:
+        future.result(timeout=timeout)
+    except Exception:
+        pass
+
+
+def close_sfx():
+    for player in [_player, *_outputs.values()]:
+        if player is not None:
+            player.close()
@@ -0,0 +1,690 @@
+# sim_devices.py - Deterministic stand-ins for the booth's hardware and the AI, for offline runs
+#
+# bench/bench_e2e.py runs the real coin -> mic -> AI -> printer flow against
+# these instead of an Arduino, a microphone, OpenAI, a speaker and a thermal
+# printer, so latency can be measured (and regression-tested) on any machine:
+#
+#   SimSerial      the coin board: READY, the spurious boot coin, then COIN 1 per arrival
+#   WavMicrophone  an sr.Microphone that replays WAV questions in real time
+#   SimSpeaker     sound cues that take as long as the real ones and nothing else
+#   MockAIServer   an OpenAI-compatible /v1/chat/completions with a latency model
+#   SimPrinter     an ESC/POS printer that feeds paper at thermal line speed
+#   SimBooth       serial_trigger wired to all of the above (bench_e2e.py, replay.py)
+#
+# Everything random is seeded, so runs with the same settings see the same
+# arrivals, questions and AI latencies.
+
+import json
+import math
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import wave
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+# ---- Arrivals and latency ----
+def arrival_times(count: int, rate_per_hour: float, process: str = "poisson", seed: int = 0) -> list:
+    """Offsets (seconds from the first coin) of count coin arrivals.
+
+    process "poisson" draws exponential gaps, "fixed" spaces coins evenly;
+    rate 0 drops every coin at once (a queue to measure capacity with).
+    """
+    if count <= 0:
+        return []
+    if rate_per_hour <= 0:
+        return [0.0] * count
+    rng = random.Random(seed)
+    gap = 3600.0 / rate_per_hour
+    offsets, t = [0.0], 0.0
+    for _ in range(count - 1):
+        t += rng.expovariate(1.0 / gap) if process == "poisson" else gap
+        offsets.append(t)
+    return offsets
+
+
+class LatencyModel:
+    """Seconds drawn from a spec: "0.8" / "fixed:0.8", "uniform:0.5,2", "normal:1.2,0.3",
+    or "lognormal:1.2,0.4" (median, sigma -- a long right tail, like real APIs)."""
+
+    def __init__(self, spec: str, seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"bad latency spec '{spec}' (e.g. 1.2, uniform:0.5,2, lognormal:1.2,0.4)")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        p = self.params
+        with self._lock:
+            if self.kind == "fixed":
+                value = p[0]
+            elif self.kind == "uniform":
+                value = self._rng.uniform(p[0], p[1])
+            elif self.kind == "normal":
+                value = self._rng.gauss(p[0], p[1])
+            else:
+                value = p[0] * math.exp(self._rng.gauss(0, p[1]))
+        return max(0.0, value)
+
+
+# ---- Coin board ----
+class SimSerial:
+    """pyserial stand-in for the coin/LED Arduino (pass to SerialBus.open(ser=...)).
+
+    Prints READY at once, like the sketch after its reset. The coin schedule
+    starts on start() -- or, like the real board talking into a flushed port,
+    on the host's first reset_input_buffer() -- with the spurious boot coin,
+    then one COIN line per arrival offset; script adds other lines as
+    (offset, line) pairs, e.g. a recorded PERSONA switch. Commands written to
+    it (LED START/STOP ...) are kept in .commands. hangup() makes the next read
+    fail, as an unplugged board does.
+    """
+
+    def __init__(self, arrivals, pulses: int = 1, boot_coin: bool = True, lead: float = 1.0, timeout: float = 1.0,
+                 script=()):
+        self.arrivals = list(arrivals)
+        self.script = list(script)
+        self.pulses = pulses
+        self.boot_coin = boot_coin
+        self.lead = lead
+        self.timeout = timeout
+        self.commands = []
+        self.coins = []  # time.monotonic() each customer coin was read by the host
+        self._lines = deque([("READY", time.monotonic(), "info")])  # (line, due, kind)
+        self._cond = threading.Condition()
+        self._started = False
+        self._hung_up = False
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            t0 = time.monotonic() + self.lead
+            if self.boot_coin:
+                self._lines.append((f"COIN {self.pulses}", t0, "boot"))
+            lines = [(f"COIN {self.pulses}", t0 + 0.5 + offset, "coin") for offset in self.arrivals]
+            lines += [(line, t0 + 0.5 + offset, "info") for offset, line in self.script]
+            self._lines.extend(sorted(lines, key=lambda entry: entry[1]))
+            self._cond.notify_all()
+
+    @property
+    def done(self) -> bool:
+        """Every customer coin has been delivered."""
+        return len(self.coins) == len(self.arrivals)
+
+    def hangup(self):
+        with self._cond:
+            self._hung_up = True
+            self._cond.notify_all()
+
+    # ---- pyserial interface ----
+    def readline(self) -> bytes:
+        end = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._hung_up:
+                    raise OSError("simulated board disconnected (end of run)")
+                now = time.monotonic()
+                wait = end - now
+                if self._lines:
+                    line, due, kind = self._lines[0]
+                    if due <= now:
+                        self._lines.popleft()
+                        if kind == "coin":
+                            self.coins.append(now)
+                        return (line + "\r\n").encode()
+                    wait = min(wait, due - now)
+                if now >= end:
+                    return b""
+                self._cond.wait(wait)
+
+    def write(self, data: bytes):
+        self.commands.append(data.decode("utf-8", errors="ignore").strip())
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self._cond:
+            now = time.monotonic()
+            while self._lines and self._lines[0][1] <= now and self._lines[0][2] == "info":
+                self._lines.popleft()
+        self.start()
+
+    def close(self):
+        self.hangup()
+
+
+# ---- Microphone ----
+def load_wav(path) -> tuple:
+    """(sample_rate, pcm) of a mono 16-bit WAV."""
+    with wave.open(str(path), "rb") as w:
+        if w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"{Path(path).name}: need mono 16-bit audio")
+        return w.getframerate(), w.readframes(w.getnframes())
+
+
+class WavMicrophone:
+    """sr.Microphone stand-in (pass to MicListener(microphone=...)).
+
+    Delivers room noise in real time (speed times faster for replays);
+    speak() makes the next clip come out of the stream next, the way a
+    customer starts talking after the cue. Clips are mono 16-bit WAV paths or
+    (sample_rate, pcm) pairs of one sample rate, used round-robin; a None clip
+    is a customer who says nothing.
+    """
+
+    CHUNK = 1024
+    SAMPLE_WIDTH = 2
+    SAMPLE_RATE = 16000  # Unless the clips say otherwise
+
+    def __init__(self, clips, noise: float = 200.0, seed: int = 0, speed: float = 1.0):
+        if not clips:
+            raise ValueError("WavMicrophone needs at least one clip")
+        self.speed = speed
+        self._clips = []
+        rates = set()
+        for clip in clips:
+            if clip is None:
+                self._clips.append(None)
+                continue
+            rate, pcm = load_wav(clip) if isinstance(clip, (str, Path)) else clip
+            rates.add(rate)
+            if len(rates) > 1:
+                raise ValueError(f"clips mix sample rates ({', '.join(map(str, sorted(rates)))} Hz)")
+            self.SAMPLE_RATE = rate
+            self._clips.append(pcm)
+        rng = random.Random(seed)
+        samples = [int(max(-32767, min(32767, rng.gauss(0, noise)))) for _ in range(2 * self.SAMPLE_RATE)]
+        self._noise = struct.pack(f"<{len(samples)}h", *samples)  # 2 s loop
+        self._noise_pos = 0
+        self._speech = deque()  # Clip PCM queued by speak()
+        self._lock = threading.Lock()
+        self._next = None
+        self.spoken = 0
+        self.stream = self  # sr.Microphone exposes reads as source.stream.read()
+
+    def __enter__(self):
+        self._next = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def speak(self):
+        """Queue the next question clip."""
+        with self._lock:
+            clip = self._clips[self.spoken % len(self._clips)]
+            self.spoken += 1
+            if clip is not None:
+                self._speech.append(clip)
+
+    def _take_noise(self, nbytes: int) -> bytes:
+        out = b""
+        while len(out) < nbytes:
+            piece = self._noise[self._noise_pos:self._noise_pos + nbytes - len(out)]
+            self._noise_pos = (self._noise_pos + len(piece)) % len(self._noise)
+            out += piece
+        return out
+
+    def read(self, frames: int) -> bytes:
+        """Next frames of audio, paced to the sample rate like a real input stream."""
+        self._next += frames / self.SAMPLE_RATE / self.speed
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -1.0:
+            self._next = time.monotonic()  # Reader fell behind; don't burst to catch up
+        nbytes = frames * self.SAMPLE_WIDTH
+        with self._lock:
+            if not self._speech:
+                return self._take_noise(nbytes)
+            pcm = self._speech[0]
+            chunk, rest = pcm[:nbytes], pcm[nbytes:]
+            if rest:
+                self._speech[0] = rest
+            else:
+                self._speech.popleft()
+        return chunk + self._take_noise(nbytes - len(chunk)) if len(chunk) < nbytes else chunk
+
+
+# ---- Speaker ----
+class SimSpeaker:
+    """sfx player stand-in: a cue lasts cue_seconds, then on_finished(path) is called."""
+
+    def __init__(self, cue_seconds: float = 0.8, on_finished=None):
+        self.cue_seconds = cue_seconds
+        self.on_finished = on_finished
+        self.played = []
+
+    def load(self, path: str):
+        pass
+
+    def play(self, path: str, volume: float = 1.0) -> Future:
+        future = Future()
+        self.played.append(str(path))
+
+        def finish():
+            if self.on_finished:
+                try:
+                    self.on_finished(str(path))
+                except Exception as e:
+                    print(f"  ⚠ Speaker callback error: {e}")
+            future.set_result(None)
+
+        threading.Timer(self.cue_seconds, finish).start()
+        return future
+
+    def close(self):
+        pass
+
+
+# ---- AI ----
+_WORDS = ("the tide turns toward you and a quiet door opens in the reef where old "
+          "friends return with news of treasure so trust the current follow the "
+          "bright fish and let patience carry your wish to shore").split()
+
+
+def _fortune(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(_WORDS))
+    text = " ".join(words)
+    if len(text) >= chars:
+        text = text[:text.rfind(" ", 0, chars) if " " in text[:chars] else chars - 1]
+    return text[0].upper() + text[1:] + "."
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # Clients close streams they're done with
+            super().handle_error(request, client_address)
+
+
+class MockAIServer:
+    """OpenAI-compatible chat completions on localhost with a configurable latency model.
+
+    latency is the time to the first token (a LatencyModel spec); the rest of
+    the answer follows at tokens_per_second (~4 chars a token), streamed or
+    not. error_rate is the share of requests answered with HTTP 500. Point
+    the "local" provider at .url (LOCAL_AI_BASE_URL) to use it.
+
+    script replays recorded answers instead, one per request in order:
+    dicts with text, first (seconds to the first token), total (seconds for
+    the whole answer) and ok (False = HTTP 500 after total). Requests beyond
+    the script get generated answers. All delays are divided by speed.
+    Non-streamed requests with n > 1 get n answers (extra ones generated).
+    """
+
+    def __init__(self, latency: str = "lognormal:1.2,0.35", tokens_per_second: float = 40.0,
+                 chars: int = 260, error_rate: float = 0.0, seed: int = 0, host: str = "127.0.0.1", port: int = 0,
+                 script=(), speed: float = 1.0):
+        self.latency = LatencyModel(latency, seed)
+        self.script = deque(script)
+        self.speed = speed
+        self.tokens_per_second = tokens_per_second
+        self.chars = chars
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _draw(self, max_tokens: int) -> tuple:
+        """(fail, first-token delay, seconds for the rest, answer) for one request."""
+        with self._lock:
+            self.requests += 1
+            if self.script:
+                entry = self.script.popleft()
+                fail = not entry.get("ok", True)
+                self.errors += fail
+                first = entry.get("first", entry.get("total", 0.0))
+                rest = max(0.0, entry.get("total", first) - first)
+                text = entry.get("text") or _fortune(self._rng, self.chars)
+                return fail, first / self.speed, rest / self.speed, text
+            fail = self._rng.random() < self.error_rate
+            self.errors += fail
+            text = _fortune(self._rng, min(self.chars, max(8, int(max_tokens * 4))))
+        pieces = len(re.findall(r"\S+\s*", text))  # ~ one token per word
+        rest = pieces / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return fail, self.latency.sample() / self.speed, rest / self.speed, text
+
+    def _extra(self, count: int, max_tokens: int) -> list:
+        with self._lock:
+            return [_fortune(self._rng, min(self.chars, max(8, int(max_tokens * 4)))) for _ in range(count)]
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+            def _json(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.startswith("/v1/models"):
+                    model = self.path.rsplit("/", 1)[-1]
+                    self._json(200, {"id": model, "object": "model", "created": 0, "owned_by": "sim"})
+                else:
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                fail, delay, rest, text = server._draw(request.get("max_tokens") or 256)
+                time.sleep(delay)
+                if fail:
+                    time.sleep(rest)
+                    self._json(500, {"error": {"message": "simulated outage", "type": "server_error"}})
+                    return
+                model = request.get("model", "sim")
+                pieces = re.findall(r"\S+\s*", text)  # ~ one token per word
+                pace = rest / max(1, len(pieces) - 1)
+                if not request.get("stream"):
+                    time.sleep(rest)
+                    texts = [text] + server._extra((request.get("n") or 1) - 1, request.get("max_tokens") or 256)
+                    self._json(200, {
+                        "id": "chatcmpl-sim", "object": "chat.completion", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": i, "message": {"role": "assistant", "content": t},
+                                     "finish_reason": "stop"} for i, t in enumerate(texts)],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)},
+                    })
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def event(delta: dict, finish=None):
+                    chunk = {"id": "chatcmpl-sim", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+                try:
+                    event({"role": "assistant", "content": ""})
+                    for i, piece in enumerate(pieces):
+                        if i:
+                            time.sleep(pace)
+                        event({"content": piece})
+                    event({}, "stop")
+                    self._chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Client closed the stream early (deadline)
+
+            def log_message(self, *args):
+                pass  # Keep requests off the console
+
+        self._server = _QuietServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="mock-ai", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ---- Printer ----
+class SimTicket:
+    """Paper times (time.monotonic()) and printed text of one ticket."""
+
+    __slots__ = ("started", "first_line", "cut", "lines", "text")
+
+    def __init__(self, started: float):
+        self.started = started
+        self.first_line = None
+        self.cut = None
+        self.lines = 0
+        self.text = bytearray()  # Printable bytes and line feeds (cp437)
+
+
+class SimPrinter:
+    """python-escpos Usb stand-in that prints at thermal speed (see EscposDevice(opener=...)).
+
+    Paper advances line_rate text lines a second (ESC d feeds too) and the cut
+    takes cut_seconds. Like a real printer it accepts buffer_bytes ahead of
+    the paper and then holds the USB write until there is room. Each ticket
+    (ESC @ ... cut) records when its body_line-th line (0-based) and its cut
+    came out of the printer.
+    """
+
+    def __init__(self, line_rate: float = 30.0, cut_seconds: float = 0.4, buffer_bytes: int = 4096,
+                 body_line: int = 0):
+        self.line_rate = line_rate
+        self.cut_seconds = cut_seconds
+        self.buffer_bytes = buffer_bytes
+        self.body_line = body_line
+        self.tickets = []  # Cut SimTickets, in print order
+        self.paper_free = time.monotonic()  # When the paper stops moving
+        self._ticket = None
+        self._backlog = deque()  # (done at, bytes) not yet on paper
+        self._lock = threading.Lock()
+
+    def _advance(self, seconds: float) -> float:
+        self.paper_free = max(self.paper_free, time.monotonic()) + seconds
+        return self.paper_free
+
+    def _raw(self, data: bytes):
+        with self._lock:
+            i, line_bytes = 0, 0
+            while i < len(data):
+                byte = data[i]
+                if byte == 0x1B and i + 1 < len(data):  # ESC
+                    command = data[i + 1]
+                    if command == ord("@"):
+                        self._ticket = SimTicket(max(self.paper_free, time.monotonic()))
+                        i += 2
+                        continue
+                    if command == ord("d") and i + 2 < len(data):
+                        self._backlog.append((self._advance(data[i + 2] / self.line_rate), 3))
+                    i += 3
+                elif byte == 0x1D and i + 1 < len(data):  # GS
+                    if data[i + 1] == ord("V"):
+                        done = self._advance(self.cut_seconds)
+                        self._backlog.append((done, 3))
+                        if self._ticket is not None:
+                            self._ticket.cut = done
+                            self.tickets.append(self._ticket)
+                            self._ticket = None
+                    i += 3
+                elif byte == 0x0A:  # LF: one line onto the paper
+                    done = self._advance(1.0 / self.line_rate)
+                    self._backlog.append((done, line_bytes + 1))
+                    line_bytes = 0
+                    if self._ticket is not None:
+                        self._ticket.text.append(byte)
+                        if self._ticket.lines == self.body_line:
+                            self._ticket.first_line = done
+                        self._ticket.lines += 1
+                    i += 1
+                else:
+                    line_bytes += 1
+                    if self._ticket is not None:
+                        self._ticket.text.append(byte)
+                    i += 1
+            # Hold the write while more than the printer's buffer is still to print
+            while True:
+                now = time.monotonic()
+                while self._backlog and self._backlog[0][0] <= now:
+                    self._backlog.popleft()
+                if sum(n for _, n in self._backlog) <= self.buffer_bytes:
+                    return
+                time.sleep(self._backlog[0][0] - now)
+
+    def close(self):
+        pass
+
+
+
+# ---- Whole booth ----
+def _percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def _quantiles(values) -> dict:
+    return {f"p{int(q * 100)}": round(_percentile(values, q), 3) for q in (0.5, 0.9, 0.99)}
+
+
+class SimBooth:
+    """serial_trigger's hardware mode wired to the devices above, run until every customer has a ticket.
+
+    run() sets the environment the app reads at import time and then imports
+    it, so one booth runs per process. speed > 1 runs device time that much
+    faster -- arrivals, cue, speech, AI delays, paper and the app's stage
+    timeouts are divided by it -- and results come back in real seconds.
+    The app's own sleeps (AI retry backoff) are not scaled.
+    """
+
+    def __init__(self, clips, arrivals, ai: MockAIServer, line_rate: float = 30.0, cut_seconds: float = 0.4,
+                 cue_seconds: float = 0.8, speed: float = 1.0, script=(), noise: float = 200.0, seed: int = 0,
+                 persona: str = "default", stream: bool = False, stream_stt: bool = False,
+                 pipelined: bool = False, pipeline_depth: int = 1, env: dict = None):
+        self.clips = clips
+        self.arrivals = list(arrivals)
+        self.ai = ai
+        ai.speed = speed
+        self.line_rate = line_rate
+        self.cut_seconds = cut_seconds
+        self.cue_seconds = cue_seconds
+        self.speed = speed
+        self.script = script
+        self.noise = noise
+        self.seed = seed
+        self.persona = persona
+        self.stream = stream
+        self.stream_stt = stream_stt
+        self.pipelined = pipelined
+        self.pipeline_depth = pipeline_depth
+        self.env = env or {}
+
+    def run(self, max_seconds: float = 0) -> dict:
+        """Serve every arrival; returns throughput, coin -> paper percentiles, queue wait and stage timings."""
+        import os
+        speed = self.speed
+        # Offline wiring; the app reads these when its modules are imported below
+        os.environ.update({
+            "AI_PROVIDERS": "local", "LOCAL_AI_BASE_URL": self.ai.url, "LOCAL_AI_MODEL": "sim",
+            "STT_BACKEND": "static", "STT_MODE": "remote",
+            "ESCPOS_USB_VENDOR_ID": "sim",  # USB path, served by the SimPrinter
+            "COIN_QUEUE_MAX": "0",          # Unbounded: every coin gets its ticket, in order
+            "COIN_PULSES_PER_CREDIT": "1",
+        })
+        os.environ.update(self.env)
+        for key, value in {"POOL_SIZE": "0", "METRICS_FILE": "", "RESPONSE_CACHE": "0", "SESSION_RECORD": "0"}.items():
+            os.environ.setdefault(key, value)  # Overridable, e.g. POOL_SIZE=6 to run with the pool
+
+        import serial_trigger as st
+        import print_client
+        import sfx
+        import metrics
+        from ai_client import select_persona, init_providers
+        from endpointing import MicListener
+        from formatters import ticket_template
+        from persona_registry import get_registry, current_config
+        from serial_bus import SerialBus
+
+        select_persona(self.persona)
+        init_providers()
+        header_lines = len(ticket_template(current_config()).header_lines)
+        printer = SimPrinter(self.line_rate * speed, self.cut_seconds / speed, body_line=header_lines)
+        print_client._spooler = print_client.PrintSpooler(print_client.EscposDevice(opener=lambda: printer))
+
+        mic = WavMicrophone(self.clips, noise=self.noise, seed=self.seed, speed=speed)
+
+        def customer_hears(path: str):
+            if path == st.SFX_START:
+                mic.speak()  # The customer asks their question once the "mic ready" cue ends
+
+        sfx._player = SimSpeaker(self.cue_seconds / speed, on_finished=customer_hears)
+        booth = st.current_booth()
+        booth.mic = MicListener(microphone=mic).start(settle=0.3 / speed)
+        st._stt = st._boot_stt()
+        booth.pool = st.make_pool(get_registry().active)
+        st.STREAM_PRINT, st.STREAM_STT = self.stream, self.stream_stt
+        st.PIPELINED, st.PIPELINE_DEPTH = self.pipelined, max(1, self.pipeline_depth)
+        for name in ("TIMEOUT_RECORDING", "TIMEOUT_AI", "TIMEOUT_PRINT", "TIMEOUT_CYCLE", "LISTEN_TIMEOUT"):
+            setattr(st, name, getattr(st, name) / speed)
+
+        arrivals = [t / speed for t in self.arrivals]
+        port = SimSerial(arrivals, lead=1.0 / speed, script=[(t / speed, line) for t, line in self.script])
+        booth.bus = SerialBus("sim", st.BAUD).open(ser=port)
+        booth.bus.wait_ready(2)
+
+        customers = len(arrivals)
+        limit = max_seconds or (arrivals[-1] if arrivals else 0) + (30 + 25 * customers) / speed
+        deadline = time.monotonic() + limit
+
+        def unplug_when_done():
+            while time.monotonic() < deadline:
+                if port.done and len(printer.tickets) >= customers and time.monotonic() >= printer.paper_free:
+                    break
+                time.sleep(0.05)
+            else:
+                print(f"\n⚠ Run still incomplete after {limit:.0f}s - stopping")
+            port.hangup()
+
+        threading.Thread(target=unplug_when_done, name="booth-watch", daemon=True).start()
+        try:
+            st.listen_serial_mode("sim")
+        except RuntimeError:
+            pass  # The watcher unplugs the simulated board once the last ticket is cut
+        finally:
+            booth.mic.close()
+            self.ai.stop()
+            metrics.get_metrics().close()
+
+        pairs = list(zip(port.coins, printer.tickets))
+        first_lines = [((t.first_line or t.cut) - coin) * speed for coin, t in pairs]
+        cuts = [(t.cut - coin) * speed for coin, t in pairs]
+        span = (pairs[-1][1].cut - pairs[0][0]) * speed if pairs else 0.0
+        waits = booth.ledger.stats()
+        snapshot = metrics.get_metrics().snapshot()
+        return {
+            "customers": len(pairs),
+            "throughput_per_hour": round(len(pairs) / span * 3600, 1) if span > 0 else 0.0,
+            "coin_to_first_line": _quantiles(first_lines),
+            "coin_to_cut": _quantiles(cuts),
+            "queue_wait": {"avg": round(waits["wait_avg"] * speed, 3), "p90": round(waits["wait_p90"] * speed, 3),
+                           "max": round(waits["wait_max"] * speed, 3)},
+            "cycles": snapshot.get("cycle", {}).get("outcomes", {}),
+            "ai": {"requests": self.ai.requests, "errors": self.ai.errors},
+            "tickets": [bytes(t.text).decode("cp437") for _, t in pairs],
+            "stages": {name: {"count": s["count"], "p50": round(s["p50"] * speed, 3), "p90": round(s["p90"] * speed, 3)}
+                       for name, s in snapshot.items()},
+        }
@@ -0,0 +1,228 @@
+# stage_engine.py - Deadline-driven stage runner for the coin → mic → STT → AI → print cycle
+#
+# One asyncio loop (on its own thread) supervises every stage, and one shared
+# thread pool runs the blocking device I/O. A stage gets the smaller of its own
+# limit and what is left of the cycle budget, and control always comes back to
+# the caller when that expires. Stages that accept a `deadline` keyword receive
+# it (time.monotonic() based) so network calls can time out by themselves
+# instead of leaving a thread behind. Coroutine stages are cancelled outright.
+# Stages run in a copy of the caller's context, so context variables (e.g. the
+# metrics cycle id) follow them onto the worker threads. Several booths can
+# share one pool fairly through FairExecutor (multi_booth.py).
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class StageTimeout(Exception):
+    """A stage (or the cycle budget) ran out of time."""
+
+    def __init__(self, stage: str, limit: float):
+        super().__init__(f"{stage} exceeded {limit:.1f}s")
+        self.stage = stage
+        self.limit = limit
+
+
+class StageBusy(Exception):
+    """A device is still held by an earlier stage that never returned."""
+
+    def __init__(self, stage: str, device: str):
+        super().__init__(f"{stage} refused: {device} is still busy from an earlier stage")
+        self.stage = stage
+        self.device = device
+
+
+_cycle_ids = itertools.count(1)
+
+
+class Cycle:
+    """Time budget for one customer cycle."""
+
+    def __init__(self, budget: float = None):
+        self.id = next(_cycle_ids)
+        self.started = time.monotonic()
+        self.deadline = self.started + budget if budget else None
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.monotonic()
+
+
+class StageEngine:
+    """Runs stages with hard deadlines on a shared executor.
+
+    Devices (e.g. "mic", "printer") are owned by at most one stage at a time:
+    if a stage on a device overran its deadline and its thread is still stuck,
+    the next stage on that device fails fast with StageBusy instead of queueing
+    behind it, so hung threads can never pile up.
+    on_stage(stage, seconds, outcome) is called after every stage
+    (outcome: ok, timeout, busy or error), e.g. to record metrics.
+    """
+
+    def __init__(self, max_workers: int = 4, on_stage=None, executor=None):
+        self._on_stage = on_stage
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-io")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stage-engine", daemon=True)
+        self._thread.start()
+        self._devices = {}  # device -> concurrent future of the stage holding it
+        self._lock = threading.Lock()
+
+    def new_cycle(self, budget: float = None) -> Cycle:
+        return Cycle(budget)
+
+    def run(self, stage: str, fn, *args, timeout: float, cycle: Cycle = None, device: str = None, **kwargs):
+        """Run fn(*args, **kwargs) as a stage; return its result or raise StageTimeout/StageBusy.
+
+        Exceptions raised by fn propagate unchanged.
+        """
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            result = self._run(stage, fn, args, kwargs, timeout, cycle, device)
+            outcome = "ok"
+            return result
+        except StageTimeout:
+            outcome = "timeout"
+            raise
+        except StageBusy:
+            outcome = "busy"
+            raise
+        finally:
+            if self._on_stage:
+                try:
+                    self._on_stage(stage, time.monotonic() - started, outcome)
+                except Exception as e:
+                    print(f"  ⚠ Stage callback error: {e}")
+
+    def _run(self, stage: str, fn, args, kwargs, timeout: float, cycle: Cycle, device: str):
+        limit = timeout if cycle is None else min(timeout, cycle.remaining())
+        if limit <= 0:
+            raise StageTimeout(stage, 0.0)
+        if _accepts_deadline(fn):
+            kwargs["deadline"] = time.monotonic() + limit
+
+        with self._lock:
+            held = self._devices.get(device) if device else None
+            if held is not None and not held.done():
+                raise StageBusy(stage, device)
+            if inspect.iscoroutinefunction(fn):
+                future = asyncio.run_coroutine_threadsafe(
+                    self._run_coroutine(fn(*args, **kwargs), limit), self._loop)
+                work = future
+            else:
+                work = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+                future = asyncio.run_coroutine_threadsafe(self._supervise(work, limit), self._loop)
+            if device:
+                self._devices[device] = work
+
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise StageTimeout(stage, limit) from None
+
+    async def _supervise(self, work, limit: float):
+        # shield: a blocking thread can't be interrupted, only abandoned -- the
+        # device stays marked busy until it actually returns
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(work)), limit)
+
+    async def _run_coroutine(self, coro, limit: float):
+        return await asyncio.wait_for(coro, limit)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class FairExecutor:
+    """Thread pool shared by several callers, served round-robin.
+
+    key() is evaluated in the submitting thread (e.g. the current booth's name)
+    and work is queued per key. A free worker takes the oldest item of the next
+    key in turn, and no key has more than per_key items running at once, so a
+    caller whose work is slow or hung can't take every thread from the others.
+    """
+
+    def __init__(self, max_workers: int, key, per_key: int = None, thread_name_prefix: str = "fair-io"):
+        self._key = key
+        self.per_key = per_key or max_workers
+        self._queues = {}   # key -> deque of (future, fn, args, kwargs, queued at), in turn order
+        self._running = {}  # key -> items running
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self.waits = deque(maxlen=200)  # Seconds from submit to start
+        self._workers = [threading.Thread(target=self._work, name=f"{thread_name_prefix}-{i}", daemon=True)
+                         for i in range(max_workers)]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        key = self._key()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queues.setdefault(key, deque()).append((future, fn, args, kwargs, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def _next(self):
+        """Oldest item of the first key (in turn) below its limit; that key moves to the back."""
+        for key in list(self._queues):
+            items = self._queues[key]
+            if items and self._running.get(key, 0) < self.per_key:
+                del self._queues[key]
+                self._queues[key] = items  # Re-insert: next turn starts after this key
+                self._running[key] = self._running.get(key, 0) + 1
+                return key, items.popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                picked = self._next()
+                while picked is None and not self._shutdown:
+                    self._cond.wait()
+                    picked = self._next()
+                if picked is None:
+                    return
+            key, (future, fn, args, kwargs, queued) = picked
+            self.waits.append(time.monotonic() - queued)
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[key] -= 1
+                    self._cond.notify_all()  # A worker may have skipped this key at its limit
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for items in self._queues.values():
+                    while items:
+                        items.popleft()[0].cancel()
+            self._cond.notify_all()
+        if wait:
+            for t in self._workers:
+                t.join()
+
+
+@functools.lru_cache(maxsize=None)
+def _accepts_deadline(fn) -> bool:
+    try:
+        return "deadline" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,358 @@
+# stt.py - Speech-to-text backends and overlapped (chunked) transcription
+#
+# A backend turns sr.AudioData into text, raising sr.UnknownValueError when
+# nothing intelligible was said and sr.RequestError when the service failed --
+# the same contract as recognizer.recognize_google(). STT_BACKEND picks the
+# remote one; an optional offline Vosk model is loaded once at startup and
+# STTRouter decides per question which of the two to trust (STT_MODE).
+#
+# StreamingTranscriber sends each chunk of a question to the backend as soon as
+# the mic cuts it at a short pause, so by the time the customer stops talking
+# only the last few words still need a round trip.
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FutureTimeout
+from pathlib import Path
+
+import speech_recognition as sr
+
+MIN_TAIL_SECONDS = 0.2  # Trailing audio shorter than this isn't worth a request
+CHUNK_TIMEOUT = 10.0    # Limit for a chunk request when the cycle has no deadline
+STT_MIN_CONFIDENCE = float(os.getenv("STT_MIN_CONFIDENCE", "0.6"))  # Below this, ask the other backend
+DEFAULT_LOCAL_MODEL = Path(__file__).resolve().parent / "models" / "vosk-model-small-en-us"
+
+
+class STTBackend:
+    """Interface: transcribe(audio, timeout) -> text.
+
+    Backends that know how sure they are override recognize() instead, which
+    returns (text, confidence 0-1 or None).
+    """
+
+    name = "base"
+
+    def recognize(self, audio: sr.AudioData, timeout: float = None):
+        return self.transcribe(audio, timeout), None
+
+    def transcribe(self, audio: sr.AudioData, timeout: float = None) -> str:
+        return self.recognize(audio, timeout)[0]
+
+
+class GoogleBackend(STTBackend):
+    """Google Web Speech API via speech_recognition (needs network)."""
+
+    name = "google"
+
+    def recognize(self, audio, timeout=None):
+        recognizer = sr.Recognizer()  # Cheap; one per call keeps concurrent chunks independent
+        recognizer.operation_timeout = timeout
+        result = recognizer.recognize_google(audio, show_all=True)
+        if isinstance(result, str):
+            return result, None
+        alternatives = result.get("alternative") if isinstance(result, dict) else None
+        if not alternatives or not alternatives[0].get("transcript"):
+            raise sr.UnknownValueError()
+        return alternatives[0]["transcript"], alternatives[0].get("confidence")
+
+
+class VoskBackend(STTBackend):
+    """Offline Vosk recognizer. The model is loaded once and stays resident."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = None):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        path = Path(model_path or os.getenv("STT_LOCAL_MODEL", str(DEFAULT_LOCAL_MODEL)))
+        if not path.is_dir():
+            raise FileNotFoundError(f"Vosk model not found at {path}")
+        started = time.monotonic()
+        self.model = Model(str(path))
+        self.load_seconds = time.monotonic() - started
+
+    def recognize(self, audio, timeout=None):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, 16000)  # Per call; the model is what's expensive
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        text = result.get("text", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        words = result.get("result") or []
+        confidence = sum(w.get("conf", 0.0) for w in words) / len(words) if words else None
+        return text, confidence
+
+
+class StaticBackend(STTBackend):
+    """Offline stand-in that answers with canned text, for tests and demos.
+
+    STT_STATIC_TEXT holds the answers separated by "|", consumed one per request
+    (the last one repeats), so chunked transcription can be exercised too.
+    """
+
+    name = "static"
+
+    def __init__(self, answers=None):
+        if answers is None:
+            answers = os.getenv("STT_STATIC_TEXT", "What is my fortune?").split("|")
+        self._answers = list(answers)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, timeout=None):
+        with self._lock:
+            text = self._answers.pop(0) if len(self._answers) > 1 else self._answers[0]
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+_BACKENDS = {
+    "google": GoogleBackend,
+    "static": StaticBackend,
+    "vosk": VoskBackend,
+}
+
+
+def make_backend(name: str = None) -> STTBackend:
+    """Backend selected by STT_BACKEND (default: google)."""
+    name = (name or os.getenv("STT_BACKEND", "google")).lower()
+    if name not in _BACKENDS:
+        raise NotImplementedError(f"STT backend '{name}' not implemented")
+    return _BACKENDS[name]()
+
+
+class BackendStats:
+    """Per-backend latency, outcome and confidence counters."""
+
+    def __init__(self):
+        self.calls = 0
+        self.ok = 0
+        self.unknown = 0   # Heard nothing intelligible
+        self.errors = 0    # Request/service failures
+        self.wins = 0      # Answers actually used
+        self._latencies = deque(maxlen=200)
+        self._confidences = deque(maxlen=200)
+
+    def record(self, seconds: float, outcome: str, confidence: float = None):
+        self.calls += 1
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        self._latencies.append(seconds)
+        if confidence is not None:
+            self._confidences.append(confidence)
+
+    def as_dict(self) -> dict:
+        lat = sorted(self._latencies)
+        conf = self._confidences
+        return {
+            "calls": self.calls,
+            "ok": self.ok,
+            "unknown": self.unknown,
+            "errors": self.errors,
+            "wins": self.wins,
+            "latency_avg": sum(lat) / len(lat) if lat else 0.0,
+            "latency_p90": lat[int(0.9 * (len(lat) - 1))] if lat else 0.0,
+            "confidence_avg": sum(conf) / len(conf) if conf else None,
+        }
+
+
+class STTRouter(STTBackend):
+    """Chooses between a remote and an optional local backend per question.
+
+    remote       remote only (local, if loaded, answers when the request fails)
+    local        local only
+    local-first  local; remote only when local is unsure or hears nothing
+    race         both at once, first confident answer wins
+    """
+
+    name = "router"
+    MODES = ("remote", "local", "local-first", "race")
+
+    def __init__(self, remote: STTBackend, local: STTBackend = None, mode: str = "remote",
+                 min_confidence: float = STT_MIN_CONFIDENCE):
+        if mode not in self.MODES:
+            raise NotImplementedError(f"STT mode '{mode}' not implemented")
+        if mode != "remote" and local is None:
+            print(f"  ⚠ STT_MODE={mode} needs a local model; using remote speech recognition")
+            mode = "remote"
+        self.remote = remote
+        self.local = local
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.stats = {b.name: BackendStats() for b in (remote, local) if b is not None}
+        self._race_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stt-race")
+
+    def _confident(self, confidence) -> bool:
+        return confidence is None or confidence >= self.min_confidence
+
+    def _call(self, backend: STTBackend, audio, timeout):
+        started = time.monotonic()
+        try:
+            text, confidence = backend.recognize(audio, timeout)
+        except sr.UnknownValueError:
+            self.stats[backend.name].record(time.monotonic() - started, "unknown")
+            raise
+        except Exception as e:
+            self.stats[backend.name].record(time.monotonic() - started, "errors")
+            raise e if isinstance(e, sr.RequestError) else sr.RequestError(f"{backend.name}: {e}")
+        self.stats[backend.name].record(time.monotonic() - started, "ok", confidence)
+        return text, confidence
+
+    def _use(self, backend: STTBackend, result):
+        self.stats[backend.name].wins += 1
+        return result
+
+    def recognize(self, audio, timeout=None):
+        if self.mode == "race":
+            return self._race(audio, timeout)
+        if self.mode == "local":
+            return self._use(self.local, self._call(self.local, audio, timeout))
+
+        if self.mode == "remote":
+            try:
+                return self._use(self.remote, self._call(self.remote, audio, timeout))
+            except sr.RequestError:
+                if self.local is None:
+                    raise
+                return self._use(self.local, self._call(self.local, audio, timeout))
+
+        # local-first
+        local_result = None
+        try:
+            local_result = self._call(self.local, audio, timeout)
+            if self._confident(local_result[1]):
+                return self._use(self.local, local_result)
+        except (sr.UnknownValueError, sr.RequestError):
+            pass
+        try:
+            return self._use(self.remote, self._call(self.remote, audio, timeout))
+        except (sr.UnknownValueError, sr.RequestError):
+            if local_result is None:
+                raise
+            return self._use(self.local, local_result)  # Unsure beats nothing
+
+    def _race(self, audio, timeout):
+        futures = {self._race_executor.submit(self._call, b, audio, timeout): b
+                   for b in (self.local, self.remote)}
+        best, best_backend, error = None, None, None
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    result = future.result()
+                except (sr.UnknownValueError, sr.RequestError) as e:
+                    error = e
+                    continue
+                if self._confident(result[1]):
+                    return self._use(futures[future], result)  # The loser finishes in the background
+                if best is None or result[1] > best[1]:
+                    best, best_backend = result, futures[future]
+        except FutureTimeout:
+            error = sr.RequestError(f"no speech recognition result within {timeout:.1f}s")
+        if best is not None:
+            return self._use(best_backend, best)
+        raise error or sr.UnknownValueError()
+
+    def summary(self) -> str:
+        """One line per backend for the console."""
+        lines = []
+        for name, stats in self.stats.items():
+            s = stats.as_dict()
+            text = (f"{name}: calls={s['calls']} ok={s['ok']} unknown={s['unknown']} errors={s['errors']} "
+                    f"used={s['wins']} latency avg {s['latency_avg']:.2f}s p90 {s['latency_p90']:.2f}s")
+            if s["confidence_avg"] is not None:
+                text += f" confidence avg {s['confidence_avg']:.2f}"
+            lines.append(text)
+        return "\n".join(lines)
+
+
+def make_stt() -> STTRouter:
+    """Router for STT_MODE, loading the local model (once) if the mode needs it."""
+    mode = os.getenv("STT_MODE", "remote").lower()
+    local = None
+    if mode != "remote" or os.getenv("STT_LOCAL_MODEL"):
+        try:
+            local = VoskBackend()
+            print(f"Local speech model loaded in {local.load_seconds:.1f}s")
+        except Exception as e:
+            print(f"  ⚠ Local speech model unavailable: {e}")
+    return STTRouter(make_backend(), local, mode)
+
+
+def merge_partials(texts) -> str:
+    """Join chunk transcripts in order, dropping a word repeated across a cut."""
+    words = []
+    for text in texts:
+        new = (text or "").split()
+        if words and new and words[-1].strip(",.?!").lower() == new[0].strip(",.?!").lower():
+            new = new[1:]
+        words.extend(new)
+    return " ".join(words)
+
+
+# Chunk requests overlap recording, so they get their own threads
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="stt")
+
+
+class StreamingTranscriber:
+    """Transcribes a question chunk by chunk while it is still being recorded.
+
+    feed() is called with raw PCM for each chunk cut by the mic; finish() takes
+    the complete recording, transcribes whatever speech came after the last
+    chunk (trailing silence is never sent) and merges everything. Chunks the
+    backend couldn't understand are skipped; if none were understood, finish()
+    raises like a single request would. If a chunk request failed, merging
+    would leave a hole in the question, so the whole recording is sent again
+    instead. Chunk requests time out at the time.monotonic() deadline.
+    """
+
+    def __init__(self, backend: STTBackend, sample_rate: int, sample_width: int, deadline: float = None):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.deadline = deadline
+        self._futures = []
+        self._seen = 0  # Bytes of the recording already sent
+        self.chunks = 0
+
+    def _submit(self, pcm: bytes, timeout: float = None):
+        audio = sr.AudioData(pcm, self.sample_rate, self.sample_width)
+        self._futures.append(_executor.submit(self.backend.transcribe, audio, timeout))
+        self.chunks += 1
+
+    def feed(self, pcm: bytes):
+        self._seen += len(pcm)
+        left = self.deadline - time.monotonic() if self.deadline is not None else CHUNK_TIMEOUT
+        self._submit(pcm, max(0.5, left))
+
+    def finish(self, audio: sr.AudioData, timeout: float = None, speech_bytes: int = None) -> str:
+        started = time.monotonic()
+        tail = audio.frame_data[self._seen:speech_bytes]
+        if len(tail) >= MIN_TAIL_SECONDS * self.sample_rate * self.sample_width or not self._futures:
+            self._submit(tail, timeout)
+
+        done, pending = wait(self._futures, timeout=timeout)
+        if pending:
+            raise sr.RequestError(f"{len(pending)} chunk(s) still transcribing after {timeout:.1f}s")
+
+        texts, request_error = [], None
+        for future in self._futures:
+            try:
+                texts.append(future.result())
+            except sr.UnknownValueError:
+                continue
+            except sr.RequestError as e:
+                request_error = e
+        if request_error:
+            print(f"  ⚠ A chunk failed ({request_error}) - transcribing the whole question again")
+            left = timeout - (time.monotonic() - started) if timeout is not None else None
+            if speech_bytes:
+                audio = sr.AudioData(audio.frame_data[:speech_bytes], self.sample_rate, self.sample_width)
+            return self.backend.transcribe(audio, max(0.5, left) if left is not None else None)
+        text = merge_partials(texts)
+        if not text:
+            raise sr.UnknownValueError()
+        return text